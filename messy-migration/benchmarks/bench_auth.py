@@ -0,0 +1,88 @@
+"""Per-request authentication overhead with and without the auth caches.
+
+    python -m benchmarks.bench_auth --iterations 20000 --threads 1 4
+
+First times the work ``token_required`` does before a handler runs --
+verifying the token and loading the user -- in isolation, uncached
+(HS256 decode plus ``User.get_by_id``) and from warm caches. Then reports
+GET /user/<id> throughput through the Flask test client with the caches
+disabled (size 0) and enabled.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src import create_app
+from src.auth import generate_token, load_user, verify_token
+from src.database import get_db, get_pool
+from benchmarks.bench_pool import build_database
+from benchmarks.common import print_table, run_threads
+
+
+def make_app(path, cached):
+    size = 10_000 if cached else 0
+    return create_app(config_override={
+        'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path,
+        'TOKEN_CACHE_SIZE': size, 'USER_CACHE_SIZE': size,
+    })
+
+
+def time_auth(app, iterations):
+    with app.app_context():
+        token = generate_token(1)
+        db = get_db()
+        load_user(db, verify_token(token))
+        started = time.perf_counter()
+        for _ in range(iterations):
+            load_user(db, verify_token(token))
+        return (time.perf_counter() - started) / iterations
+
+
+def request_rate(app, threads, duration):
+    with app.app_context():
+        tokens = [generate_token(user_id) for user_id in range(1, threads + 1)]
+
+    def worker(index, stop):
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {tokens[index]}"}
+        done = 0
+        while not stop.is_set():
+            assert client.get(f"/user/{index + 1}", headers=headers).status_code == 200
+            done += 1
+        return done
+
+    ops, elapsed = run_threads(threads, worker, duration)
+    return ops / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, args.users)
+        apps = {"uncached": make_app(path, False), "cached": make_app(path, True)}
+
+        per_call = {name: time_auth(app, args.iterations) for name, app in apps.items()}
+        print_table(("auth path", "us/request"), [
+            (name, "%.1f" % (seconds * 1e6)) for name, seconds in per_call.items()])
+        print()
+
+        rows = []
+        for threads in args.threads:
+            before = request_rate(apps["uncached"], threads, args.duration)
+            after = request_rate(apps["cached"], threads, args.duration)
+            rows.append((threads, "%.0f" % before, "%.0f" % after, "%.2fx" % (after / before)))
+        print_table(("threads", "uncached req/s", "cached req/s", "speedup"), rows)
+        for app in apps.values():
+            get_pool(app).close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Latency of a cheap endpoint during a login storm.
+
+    python -m benchmarks.bench_bcrypt --storm 16 --duration 5
+
+``--storm`` threads post valid logins as fast as they can while one probe
+thread times GET / (no bcrypt, no database work beyond the pooled
+connection). "inline" hashes on the request threads, as before; "pooled"
+runs bcrypt on ``--workers`` hasher threads with a ``--queue``-deep
+admission queue, so surplus logins get 503 + Retry-After instead of
+competing with the probe for CPU. Storm clients honour Retry-After.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from src import create_app
+from src.database import get_db, get_pool
+from benchmarks.common import percentile, print_table
+
+SCHEMA = '''
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL
+)
+'''
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(config_override={
+            'TESTING': True, 'DEBUG': False,
+            'DATABASE_NAME': os.path.join(directory, "bench.db"),
+            'BCRYPT_ROUNDS': args.rounds,
+            'HASHER_WORKERS': 0 if mode == "inline" else args.workers,
+            'HASHER_QUEUE_SIZE': args.queue,
+        })
+        with app.app_context():
+            get_db().execute(SCHEMA)
+        app.test_client().post('/users', json={"name": "Ann", "email": "ann@example.com", "password": "pw"})
+
+        stop = threading.Event()
+        statuses = {}
+        lock = threading.Lock()
+
+        def storm():
+            client = app.test_client()
+            while not stop.is_set():
+                response = client.post('/login', json={"email": "ann@example.com", "password": "pw"})
+                with lock:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 503:
+                    stop.wait(float(response.headers['Retry-After']))
+
+        samples = []
+
+        def probe():
+            client = app.test_client()
+            while not stop.is_set():
+                started = time.perf_counter()
+                client.get('/')
+                samples.append(time.perf_counter() - started)
+                time.sleep(0.005)
+
+        threads = [threading.Thread(target=storm) for _ in range(args.storm)] + [threading.Thread(target=probe)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        get_pool(app).close()
+        app.extensions['hasher'].shutdown()
+        return samples, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storm", type=int, default=16, help="threads posting logins")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for mode in ("inline", "pooled"):
+        samples, statuses = run(mode, args)
+        rows.append((
+            mode, len(samples),
+            "%.1f" % (percentile(samples, 50) * 1e3),
+            "%.1f" % (percentile(samples, 99) * 1e3),
+            "%.1f" % (statuses.get(200, 0) / args.duration),
+            statuses.get(503, 0),
+        ))
+    print_table(("hashing", "probes", "GET / p50 ms", "GET / p99 ms", "logins/s", "503s"), rows)
+
+
+if __name__ == "__main__":
+    main()
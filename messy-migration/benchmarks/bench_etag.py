@@ -0,0 +1,75 @@
+"""Dashboard polling with and without conditional requests.
+
+    python -m benchmarks.bench_etag --polls 5000 --write-every 50
+
+A poller requests the same URL over and over; every ``--write-every``
+polls another client updates the polled user, which moves both the
+user's and the table's version. "plain" pollers ignore validators and
+get a full 200 each time. "conditional" pollers send back the last ETag
+in If-None-Match and get a 304, after one primary-key lookup of the
+version and with no body, until the next write. The write requests are not timed.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from src import create_app
+from src.auth import generate_token
+from src.database import get_pool
+from src.migrations import migrate
+from benchmarks.bench_pool import build_database
+from benchmarks.common import print_table
+
+
+def run(app, url, conditional, polls, write_every, headers, writer_headers):
+    client = app.test_client()
+    elapsed = 0.0
+    sent = 0
+    not_modified = 0
+    etag = None
+    for index in range(polls):
+        if index and index % write_every == 0:
+            client.put("/user/1", json={"name": f"User {index}", "email": "user0@example.com"}, headers=writer_headers)
+        request_headers = dict(headers, **{"If-None-Match": etag}) if conditional and etag else headers
+        started = time.perf_counter()
+        response = client.get(url, headers=request_headers)
+        body = response.get_data()
+        elapsed += time.perf_counter() - started
+        sent += len(body)
+        not_modified += response.status_code == 304
+        etag = response.headers.get("ETag", etag)
+    return elapsed / polls, sent / polls, not_modified / polls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=5000)
+    parser.add_argument("--write-every", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, args.users)
+        conn = sqlite3.connect(path)
+        migrate(conn)
+        conn.close()
+        app = create_app(config_override={'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path})
+        with app.app_context():
+            headers = {"Authorization": f"Bearer {generate_token(2)}"}
+            writer_headers = {"Authorization": f"Bearer {generate_token(1)}"}
+        for url in ("/user/1", "/users?limit=100"):
+            results = [run(app, url, conditional, args.polls, args.write_every, headers, writer_headers)
+                       for conditional in (False, True)]
+            for name, (latency, size, ratio) in zip(("plain", "conditional"), results):
+                rows.append((url, name, "%.1f" % (latency * 1e6), "%.0f" % size, "%.0f%%" % (ratio * 100)))
+        get_pool(app).close()
+        app.extensions['hasher'].shutdown()
+    print_table(("endpoint", "poller", "µs/poll", "body bytes/poll", "304s"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Bulk import throughput: one POST /users per user vs POST /users/import.
+
+    python -m benchmarks.bench_import --users 5000 --rounds 4 --prehashed 200000
+
+"POST /users" creates users one request at a time, as a migration script
+had to before: one insert, commit and re-read each. The import rows send
+the same users as one NDJSON body, hashed on 1 and on ``--workers``
+threads, then ``--prehashed`` users with ready bcrypt hashes, which skips
+hashing and leaves insert cost alone. Every run starts from a database holding
+only the caller, with the users_fts index and its triggers in place.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import bcrypt
+from src import create_app
+from src.auth import generate_token
+from src.database import get_pool
+from src.search import create_search_index
+from benchmarks.common import print_table
+
+
+def fresh_app(directory, name, rounds, workers):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )""")
+    create_search_index(conn)
+    # The caller authenticates as this user.
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('Admin', 'admin@example.com', 'x')")
+    conn.commit()
+    conn.close()
+    app = create_app(config_override={
+        'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path,
+        'BCRYPT_ROUNDS': rounds, 'HASHER_WORKERS': workers,
+    })
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {generate_token(1)}"}
+    return app, headers
+
+
+def users(count, **fields):
+    return [dict({"name": f"User {i}", "email": f"user{i}@example.com"}, **fields) for i in range(count)]
+
+
+def per_request(app, headers, records):
+    client = app.test_client()
+    for record in records:
+        assert client.post('/users', json=record).status_code == 201
+
+
+def bulk(app, headers, records):
+    body = "".join(json.dumps(record) + "\n" for record in records)
+    summary = app.test_client().post(
+        '/users/import', data=body, headers=headers, content_type='application/x-ndjson').get_json()
+    assert summary["imported"] == len(records), summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--prehashed", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    plain = users(args.users, password="password")
+    hashed = users(args.prehashed, password_hash=bcrypt.hashpw(b"password", bcrypt.gensalt(args.rounds)).decode())
+    cases = [
+        ("POST /users per user", args.users, 1, per_request, plain),
+        ("import, 1 hash thread", args.users, 1, bulk, plain),
+    ]
+    if args.workers > 1:
+        cases.append((f"import, {args.workers} hash threads", args.users, args.workers, bulk, plain))
+    cases.append(("import, pre-hashed", args.prehashed, 1, bulk, hashed))
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for index, (name, count, workers, fn, records) in enumerate(cases):
+            app, headers = fresh_app(directory, f"bench{index}.db", args.rounds, workers)
+            started = time.perf_counter()
+            fn(app, headers, records)
+            elapsed = time.perf_counter() - started
+            get_pool(app).close()
+            app.extensions['hasher'].shutdown()
+            rows.append((name, count, "%.2f" % elapsed, "%.0f" % (count / elapsed)))
+    print_table(("rounds=%d" % args.rounds, "users", "seconds", "users/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Overhead of per-request query instrumentation.
+
+    python -m benchmarks.bench_instrumentation --requests 20000
+
+Times the same request loop through the test client with
+QUERY_INSTRUMENTATION off and on (the default): point lookups, which
+are dominated by fixed per-request cost, and 100-row keyset pages,
+which pass more rows through the instrumented cursor. The user cache
+is disabled so every request reaches the database.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from src import create_app
+from src.auth import generate_token
+from src.database import get_pool
+from benchmarks.bench_pool import build_database
+from benchmarks.common import print_table
+
+
+def run(path, instrumented, target, requests, num_users):
+    app = create_app(config_override={
+        'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path,
+        'QUERY_INSTRUMENTATION': instrumented, 'USER_CACHE_SIZE': 0,
+    })
+    client = app.test_client()
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {generate_token(1)}"}
+    for index in range(200):
+        client.get(target(index % num_users + 1), headers=headers)
+    started = time.perf_counter()
+    for index in range(requests):
+        response = client.get(target(index % num_users + 1), headers=headers)
+        response.get_data()
+    elapsed = time.perf_counter() - started
+    get_pool(app).close()
+    return elapsed / requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    targets = [
+        ("GET /user/<id>", lambda user_id: f"/user/{user_id}"),
+        ("GET /users?limit=100", lambda user_id: f"/users?after_id={user_id}&limit=100"),
+    ]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, args.users)
+        for name, target in targets:
+            off = run(path, False, target, args.requests, args.users)
+            on = run(path, True, target, args.requests, args.users)
+            rows.append((name, "%.1f" % (off * 1e6), "%.1f" % (on * 1e6),
+                         "%.1f" % ((on - off) * 1e6), "%.1f%%" % ((on / off - 1) * 100)))
+    print_table(("endpoint", "off µs/req", "on µs/req", "overhead µs", "overhead"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cost of encoding a 10k-user response: dicts through the stdlib encoder
+or orjson, vs rows SQLite already encoded with json_object.
+
+    python -m benchmarks.bench_json --rows 10000 --repeat 20
+
+Each case fetches ``--rows`` users in one keyset page and produces the
+response body the /users endpoint would send, timing fetch and encode
+together (json_object moves the encoding into the query). Bytes is the
+body size: the stdlib provider pads with ", " and ": " separators.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from flask import Flask
+from src.json_provider import FastJSONProvider
+from src.models import User
+from benchmarks.bench_pool import build_database
+from benchmarks.common import print_table
+
+
+def encode_dicts(app, db, rows):
+    return app.json.dumps(User.list_page(db, 0, rows))
+
+
+def encode_sqlite(app, db, rows):
+    return "[" + ",".join(row[1] for row in User.list_page(db, 0, rows, as_json=True)) + "]"
+
+
+def run(encode, app, db, rows, repeat):
+    encode(app, db, rows)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(app, db, rows)
+        best = min(best, time.perf_counter() - started)
+    return best, len(body.encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    stdlib = Flask(__name__)
+    fast = Flask(__name__)
+    fast.json = FastJSONProvider(fast)
+    cases = [
+        ("dicts, stdlib json", encode_dicts, stdlib),
+        ("dicts, orjson provider", encode_dicts, fast),
+        ("json_object rows, joined", encode_sqlite, fast),
+    ]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, args.rows)
+        db = sqlite3.connect(path)
+        baseline = None
+        for name, encode, app in cases:
+            elapsed, size = run(encode, app, db, args.rows, args.repeat)
+            baseline = baseline or elapsed
+            rows.append((name, "%.2f" % (elapsed * 1e3), "%.1fx" % (baseline / elapsed), size))
+        db.close()
+    print_table(("encoder", "ms", "speedup", "bytes"), rows)
+
+
+if __name__ == "__main__":
+    main()
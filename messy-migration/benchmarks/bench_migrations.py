@@ -0,0 +1,111 @@
+"""Indexing an existing users table: one-shot rebuild vs batched migration.
+
+    python -m benchmarks.bench_migrations --users 1000000 --batch-sizes 1000,10000
+
+Each case starts from a copy of the same pre-migration database and runs
+while a writer thread updates a random user every few milliseconds, the
+way the application would. "rebuild" is what migrate.py did before
+migrations were batched: create_search_index, one 'rebuild' statement
+under one write lock. The batched rows run migration 2 through the
+Migrator. Reported: migration throughput, the longest and total write
+lock hold, and the worst latency the concurrent writer saw.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from src.migrations import Migrator
+from src.search import create_search_index
+from benchmarks.bench_search import build_database
+from benchmarks.common import print_table
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=600, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def writer(path, num_users, stop, latencies):
+    conn = connect(path)
+    rng = random.Random(2)
+    while not stop.is_set():
+        started = time.perf_counter()
+        conn.execute("UPDATE users SET name = ? WHERE id = ?", (f"Writer {rng.random()}", rng.randint(1, num_users)))
+        conn.commit()
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.005)
+    conn.close()
+
+
+def run_case(path, num_users, migrate):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=writer, args=(path, num_users, stop, latencies))
+    thread.start()
+    conn = connect(path)
+    time.sleep(0.05)
+    try:
+        return migrate(conn), latencies
+    finally:
+        stop.set()
+        thread.join()
+        conn.close()
+
+
+def rebuild(conn):
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    create_search_index(conn)
+    elapsed = time.perf_counter() - started
+    return {"rows": conn.execute("SELECT count(*) FROM users").fetchone()[0], "seconds": elapsed,
+            "max_lock_seconds": elapsed, "lock_seconds": elapsed, "batches": 1}
+
+
+def batched(batch_size, pause):
+    def migrate(conn):
+        return Migrator(conn, batch_size=batch_size, pause=pause).run()[-1]
+    return migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--batch-sizes", default="1000,10000")
+    parser.add_argument("--pause", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    cases = [("rebuild (one statement)", rebuild)]
+    for size in (int(n) for n in args.batch_sizes.split(",")):
+        cases.append((f"batched, {size} rows", batched(size, args.pause)))
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, "template.db")
+        build_database(template, args.users)
+        conn = sqlite3.connect(template)
+        conn.execute("DROP TABLE users_fts")
+        for name in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS users_fts_{name}")
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+        for index, (name, migrate) in enumerate(cases):
+            path = os.path.join(directory, f"case{index}.db")
+            shutil.copyfile(template, path)
+            report, latencies = run_case(path, args.users, migrate)
+            rows.append((name, report["batches"], "%.1f" % report["seconds"],
+                         "%.0f" % (report["rows"] / report["seconds"]),
+                         "%.1f" % (report["max_lock_seconds"] * 1e3), "%.1f" % report["lock_seconds"],
+                         len(latencies), "%.1f" % (max(latencies, default=0.0) * 1e3)))
+    print_table(("users=%d" % args.users, "batches", "seconds", "rows/s", "max lock ms",
+                 "lock s", "writes", "worst write ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Request throughput with per-request connections vs the connection pool.
+
+    python -m benchmarks.bench_pool --threads 1 4 16 --duration 3
+
+"per-request" reproduces the old ``get_db``: a fresh ``sqlite3.connect``
+per request in SQLite's default rollback-journal mode. "pooled" is the
+ConnectionPool with WAL. Each thread drives the app through its own Flask
+test client with a valid token, either reading a user (GET /user/<id>) or
+updating its own user (PUT /user/<id>). Every mode/scenario gets a fresh
+database so the journal mode of one run does not leak into the next.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+import bcrypt
+from src import create_app
+from src.auth import generate_token
+from src.database import get_pool
+from benchmarks.common import print_table, run_threads
+
+
+class PerRequestConnections:
+    """The pre-pool behaviour, behind the pool's interface."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def acquire(self):
+        conn = sqlite3.connect(self.database)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release(self, conn):
+        conn.close()
+
+    def close(self):
+        pass
+
+
+def build_database(path, num_users):
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )""")
+    password = bcrypt.hashpw(b"password", bcrypt.gensalt(4))
+    conn.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                     ((f"User {i}", f"user{i}@example.com", password) for i in range(num_users)))
+    conn.commit()
+    conn.close()
+
+
+def run(mode, scenario, threads, duration, num_users):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, num_users)
+        app = create_app(config_override={'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path})
+        if mode == "per-request":
+            app.extensions['db_pool'] = PerRequestConnections(path)
+        with app.app_context():
+            tokens = [generate_token(user_id) for user_id in range(1, threads + 1)]
+
+        def worker(index, stop):
+            client = app.test_client()
+            user_id = index + 1
+            headers = {"Authorization": f"Bearer {tokens[index]}"}
+            done = 0
+            while not stop.is_set():
+                if scenario == "read":
+                    response = client.get(f"/user/{user_id}", headers=headers)
+                else:
+                    response = client.put(f"/user/{user_id}", headers=headers, json={
+                        "name": f"User {user_id} {done}", "email": f"user{index}@example.com"})
+                assert response.status_code == 200, response.status_code
+                done += 1
+            return done
+
+        ops, elapsed = run_threads(threads, worker, duration)
+        get_pool(app).close()
+        return ops / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for scenario in ("read", "write"):
+        for threads in args.threads:
+            before = run("per-request", scenario, threads, args.duration, args.users)
+            after = run("pooled", scenario, threads, args.duration, args.users)
+            rows.append((scenario, threads, "%.0f" % before, "%.0f" % after, "%.2fx" % (after / before)))
+    print_table(("scenario", "threads", "per-request req/s", "pooled req/s", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Name search latency: LIKE '%q%' table scan vs the users_fts trigram index.
+
+    python -m benchmarks.bench_search --users 100000,1000000
+
+For each size, builds a database of random first/last names, indexes it
+with create_search_index and times a few queries of differing
+selectivity. "LIKE" is the old search_by_name query (every match, id
+order); "FTS" is User.search with the default page of 20 ranked rows.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from src.models import User
+from src.search import create_search_index
+from benchmarks.common import print_table
+
+FIRST = ["Ann", "Bob", "Carla", "Dmitri", "Eve", "Farid", "Grace", "Hiro", "Ines", "Jon",
+         "Kemal", "Lena", "Maria", "Nia", "Omar", "Priya", "Quinn", "Rosa", "Sven", "Tara"]
+LAST = ["Smith", "Johnson", "Nguyen", "Garcia", "Okafor", "Muller", "Rossi", "Tanaka",
+        "Kowalski", "Haddad", "Silva", "Larsen", "Novak", "Petrov", "Moreau", "Walsh"]
+QUERIES = ["Smith", "ia Ok", "Larsen 4", "zzz"]
+
+
+def build_database(path, num_users, seed=1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )""")
+    conn.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                     ((f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}", f"user{i}@example.com", "x")
+                      for i in range(num_users)))
+    conn.commit()
+    started = time.perf_counter()
+    create_search_index(conn)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", default="100000,1000000",
+                        help="comma-separated database sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for num_users in (int(n) for n in args.users.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.db")
+            build_seconds = build_database(path, num_users)
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            rows.append((num_users, "(build index)", "", "%.0f" % (build_seconds * 1e3), ""))
+            for query in QUERIES:
+                like, matches = timed(lambda: conn.execute(
+                    "SELECT id, name, email FROM users WHERE name LIKE ?", (f"%{query}%",)).fetchall(),
+                    args.repeat)
+                fts, _ = timed(lambda: User.search(conn, query, "name"), args.repeat)
+                rows.append((num_users, query, len(matches), "%.2f" % (like * 1e3), "%.2f" % (fts * 1e3)))
+            conn.close()
+    print_table(("users", "query", "matches", "LIKE ms", "FTS ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Memory and latency of listing users: fetchall vs streaming vs keyset pages.
+
+    python -m benchmarks.bench_users --users 1000000
+
+Builds a database with ``--users`` rows. "fetchall" reproduces the old
+GET /users (every column, a User per row, one jsonify of the whole
+list); the streamed variants go through the current GET /users via the
+test client, consuming the body chunk by chunk as a client would. Peak
+memory is traced by tracemalloc in a separate pass from the timing.
+The page rows compare a keyset page deep in the table with the OFFSET
+query it replaces.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from flask import jsonify
+from src import create_app
+from src.auth import generate_token
+from src.database import get_db, get_pool
+from src.models import User
+from benchmarks.bench_pool import build_database
+from benchmarks.common import print_table
+
+
+def fetchall_response(app):
+    with app.test_request_context():
+        rows = get_db().execute("SELECT id, name, email, password FROM users").fetchall()
+        users = [User.from_row(row) for row in rows]
+        return len(jsonify([user.to_dict() for user in users]).get_data())
+
+
+def streamed_response(client, path, headers):
+    response = client.get(path, headers=headers, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    return size
+
+
+def measure(fn, trace):
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, args.users)
+        app = create_app(config_override={'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path})
+        client = app.test_client()
+        with app.app_context():
+            headers = {"Authorization": f"Bearer {generate_token(1)}"}
+        ndjson = dict(headers, Accept="application/x-ndjson")
+        deep = args.users - args.page
+
+        def offset_page():
+            conn = sqlite3.connect(path)
+            conn.execute("SELECT id, name, email FROM users ORDER BY id LIMIT ? OFFSET ?",
+                         (args.page, deep)).fetchall()
+            conn.close()
+
+        cases = [
+            ("fetchall + jsonify (old)", lambda: fetchall_response(app)),
+            ("stream JSON array", lambda: streamed_response(client, "/users", headers)),
+            ("stream NDJSON", lambda: streamed_response(client, "/users", ndjson)),
+            ("keyset page, first", lambda: streamed_response(client, f"/users?limit={args.page}", headers)),
+            ("keyset page, deep", lambda: streamed_response(
+                client, f"/users?after_id={deep}&limit={args.page}", headers)),
+            ("OFFSET page, deep (sql only)", offset_page),
+        ]
+        rows = []
+        for name, fn in cases:
+            elapsed, _ = measure(fn, trace=False)
+            _, peak = measure(fn, trace=True)
+            rows.append((name, "%.1f" % (elapsed * 1e3), "%.1f" % (peak / 2**20)))
+        get_pool(app).close()
+    print_table(("users=%d" % args.users, "latency ms", "peak MiB"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Write endpoint throughput: read-after-write vs RETURNING, under concurrent writers.
+
+    python -m benchmarks.bench_writes --threads 1 8 --duration 3
+
+"read-after-write" reproduces the old UserService mutations: create
+inserts, commits and re-reads the row; update checks the user exists,
+updates, commits and reads it back. "returning" is the current service:
+one INSERT/UPDATE ... RETURNING and one commit. Each thread drives the
+app through its own test client, creating users (POST /users) or
+renaming its own user (PUT /user/<id>).
+
+The lock rows run the returning service with a 1 ms busy timeout, so
+writers regularly find the database locked: with one attempt those
+requests fail with 503; with retries and backoff they mostly succeed.
+"""
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+from src import create_app, routes
+from src.auth import generate_token
+from src.database import get_pool
+from src.models import User
+from src.services import UserService
+from benchmarks.bench_pool import build_database
+from benchmarks.common import percentile, print_table, run_threads
+
+
+class ReadAfterWriteService(UserService):
+    """The pre-RETURNING mutations."""
+
+    def create_user(self, data):
+        hashed = self.hasher.hash(data['password'])
+        cursor = self.db.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                                 (data['name'], data['email'], hashed))
+        self.db.commit()
+        return User.get_by_id(self.db, cursor.lastrowid).to_dict(), "User created"
+
+    def update_user(self, user_id, data, current_user):
+        if User.get_by_id(self.db, user_id) is None:
+            return None, "User not found"
+        self.db.execute("UPDATE users SET name = ?, email = ? WHERE id = ?", (data['name'], data['email'], user_id))
+        self.db.commit()
+        self._user_changed(user_id)
+        return User.get_by_id(self.db, user_id).to_dict(), "User updated"
+
+
+def run(service, scenario, threads, duration, num_users, **config):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(path, num_users)
+        app = create_app(config_override=dict({
+            'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path, 'BCRYPT_ROUNDS': 4,
+        }, **config))
+        with app.app_context():
+            tokens = [generate_token(user_id) for user_id in range(1, threads + 1)]
+        emails = itertools.count()
+        latencies = []
+        failures = []
+
+        def worker(index, stop):
+            client = app.test_client()
+            user_id = index + 1
+            headers = {"Authorization": f"Bearer {tokens[index]}"}
+            done = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                if scenario == "create":
+                    response = client.post("/users", json={
+                        "name": "New", "email": f"new{next(emails)}@example.com", "password": "pw"})
+                else:
+                    response = client.put(f"/user/{user_id}", headers=headers, json={
+                        "name": f"User {user_id} {done}", "email": f"user{index}@example.com"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code == 503:
+                    failures.append(1)
+                else:
+                    assert response.status_code in (200, 201), response.status_code
+                done += 1
+            return done
+
+        original = routes.UserService
+        routes.UserService = service
+        try:
+            ops, elapsed = run_threads(threads, worker, duration)
+        finally:
+            routes.UserService = original
+        retries = app.extensions['lock_retry'].metrics()["retries"]
+        get_pool(app).close()
+        app.extensions['hasher'].shutdown()
+        return ((ops - len(failures)) / elapsed, percentile(latencies, 50), percentile(latencies, 99),
+                len(failures), retries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    cases = []
+    for scenario in ("create", "update"):
+        for threads in args.threads:
+            cases.append((scenario, threads, "read-after-write", ReadAfterWriteService, {}))
+            cases.append((scenario, threads, "returning", UserService, {}))
+    threads = max(args.threads)
+    lock = {'DB_BUSY_TIMEOUT': 0.001, 'DB_WRITE_BACKOFF': 0.002}
+    cases.append(("update", threads, "returning, 1 ms lock wait, 1 try", UserService, dict(lock, DB_WRITE_ATTEMPTS=1)))
+    cases.append(("update", threads, "returning, 1 ms lock wait, 5 tries", UserService, dict(lock, DB_WRITE_ATTEMPTS=5)))
+
+    rows = []
+    for scenario, threads, name, service, config in cases:
+        rate, p50, p99, failed, retries = run(service, scenario, threads, args.duration, args.users, **config)
+        rows.append((scenario, threads, name, "%.0f" % rate, "%.2f" % (p50 * 1e3), "%.2f" % (p99 * 1e3),
+                     failed, retries))
+    print_table(("endpoint", "threads", "service", "ok req/s", "p50 ms", "p99 ms", "503s", "retries"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Benchmark suite: User query microbenchmarks plus threaded HTTP
+scenarios, compared against a stored baseline.
+
+    python -m benchmarks.suite                      # run, compare with baseline.json
+    python -m benchmarks.suite --quick --only http.login
+    python -m benchmarks.suite --db /tmp/suite.db   # build 1M users once, reuse after
+    python -m benchmarks.suite --save-baseline      # after an intended change
+
+The database holds ``--users`` users (1M by default) with the search
+index, and the first 100 have the password "password". Microbenchmarks
+call ``User`` directly on one connection. HTTP scenarios drive the app
+through one test client per thread, so they include auth, JSON and the
+pool but not the network. Searches are for full names such as "Ann
+Smith". Logins hash at ``--bcrypt-rounds`` (4 by default, so bcrypt
+does not hide the rest of the request). Each scenario reports calls/s
+and the p50/p99 latency of one call.
+
+Results are compared with ``benchmarks/baseline.json`` when it exists.
+A scenario that looks regressed is measured again, and it fails only
+if the faster run still shows throughput down by more than
+``--tolerance``; the exit status is then 1. Baselines only compare like
+with like: record one on the machine and with the options CI uses.
+"""
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+
+import bcrypt
+from src import create_app
+from src.auth import generate_token
+from src.database import get_pool
+from src.migrations import migrate
+from src.models import User
+from benchmarks.bench_search import FIRST, LAST, build_database
+from benchmarks.common import load_baseline, report, run_scenarios, write_results
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+LOGIN_USERS = 100
+
+
+def prepare_database(path, num_users, rounds):
+    if not os.path.exists(path):
+        build_database(path, num_users)
+    conn = sqlite3.connect(path)
+    # The schema the app runs on, including the ETag version triggers.
+    migrate(conn)
+    password = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds))
+    conn.execute("UPDATE users SET password = ? WHERE id <= ?", (password, LOGIN_USERS))
+    conn.commit()
+    count = conn.execute("SELECT max(id) FROM users").fetchone()[0]
+    conn.close()
+    if count != num_users:
+        raise SystemExit(f"{path} holds {count} users, not {num_users}")
+    return count
+
+
+def micro_scenarios(path, num_users):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    ids = itertools.count()
+    words = itertools.cycle([f"{first} {last}" for first, last in zip(FIRST, LAST)])
+
+    def user_id():
+        return next(ids) * 7919 % num_users + 1
+
+    return conn, [
+        ("user.get_by_id", lambda index: lambda: User.get_by_id(conn, user_id())),
+        ("user.get_by_email", lambda index: lambda: User.get_by_email(conn, "user%d@example.com" % (user_id() - 1))),
+        ("user.list_page", lambda index: lambda: User.list_page(conn, user_id(), 100)),
+        ("user.list_page_json", lambda index: lambda: User.list_page(conn, user_id(), 100, as_json=True)),
+        ("user.search", lambda index: lambda: User.search(conn, next(words), "name")),
+        ("user.search_short", lambda index: lambda: User.search(conn, "Jo", "name")),
+    ]
+
+
+def http_scenarios(app, num_users):
+    with app.app_context():
+        token = generate_token(1)
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = itertools.count()
+    words = itertools.cycle([f"{first} {last}" for first, last in zip(FIRST, LAST)])
+
+    def user_id():
+        return next(ids) * 7919 % num_users + 1
+
+    def client_op(request):
+        def make_op(index):
+            client = app.test_client()
+            return lambda: request(client)
+        return make_op
+
+    return [
+        ("http.login_storm", client_op(lambda client: client.post("/login", json={
+            "email": "user%d@example.com" % (next(ids) % LOGIN_USERS), "password": "password"}))),
+        ("http.get_user", client_op(lambda client: client.get(f"/user/{user_id()}", headers=headers))),
+        ("http.list_users", client_op(lambda client: client.get(
+            f"/users?after_id={user_id()}&limit=100", headers=headers))),
+        ("http.search", client_op(lambda client: client.get(
+            "/search", query_string={"q": next(words)}, headers=headers))),
+    ]
+
+
+def run(path, args, config, baseline):
+    num_users = prepare_database(path, config["users"], args.bcrypt_rounds)
+    app = create_app(config_override={
+        'TESTING': True, 'DEBUG': False, 'DATABASE_NAME': path, 'BCRYPT_ROUNDS': args.bcrypt_rounds,
+        'SLOW_QUERY_THRESHOLD': float("inf"),
+    })
+    conn, micro = micro_scenarios(path, num_users)
+    scenarios = [(name, make_op, 1, 1) for name, make_op in micro]
+    scenarios += [(name, make_op, args.threads, 1) for name, make_op in http_scenarios(app, num_users)]
+    try:
+        return run_scenarios([scenario for scenario in scenarios if not args.only or args.only in scenario[0]],
+                             config["duration"], baseline, args.tolerance)
+    finally:
+        conn.close()
+        get_pool(app).close()
+        app.extensions['hasher'].shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="shorter runs and fewer users")
+    parser.add_argument("--duration", type=float, help="seconds per scenario (default 2, or 0.5 with --quick)")
+    parser.add_argument("--threads", type=int, default=8, help="threads for the HTTP scenarios")
+    parser.add_argument("--users", type=int, help="users in the database (default 1000000, or 100000 with --quick)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--db", help="build the database at this path if it is missing, and keep it")
+    parser.add_argument("--only", help="run only scenarios whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args(argv)
+    if args.only and args.save_baseline:
+        parser.error("--save-baseline records every scenario; drop --only")
+
+    config = {
+        "duration": args.duration or (0.5 if args.quick else 2.0),
+        "threads": args.threads,
+        "users": args.users or (100_000 if args.quick else 1_000_000),
+        "bcrypt_rounds": args.bcrypt_rounds,
+    }
+    baseline = None if args.save_baseline else load_baseline(args.baseline, config)
+    if args.db:
+        results = run(args.db, args, config, baseline)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            results = run(os.path.join(directory, "suite.db"), args, config, baseline)
+
+    if args.output:
+        write_results(args.output, "messy-migration", config, results)
+    if args.save_baseline:
+        write_results(args.baseline, "messy-migration", config, results)
+    return report(results, baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import argparse
+import os
+import sqlite3
+import sys
+from src.config import Config
+from src.hashing import PasswordHasher
+from src.importer import UserImporter, get_reader
+
+def import_users_main(path, db_path='users.db', format=None, chunk_size=Config.IMPORT_CHUNK_SIZE,
+                      workers=None, rounds=Config.BCRYPT_ROUNDS):
+    """Import users from a CSV or NDJSON file (by extension unless ``format``
+    is given), hashing plain passwords on ``workers`` threads."""
+    reader = get_reader(format or os.path.splitext(path)[1].lstrip('.').lower())
+    hasher = PasswordHasher(rounds=rounds, workers=workers or os.cpu_count() or 1, queue_size=0)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        with open(path, 'rb') as stream:
+            return UserImporter(conn, hasher, chunk_size).run(reader(stream))
+    finally:
+        conn.close()
+        hasher.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk-import users from a CSV or NDJSON file.")
+    parser.add_argument('path')
+    parser.add_argument('--db', default='users.db')
+    parser.add_argument('--format', choices=['csv', 'ndjson'])
+    parser.add_argument('--chunk-size', type=int, default=Config.IMPORT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, help="bcrypt threads (default: one per CPU)")
+    parser.add_argument('--rounds', type=int, default=Config.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+    summary = import_users_main(args.path, args.db, args.format, args.chunk_size, args.workers, args.rounds)
+    for error in summary['errors']:
+        print(f"row {error['row']}: {error['email']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {summary['imported']} users, {summary['failed']} failed")
@@ -1,20 +1,19 @@
 import sqlite3
 import bcrypt
+from src.migrations import migrate
+from src.search import drop_search_index
 
 def init_db_main(db_path='users.db'):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
+    # Starts over with sample data; use migrate.py to upgrade a database in place.
+    drop_search_index(conn)
     cursor.execute('DROP TABLE IF EXISTS users')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL
-    )
-    ''')
+    cursor.execute('DROP TABLE IF EXISTS users_fts_backfill')
+    cursor.execute('DROP TABLE IF EXISTS user_versions')
+    cursor.execute('DROP TABLE IF EXISTS schema_version')
+    migrate(conn)
 
     users = [
         ('John Doe', 'john@example.com', 'password123'),
@@ -0,0 +1,32 @@
+import argparse
+import sqlite3
+from src.config import Config
+from src.migrations import Migrator
+
+def migrate_main(db_path='users.db', batch_size=Config.MIGRATION_BATCH_SIZE,
+                 pause=Config.MIGRATION_BATCH_PAUSE, target=None):
+    """Apply pending migrations to ``db_path``; return a report per migration."""
+    conn = sqlite3.connect(db_path, timeout=Config.DB_BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    try:
+        return Migrator(conn, batch_size=batch_size, pause=pause).run(target)
+    finally:
+        conn.close()
+
+def print_reports(reports):
+    if not reports:
+        print("Database is up to date")
+    for report in reports:
+        print("%(version)3d  %(name)-28s %(rows)9d rows  %(batches)6d batches  %(seconds)8.2fs"
+              "  %(rows_per_second)9.0f rows/s  lock max %(max_lock_seconds).3fs"
+              " total %(lock_seconds).2fs" % report)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument('db_path', nargs='?', default='users.db')
+    parser.add_argument('--batch-size', type=int, default=Config.MIGRATION_BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=Config.MIGRATION_BATCH_PAUSE,
+                        help="seconds to leave the write lock free between batches")
+    parser.add_argument('--target', type=int, help="stop after this version")
+    args = parser.parse_args()
+    print_reports(migrate_main(args.db_path, args.batch_size, args.pause, args.target))
@@ -1,8 +1,15 @@
 from flask import Flask
 from .config import Config
+from . import auth
 from . import database
 from . import routes
+from . import metrics
 from . import errors
+from . import hashing
+from . import migrations
+from . import instrumentation
+from . import json_provider
+from . import versions
 
 def create_app(config_class=Config, config_override=None):
     app = Flask(__name__)
@@ -10,9 +17,16 @@ def create_app(config_class=Config, config_override=None):
     if config_override:
         app.config.update(config_override)
 
+    json_provider.init_app(app)
+    instrumentation.init_app(app)
     database.init_app(app)
+    migrations.init_app(app)
+    auth.init_app(app)
+    versions.init_app(app)
+    hashing.init_app(app)
     errors.init_app(app)
 
     app.register_blueprint(routes.bp)
+    app.register_blueprint(metrics.bp)
 
     return app
@@ -1,9 +1,12 @@
+import hashlib
 import jwt
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify, current_app, g
 from .models import User
 from .database import get_db
+from .cache import TTLCache
+from .instrumentation import timed
 
 def generate_token(user_id):
     """Generates the Auth Token"""
@@ -11,16 +14,48 @@ def generate_token(user_id):
         payload = {
             'exp': datetime.now(timezone.utc) + timedelta(days=1),
             'iat': datetime.now(timezone.utc),
-            'sub': user_id
+            # PyJWT rejects non-string subjects when decoding.
+            'sub': str(user_id)
         }
-        return jwt.encode(
-            payload,
-            current_app.config.get('SECRET_KEY'),
-            algorithm='HS256'
-        )
+        with timed('jwt'):
+            return jwt.encode(
+                payload,
+                current_app.config.get('SECRET_KEY'),
+                algorithm='HS256'
+            )
     except Exception as e:
         return e
 
+def verify_token(token):
+    """Returns the user id a token was issued for, decoding each distinct
+    token only once until it expires or leaves the cache."""
+    cache = current_app.extensions['token_cache']
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    user_id = cache.get(key)
+    if user_id is None:
+        with timed('jwt'):
+            # The cache keeps an entry no longer than its exp, so one is required.
+            data = jwt.decode(token, current_app.config.get('SECRET_KEY'), algorithms=["HS256"],
+                              options={"require": ["exp"]})
+        try:
+            user_id = int(data['sub'])
+        except (KeyError, ValueError):
+            raise jwt.InvalidTokenError("Invalid subject")
+        cache.set(key, user_id, expires_at=data['exp'])
+    return user_id
+
+def load_user(db, user_id):
+    cache = current_app.extensions['user_cache']
+    user = cache.get(user_id)
+    if user is None:
+        user = User.get_by_id(db, user_id)
+        if user is not None:
+            cache.set(user_id, user)
+    return user
+
+def get_user_cache():
+    return current_app.extensions['user_cache']
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -36,9 +71,7 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
 
         try:
-            data = jwt.decode(token, current_app.config.get('SECRET_KEY'), algorithms=["HS256"])
-            db = get_db()
-            current_user = User.get_by_id(db, data['sub'])
+            current_user = load_user(get_db(), verify_token(token))
             if not current_user:
                  return jsonify({'message': 'User not found'}), 401
             g.current_user = current_user
@@ -50,3 +83,7 @@ def token_required(f):
         return f(*args, **kwargs)
 
     return decorated
+
+def init_app(app):
+    app.extensions['token_cache'] = TTLCache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+    app.extensions['user_cache'] = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
@@ -5,3 +5,47 @@ class Config:
     DEBUG = True
     TESTING = False
     SECRET_KEY = os.environ.get('SECRET_KEY', 'a-very-secret-key')
+    # Connections shared by request threads, and how long a request waits for one.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+    # How long a statement retries while another connection holds the write lock.
+    DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5.0))
+    # Tries per write that still finds the database locked, and the first backoff between them.
+    DB_WRITE_ATTEMPTS = int(os.environ.get('DB_WRITE_ATTEMPTS', 3))
+    DB_WRITE_BACKOFF = float(os.environ.get('DB_WRITE_BACKOFF', 0.05))
+    DB_WRITE_MAX_BACKOFF = float(os.environ.get('DB_WRITE_MAX_BACKOFF', 1.0))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+    # Negative values are KiB per connection, as in SQLite's PRAGMA cache_size.
+    DB_CACHE_SIZE = int(os.environ.get('DB_CACHE_SIZE', -16000))
+    DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+    # Verified tokens are cached until their exp (at most TOKEN_CACHE_TTL seconds).
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    TOKEN_CACHE_TTL = float(os.environ.get('TOKEN_CACHE_TTL', 300))
+    # Authenticated users; other worker processes may see a change this late.
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30))
+    # bcrypt cost factor; raising it rehashes each password on its next login.
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+    # Threads running bcrypt, and how many more calls may wait before 503s.
+    HASHER_WORKERS = int(os.environ.get('HASHER_WORKERS', os.cpu_count() or 1))
+    HASHER_QUEUE_SIZE = int(os.environ.get('HASHER_QUEUE_SIZE', 16))
+    HASHER_RETRY_AFTER = int(os.environ.get('HASHER_RETRY_AFTER', 1))
+    # GET /users: largest page a client may ask for, and rows per batch when streaming.
+    USERS_PAGE_MAX = int(os.environ.get('USERS_PAGE_MAX', 1000))
+    USERS_STREAM_BATCH = int(os.environ.get('USERS_STREAM_BATCH', 1000))
+    # GET /search: results per page unless ?limit= says otherwise, and the largest allowed.
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_PAGE_MAX = int(os.environ.get('SEARCH_PAGE_MAX', 100))
+    # Rows per validate/hash/insert round, and per write transaction, of a bulk import.
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+    # Apply pending schema migrations when the app starts (see migrate.py).
+    MIGRATE_ON_STARTUP = os.environ.get('MIGRATE_ON_STARTUP', '').lower() in ('1', 'true', 'yes')
+    # Rows per write transaction of a data migration, and the pause between them.
+    MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 1000))
+    MIGRATION_BATCH_PAUSE = float(os.environ.get('MIGRATION_BATCH_PAUSE', 0.01))
+    # Time SQL, bcrypt and JWT work per request for the /metrics histograms.
+    QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION', 'true').lower() in ('1', 'true', 'yes')
+    # Statements slower than this many seconds are logged with their query plan.
+    SLOW_QUERY_THRESHOLD = float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.1))
+    # Encode JSON responses with orjson when it is installed.
+    FAST_JSON = os.environ.get('FAST_JSON', 'true').lower() in ('1', 'true', 'yes')
@@ -1,16 +1,253 @@
+import random
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from flask import g, current_app
+from .instrumentation import InstrumentedConnection, current_stats, get_slow_query_log
+
+class PoolTimeout(Exception):
+    pass
+
+class DatabaseBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Database is locked by other writers")
+        self.retry_after = retry_after
+
+class ConnectionPool:
+    """A bounded pool of SQLite connections shared by all request threads.
+
+    Connections are opened lazily, up to ``size``, and set up once with WAL
+    journaling, ``synchronous=NORMAL``, a memory map, a page cache and a
+    prepared-statement cache, so requests skip the file open, schema parse
+    and statement compilation a fresh connection would pay. A request that
+    finds every connection in use waits up to ``timeout`` seconds, then
+    ``PoolTimeout`` is raised.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, busy_timeout=5.0,
+                 mmap_size=256 * 1024 * 1024, cache_size=-16000, cached_statements=256):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._acquisitions = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._timeouts = 0
+        self._peak_in_use = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        return conn
+
+    def acquire(self):
+        started = time.perf_counter()
+        waited = False
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+            while not self._idle and self._open >= self.size:
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - started)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if self._idle or self._open < self.size:
+                        break
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._open += 1
+            self._acquisitions += 1
+            in_use = self._open - len(self._idle)
+            self._peak_in_use = max(self._peak_in_use, in_use)
+            if waited:
+                wait = time.perf_counter() - started
+                self._waits += 1
+                self._wait_seconds += wait
+                self._max_wait_seconds = max(self._max_wait_seconds, wait)
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            # Never hand the next request a half-finished transaction.
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+            self._open -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            in_use = self._open - len(self._idle)
+            return {
+                "size": self.size,
+                "open": self._open,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "saturation": in_use / self.size if self.size else 0.0,
+                "peak_in_use": self._peak_in_use,
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_seconds": self._wait_seconds / self._waits if self._waits else 0.0,
+                "max_wait_seconds": self._max_wait_seconds,
+            }
+
+def is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "database is locked" in str(error) or "database is busy" in str(error))
+
+@contextmanager
+def transaction(db, immediate=False):
+    """One unit of work: commit when the block ends, roll back if it raises.
+
+    By default the transaction starts with the block's first write, so a
+    single-statement mutation costs that statement and one commit.
+    ``immediate`` takes the write lock up front, for blocks that read
+    before they write.
+    """
+    if immediate:
+        db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+class LockRetry:
+    """Runs units of work again when SQLite reports the database locked.
+
+    The busy timeout already makes each statement wait for the lock; a
+    unit still failing after that is retried up to ``attempts`` times in
+    all, sleeping an exponentially growing, jittered delay between tries.
+    After the last one ``DatabaseBusy`` is raised.
+    """
+
+    def __init__(self, attempts=3, backoff=0.05, max_backoff=1.0, retry_after=1):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._retries = 0
+        self._gave_up = 0
+
+    def run(self, db, fn, *args, immediate=False):
+        with self._lock:
+            self._runs += 1
+        for attempt in range(self.attempts):
+            try:
+                with transaction(db, immediate):
+                    return fn(*args)
+            except sqlite3.OperationalError as e:
+                if not is_locked(e):
+                    raise
+                if attempt + 1 == self.attempts:
+                    with self._lock:
+                        self._gave_up += 1
+                    raise DatabaseBusy(self.retry_after) from e
+            with self._lock:
+                self._retries += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "runs": self._runs,
+                "retries": self._retries,
+                "gave_up": self._gave_up,
+            }
+
+def get_lock_retry():
+    return current_app.extensions['lock_retry']
+
+def create_pool(config):
+    return ConnectionPool(
+        config['DATABASE_NAME'],
+        size=config['DB_POOL_SIZE'],
+        timeout=config['DB_POOL_TIMEOUT'],
+        busy_timeout=config['DB_BUSY_TIMEOUT'],
+        mmap_size=config['DB_MMAP_SIZE'],
+        cache_size=config['DB_CACHE_SIZE'],
+        cached_statements=config['DB_STATEMENT_CACHE_SIZE'],
+    )
+
+def get_pool(app=None):
+    return (app or current_app).extensions['db_pool']
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(current_app.config['DATABASE_NAME'])
-        g.db.row_factory = sqlite3.Row
+        conn = get_pool().acquire()
+        stats = current_stats()
+        g.db = InstrumentedConnection(conn, stats, get_slow_query_log()) if stats is not None else conn
     return g.db
 
+@contextmanager
+def borrowed_db():
+    """A pooled connection for the block only, instrumented like get_db's.
+    For work that outlives the view, such as a streamed response, which
+    would otherwise keep the request's connection until its last byte."""
+    pool = get_pool()
+    conn = pool.acquire()
+    stats = current_stats()
+    try:
+        yield InstrumentedConnection(conn, stats, get_slow_query_log()) if stats is not None else conn
+    finally:
+        pool.release(conn)
+
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        get_pool().release(getattr(db, 'conn', db))
 
 def init_app(app):
+    app.extensions['db_pool'] = create_pool(app.config)
+    app.extensions['lock_retry'] = LockRetry(
+        attempts=app.config['DB_WRITE_ATTEMPTS'],
+        backoff=app.config['DB_WRITE_BACKOFF'],
+        max_backoff=app.config['DB_WRITE_MAX_BACKOFF'],
+    )
     app.teardown_appcontext(close_db)
@@ -1,4 +1,6 @@
 from flask import jsonify
+from .database import DatabaseBusy, PoolTimeout
+from .hashing import HasherBusy
 
 def handle_error(status_code, message):
     return jsonify({"error": message}), status_code
@@ -21,9 +23,28 @@ def forbidden_error(message="Forbidden"):
 def conflict_error(message="Conflict"):
     return handle_error(409, message)
 
+def service_unavailable_error(message="Service Unavailable"):
+    return handle_error(503, message)
+
+def pool_timeout_error(error):
+    return service_unavailable_error("Database is busy, try again")
+
+def database_busy_error(error):
+    response, status = service_unavailable_error("Database is busy, try again")
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, status
+
+def hasher_busy_error(error):
+    response, status = service_unavailable_error("Too many password checks in progress, try again")
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, status
+
 def init_app(app):
     app.register_error_handler(404, not_found_error)
     app.register_error_handler(500, internal_error)
+    app.register_error_handler(PoolTimeout, pool_timeout_error)
+    app.register_error_handler(DatabaseBusy, database_busy_error)
+    app.register_error_handler(HasherBusy, hasher_busy_error)
     # Custom error handlers can be registered here if needed
     # For example:
     # app.register_error_handler(AuthError, handle_auth_error)
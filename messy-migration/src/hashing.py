@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import current_app
+from .instrumentation import timed
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """Runs bcrypt on a fixed number of worker threads.
+
+    bcrypt releases the GIL, so ``workers`` threads bound how many cores
+    hashing may take, whatever the number of request threads. At most
+    ``queue_size`` further calls wait for a worker; beyond that ``hash`` and
+    ``verify`` raise ``HasherBusy`` at once instead of queueing. With
+    ``workers=0`` hashing runs inline on the calling thread, unbounded.
+    """
+
+    def __init__(self, rounds=12, workers=2, queue_size=16, retry_after=1):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt") if workers else None
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashes = 0
+        self._busy_seconds = 0.0
+        self._queued_seconds = 0.0
+
+    def _submit(self, fn, *args):
+        # The caller holds a slot; it is given back before the result is set.
+        submitted = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._queued_seconds += started - submitted
+                    self._busy_seconds += finished - started
+                    self._in_flight -= 1
+                    self._completed += 1
+                self._slots.release()
+
+        return self._executor.submit(timed)
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            with timed('bcrypt'):
+                return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusy(self.retry_after)
+        with timed('bcrypt'):
+            return self._submit(fn, *args).result()
+
+    def _hashpw(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+
+    def hash(self, password):
+        return self._run(self._hashpw, password)
+
+    def hash_many(self, passwords):
+        """Hash ``passwords`` on every worker, returning hashes in order.
+
+        For bulk imports: rather than raising ``HasherBusy`` this waits for
+        free slots, and it holds at most ``workers`` of them, so logins
+        still find room in the queue while an import runs.
+        """
+        with timed('bcrypt'):
+            if self._executor is None:
+                return [self._hashpw(password) for password in passwords]
+            window = threading.BoundedSemaphore(self.workers)
+            futures = []
+            for password in passwords:
+                window.acquire()
+                self._slots.acquire()
+                future = self._submit(self._hashpw, password)
+                future.add_done_callback(lambda future: window.release())
+                futures.append(future)
+            return [future.result() for future in futures]
+
+    def verify(self, password, hashed):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed):
+        # Hashes look like b"$2b$12$...": the cost sits between the 2nd and 3rd "$".
+        try:
+            return int(hashed.split(b"$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def record_rehash(self):
+        with self._lock:
+            self._rehashes += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "saturation": self._in_flight / (self.workers + self.queue_size) if self.workers else 0.0,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "rehashes": self._rehashes,
+                "avg_queue_seconds": self._queued_seconds / self._completed if self._completed else 0.0,
+                "avg_hash_seconds": self._busy_seconds / self._completed if self._completed else 0.0,
+            }
+
+def get_hasher():
+    return current_app.extensions['hasher']
+
+def init_app(app):
+    app.extensions['hasher'] = PasswordHasher(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        workers=app.config['HASHER_WORKERS'],
+        queue_size=app.config['HASHER_QUEUE_SIZE'],
+        retry_after=app.config['HASHER_RETRY_AFTER'],
+    )
@@ -0,0 +1,147 @@
+import codecs
+import csv
+import json
+import re
+from itertools import islice
+from .database import LockRetry
+from .services import EMAIL_REGEX
+
+# "$2b$12$" followed by 22 characters of salt and 31 of hash.
+BCRYPT_REGEX = re.compile(rb'^\$2[aby]\$\d\d\$[./A-Za-z0-9]{53}$')
+
+class ImportFormatError(ValueError):
+    pass
+
+def read_csv(stream):
+    """Yield (row number, record) from a CSV byte stream with a header row."""
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8'))
+    number = 0
+    try:
+        for number, record in enumerate(reader, 1):
+            yield number, record
+    except csv.Error as e:
+        raise ImportFormatError(f"Invalid CSV in row {number + 1}: {e}") from None
+
+def read_ndjson(stream):
+    """Yield (row number, record) from NDJSON bytes; blank lines are skipped
+    and a line that is not a JSON object yields None."""
+    number = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+READERS = {
+    'csv': read_csv,
+    'text/csv': read_csv,
+    'ndjson': read_ndjson,
+    'application/x-ndjson': read_ndjson,
+}
+
+def get_reader(kind):
+    try:
+        return READERS[kind]
+    except KeyError:
+        raise ImportFormatError("Send text/csv or application/x-ndjson") from None
+
+def _check(record):
+    """Return (name, email, password, password_hash) or an error message."""
+    if record is None:
+        return "Invalid JSON"
+    name = record.get('name')
+    email = record.get('email')
+    password = record.get('password') or None
+    password_hash = record.get('password_hash') or None
+    if not name or not email or not (password or password_hash):
+        return "Missing required fields"
+    if not all(isinstance(value, str) for value in (name, email, password or "", password_hash or "")):
+        return "Fields must be strings"
+    if not re.match(EMAIL_REGEX, email):
+        return "Invalid email format"
+    if password_hash is not None:
+        password_hash = password_hash.encode('utf-8')
+        if not BCRYPT_REGEX.match(password_hash):
+            return "Invalid bcrypt hash"
+    return name, email, password, password_hash
+
+class UserImporter:
+    """Inserts users from a stream of (row number, record) pairs.
+
+    Records carry ``name``, ``email`` and either ``password`` or an existing
+    bcrypt ``password_hash``. Every ``chunk_size`` records are validated,
+    their plain passwords hashed together on the hasher's workers, and the
+    rows inserted with one ``executemany`` in one write transaction. Rows
+    that fail, including emails already taken, are reported by row number
+    and do not stop the import.
+    """
+
+    def __init__(self, db, hasher, chunk_size=1000, lock_retry=None):
+        self.db = db
+        self.hasher = hasher
+        self.chunk_size = chunk_size
+        self.lock_retry = lock_retry or LockRetry(attempts=1)
+        self.imported = 0
+        self.errors = []
+
+    def _fail(self, number, email, message):
+        self.errors.append({"row": number, "email": email, "error": message})
+
+    def _insert_locked(self, rows):
+        """Return the rows inserted and those whose email was taken."""
+        emails = [email for _, _, email, _ in rows]
+        taken = set()
+        for start in range(0, len(emails), 500):
+            batch = emails[start:start + 500]
+            taken.update(row[0] for row in self.db.execute(
+                f"SELECT email FROM users WHERE email IN ({','.join('?' * len(batch))})", batch))
+        values = []
+        conflicts = []
+        for number, name, email, password_hash in rows:
+            if email in taken:
+                conflicts.append((number, email))
+            else:
+                taken.add(email)
+                values.append((name, email, password_hash))
+        self.db.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", values)
+        return values, conflicts
+
+    def _insert(self, rows):
+        # The write lock is taken up front so no other writer can claim an
+        # email between the conflict check and the insert. A retried chunk
+        # checks again, so conflicts are only reported once it commits.
+        values, conflicts = self.lock_retry.run(self.db, self._insert_locked, rows, immediate=True)
+        for number, email in conflicts:
+            self._fail(number, email, "Email already exists")
+        self.imported += len(values)
+
+    def import_chunk(self, records):
+        checked = []
+        for number, record in records:
+            result = _check(record)
+            if isinstance(result, str):
+                self._fail(number, record.get('email') if record else None, result)
+            else:
+                checked.append((number, *result))
+        plain = [password for _, _, _, password, password_hash in checked if password_hash is None]
+        hashes = iter(self.hasher.hash_many(plain))
+        rows = [(number, name, email, password_hash or next(hashes))
+                for number, name, email, _, password_hash in checked]
+        if rows:
+            self._insert(rows)
+
+    def run(self, records):
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                return self.summary()
+            self.import_chunk(chunk)
+
+    def summary(self):
+        return {"imported": self.imported, "failed": len(self.errors), "errors": self.errors}
@@ -0,0 +1,293 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+
+logger = logging.getLogger(__name__ + ".slow_queries")
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMPONENTS = ("db", "bcrypt", "jwt")
+# Component metrics that only ever grow; the others are point-in-time values.
+COUNTERS = frozenset((
+    "hits", "misses", "evictions", "expirations", "invalidations",
+    "acquisitions", "waits", "timeouts",
+    "runs", "retries", "gave_up",
+    "completed", "rejected", "rehashes",
+    "lookups", "unavailable", "not_modified",
+))
+
+class RequestStats:
+    """Time and work one request spent in each component."""
+
+    __slots__ = ("db", "bcrypt", "jwt", "statements", "rows")
+
+    def __init__(self):
+        self.db = 0.0
+        self.bcrypt = 0.0
+        self.jwt = 0.0
+        self.statements = 0
+        self.rows = 0
+
+def current_stats():
+    return g.get('request_stats') if has_request_context() else None
+
+@contextmanager
+def timed(component):
+    """Add the time spent in the block to the current request's ``component``."""
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, component, getattr(stats, component) + time.perf_counter() - started)
+
+class SlowQueryLog:
+    """Logs statements slower than ``threshold`` seconds, with their query
+    plan. The plan is captured once per distinct SQL text."""
+
+    def __init__(self, threshold, max_plans=256):
+        self.threshold = threshold
+        self.max_plans = max_plans
+        self._plans = {}
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _plan(self, conn, sql, params):
+        plan = self._plans.get(sql)
+        if plan is None:
+            try:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plan = "; ".join(row[3] for row in rows)
+            except Exception as e:
+                plan = f"unavailable ({e})"
+            with self._lock:
+                if len(self._plans) < self.max_plans:
+                    self._plans[sql] = plan
+        return plan
+
+    def record(self, conn, sql, params, elapsed, rows):
+        with self._lock:
+            self.count += 1
+        endpoint = request.endpoint if has_request_context() else None
+        plan = self._plan(conn, sql, params) if params is not None else "executemany"
+        logger.warning("slow query %.1f ms, %d rows, endpoint=%s: %s | plan: %s",
+                       elapsed * 1e3, rows, endpoint, " ".join(sql.split()), plan)
+
+class InstrumentedCursor:
+    """Counts the rows fetched through a cursor and the time spent fetching."""
+
+    __slots__ = ("_cursor", "_conn", "_sql", "_params", "_elapsed", "_rows")
+
+    def __init__(self, cursor, conn, sql, params, elapsed):
+        self._cursor = cursor
+        self._conn = conn
+        self._sql = sql
+        self._params = params
+        self._elapsed = elapsed
+        self._rows = 0
+
+    def _fetched(self, started, rows, done):
+        elapsed = time.perf_counter() - started
+        self._elapsed += elapsed
+        self._rows += rows
+        stats = self._conn.stats
+        stats.db += elapsed
+        stats.rows += rows
+        if done:
+            self._conn._check_slow(self._sql, self._params, self._elapsed, self._rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None, True)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        self._fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(256)
+            if not rows:
+                return
+            yield from rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Wraps a pooled connection for one request, adding each statement's
+    time, and the rows it returned or changed, to ``stats``."""
+
+    def __init__(self, conn, stats, slow_log=None):
+        self.conn = conn
+        self.stats = stats
+        self.slow_log = slow_log
+
+    def _check_slow(self, sql, params, elapsed, rows):
+        if self.slow_log is not None and elapsed >= self.slow_log.threshold:
+            self.slow_log.record(self.conn, sql, params, elapsed, rows)
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        cursor = self.conn.execute(sql, params)
+        elapsed = time.perf_counter() - started
+        self.stats.db += elapsed
+        self.stats.statements += 1
+        if cursor.description is None:
+            rows = max(cursor.rowcount, 0)
+            self.stats.rows += rows
+            self._check_slow(sql, params, elapsed, rows)
+            return cursor
+        return InstrumentedCursor(cursor, self, sql, params, elapsed)
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        cursor = self.conn.executemany(sql, seq_of_params)
+        elapsed = time.perf_counter() - started
+        rows = max(cursor.rowcount, 0)
+        self.stats.db += elapsed
+        self.stats.statements += 1
+        self.stats.rows += rows
+        self._check_slow(sql, None, elapsed, rows)
+        return cursor
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            self.conn.commit()
+        finally:
+            self.stats.db += time.perf_counter() - started
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+
+class RequestMetrics:
+    """Per-endpoint latency histograms: the whole request, and the part of
+    it spent in each of ``COMPONENTS``, plus statement and row counters."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, endpoint, elapsed, stats):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    "histograms": {name: Histogram(self.buckets) for name in ("request",) + COMPONENTS},
+                    "statements": 0,
+                    "rows": 0,
+                }
+            histograms = entry["histograms"]
+            histograms["request"].observe(elapsed)
+            for component in COMPONENTS:
+                histograms[component].observe(getattr(stats, component))
+            entry["statements"] += stats.statements
+            entry["rows"] += stats.rows
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "histograms": {name: (list(h.counts), h.sum) for name, h in entry["histograms"].items()},
+                    "statements": entry["statements"],
+                    "rows": entry["rows"],
+                } for endpoint, entry in self._endpoints.items()
+            }
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus(request_metrics, components, slow_queries):
+    """Prometheus text exposition of ``request_metrics``, the numeric
+    values of ``components`` ({component: metrics dict}) and the slow query
+    count. Keys in ``COUNTERS`` become ``_total`` counters, the rest gauges."""
+    lines = []
+    snapshot = request_metrics.snapshot()
+    for name, help_text in (("request", "Request latency"),) + tuple(
+            (component, f"Time each request spent in {component}") for component in COMPONENTS):
+        metric = "users_api_request_seconds" if name == "request" else f"users_api_request_{name}_seconds"
+        lines.append(f"# HELP {metric} {help_text}.")
+        lines.append(f"# TYPE {metric} histogram")
+        for endpoint, entry in sorted(snapshot.items()):
+            counts, total = entry["histograms"][name]
+            label = f'endpoint="{_label(endpoint)}"'
+            cumulative = 0
+            for bound, count in zip(request_metrics.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{metric}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label}}} {total!r}")
+            lines.append(f"{metric}_count{{{label}}} {cumulative}")
+    for key, help_text in (("statements", "SQL statements executed"), ("rows", "Rows returned or changed by SQL")):
+        metric = f"users_api_db_{key}_total"
+        lines.append(f"# HELP {metric} {help_text}.")
+        lines.append(f"# TYPE {metric} counter")
+        for endpoint, entry in sorted(snapshot.items()):
+            lines.append(f'{metric}{{endpoint="{_label(endpoint)}"}} {entry[key]}')
+    lines.append("# HELP users_api_slow_queries_total Statements slower than SLOW_QUERY_THRESHOLD.")
+    lines.append("# TYPE users_api_slow_queries_total counter")
+    lines.append(f"users_api_slow_queries_total {slow_queries}")
+    for component, values in components.items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if key in COUNTERS:
+                    metric = f"users_api_{component}_{key}_total"
+                    lines.append(f"# TYPE {metric} counter")
+                else:
+                    metric = f"users_api_{component}_{key}"
+                    lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value!r}")
+    return "\n".join(lines) + "\n"
+
+def _before_request():
+    g.request_stats = RequestStats()
+    g.request_started = time.perf_counter()
+
+def _teardown_request(error=None):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - g.pop('request_started')
+    endpoint = request.url_rule.endpoint if request.url_rule is not None else "unmatched"
+    current_app.extensions['request_metrics'].observe(endpoint, elapsed, stats)
+
+def get_slow_query_log(app=None):
+    return (app or current_app).extensions['slow_query_log']
+
+def init_app(app):
+    app.extensions['request_metrics'] = RequestMetrics()
+    app.extensions['slow_query_log'] = SlowQueryLog(app.config['SLOW_QUERY_THRESHOLD'])
+    if app.config['QUERY_INSTRUMENTATION']:
+        app.before_request(_before_request)
+        app.teardown_request(_teardown_request)
@@ -0,0 +1,59 @@
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the encoding and decoding
+    when it is installed, and the stdlib otherwise.
+
+    Output follows the provider's settings as before: sorted keys, the
+    same ``default`` hook for dates, UUIDs and dataclasses, and indented
+    only when ``compact`` says so (in debug mode by default). Values
+    orjson refuses, such as integers wider than 64 bits, are encoded by
+    the stdlib instead, which accepts them or raises as it did before.
+    """
+
+    def _options(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+def json_response(text, status=200):
+    """A response for JSON text that is already encoded, such as rows
+    SQLite serialized itself with json_object."""
+    return current_app.response_class(text, status=status, mimetype='application/json')
+
+def init_app(app):
+    if app.config['FAST_JSON']:
+        app.json = FastJSONProvider(app)
@@ -0,0 +1,25 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from .database import get_pool
+from .instrumentation import get_slow_query_log, render_prometheus
+
+bp = Blueprint('metrics', __name__)
+
+def _components():
+    return {
+        "db_pool": get_pool().metrics(),
+        "db_writes": current_app.extensions['lock_retry'].metrics(),
+        "token_cache": current_app.extensions['token_cache'].metrics(),
+        "user_cache": current_app.extensions['user_cache'].metrics(),
+        "hasher": current_app.extensions['hasher'].metrics(),
+        "versions": current_app.extensions['versions'].metrics(),
+    }
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus text format, or the component metrics as JSON for
+    clients that ask for ``application/json``."""
+    components = _components()
+    if request.accept_mimetypes.best_match(['text/plain', 'application/json']) == 'application/json':
+        return jsonify(components), 200
+    body = render_prometheus(current_app.extensions['request_metrics'], components, get_slow_query_log().count)
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8'), 200
@@ -0,0 +1,242 @@
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from . import search, versions
+from .database import get_pool
+
+VERSION_TABLE = """CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    applied_at REAL
+)"""
+
+class Migration:
+    """One numbered schema change, applied in a single transaction."""
+
+    batched = False
+
+    def __init__(self, version, name, statements=()):
+        self.version = version
+        self.name = name
+        self.statements = statements
+
+    def apply(self, db):
+        for statement in self.statements:
+            db.execute(statement)
+
+class BatchedMigration(Migration, ABC):
+    """A long data migration split into short transactions.
+
+    ``start`` runs once, in the transaction that records the migration as
+    started. ``run_batch`` is then called, each time in its own write
+    transaction, until it reports it is done; it must keep its position
+    in the database, so an interrupted migration resumes where it stopped.
+    ``finish`` runs in the transaction that marks the migration applied.
+    """
+
+    batched = True
+
+    def start(self, db):
+        pass
+
+    @abstractmethod
+    def run_batch(self, db, batch_size):
+        """Migrate up to ``batch_size`` rows; return (rows, done)."""
+
+    def finish(self, db):
+        pass
+
+class UsersSearchIndex(BatchedMigration):
+    """Index existing users in users_fts a range of ids at a time.
+
+    While the backfill runs, the sync triggers only touch rows the index
+    already holds: ids up to the backfill cursor, and ids above the
+    highest one that existed when it started. Other rows are indexed by
+    the backfill itself, with whatever values they have by then.
+    """
+
+    BACKFILL_TRIGGERS = tuple(
+        trigger.replace(" BEGIN", f" WHEN {row}.id <= (SELECT after_id FROM users_fts_backfill)"
+                                  f" OR {row}.id > (SELECT high_id FROM users_fts_backfill) BEGIN", 1)
+        for trigger, row in zip(search.TRIGGERS, ("new", "old", "old"))
+    )
+
+    def __init__(self):
+        super().__init__(2, "users_fts search index")
+
+    def start(self, db):
+        if search.has_search_index(db):
+            # Built whole by an earlier init_db.py or create_search_index.
+            return
+        db.execute(search.TABLE)
+        db.execute("CREATE TABLE users_fts_backfill (after_id INTEGER NOT NULL, high_id INTEGER NOT NULL)")
+        db.execute("INSERT INTO users_fts_backfill SELECT 0, COALESCE(MAX(id), 0) FROM users")
+        for trigger in self.BACKFILL_TRIGGERS:
+            db.execute(trigger)
+
+    def _backfill_position(self, db):
+        try:
+            return db.execute("SELECT after_id, high_id FROM users_fts_backfill").fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def run_batch(self, db, batch_size):
+        position = self._backfill_position(db)
+        if position is None:
+            return 0, True
+        after_id, high_id = position
+        upper = db.execute(
+            "SELECT id FROM users WHERE id > ? AND id <= ? ORDER BY id LIMIT 1 OFFSET ?",
+            (after_id, high_id, batch_size - 1)
+        ).fetchone()
+        upper = upper[0] if upper else high_id
+        rows = db.execute(
+            "INSERT INTO users_fts(rowid, name, email) SELECT id, name, email FROM users WHERE id > ? AND id <= ?",
+            (after_id, upper)
+        ).rowcount
+        db.execute("UPDATE users_fts_backfill SET after_id = ?", (upper,))
+        return rows, upper >= high_id
+
+    def finish(self, db):
+        if self._backfill_position(db) is not None:
+            for name in ("users_fts_insert", "users_fts_delete", "users_fts_update"):
+                db.execute(f"DROP TRIGGER IF EXISTS {name}")
+            db.execute("DROP TABLE users_fts_backfill")
+        for trigger in search.TRIGGERS:
+            db.execute(trigger)
+
+MIGRATIONS = (
+    Migration(1, "users table", ("""CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL
+    )""",)),
+    UsersSearchIndex(),
+    Migration(3, "user_versions for ETags", (versions.TABLE, *versions.SEED, *versions.TRIGGERS)),
+)
+
+class Migrator:
+    """Applies ``migrations`` above the database's schema version, in order.
+
+    Every step takes the write lock with ``BEGIN IMMEDIATE`` and re-reads
+    schema_version under it, so processes racing to migrate the same file
+    at startup take turns instead of applying anything twice. Batched
+    migrations sleep ``pause`` seconds between batches, leaving the write
+    lock free for the application. ``run`` returns, per migration applied,
+    the rows and batches it took and how long it held the write lock.
+    """
+
+    def __init__(self, db, migrations=MIGRATIONS, batch_size=1000, pause=0.0):
+        self.db = db
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def _transaction(self, step, report):
+        """Run ``step()`` under the write lock and add the hold time to ``report``."""
+        self.db.execute("BEGIN IMMEDIATE")
+        locked = time.perf_counter()
+        try:
+            result = step()
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        held = time.perf_counter() - locked
+        report["lock_seconds"] += held
+        report["max_lock_seconds"] = max(report["max_lock_seconds"], held)
+        return result
+
+    def _status(self, version):
+        return self.db.execute(
+            "SELECT applied_at FROM schema_version WHERE version = ?", (version,)
+        ).fetchone()
+
+    def applied_versions(self):
+        self.db.execute(VERSION_TABLE)
+        self.db.commit()
+        return {row[0] for row in self.db.execute(
+            "SELECT version FROM schema_version WHERE applied_at IS NOT NULL")}
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def _mark(self, migration, applied):
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO schema_version (version, name, started_at, applied_at) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (version) DO UPDATE SET applied_at = excluded.applied_at",
+            (migration.version, migration.name, now, now if applied else None)
+        )
+
+    def _apply(self, migration):
+        report = {"version": migration.version, "name": migration.name, "rows": 0, "batches": 0,
+                  "lock_seconds": 0.0, "max_lock_seconds": 0.0}
+        started = time.perf_counter()
+
+        def begin():
+            status = self._status(migration.version)
+            if status is not None and status[0] is not None:
+                return False
+            if not migration.batched:
+                migration.apply(self.db)
+                self._mark(migration, applied=True)
+            elif status is None:
+                migration.start(self.db)
+                self._mark(migration, applied=False)
+            return True
+
+        if not self._transaction(begin, report):
+            # Another process applied it first.
+            return None
+        if migration.batched:
+            done = False
+            while not done:
+                def batch():
+                    if self._status(migration.version)[0] is not None:
+                        return 0, True
+                    return migration.run_batch(self.db, self.batch_size)
+                rows, done = self._transaction(batch, report)
+                report["rows"] += rows
+                report["batches"] += 1
+                if not done and self.pause:
+                    time.sleep(self.pause)
+
+            def finish():
+                if self._status(migration.version)[0] is None:
+                    migration.finish(self.db)
+                    self._mark(migration, applied=True)
+            self._transaction(finish, report)
+
+        report["seconds"] = time.perf_counter() - started
+        report["rows_per_second"] = report["rows"] / report["seconds"] if report["seconds"] else 0.0
+        return report
+
+    def run(self, target=None):
+        reports = []
+        for migration in self.pending():
+            if target is not None and migration.version > target:
+                break
+            report = self._apply(migration)
+            if report is not None:
+                reports.append(report)
+        return reports
+
+def migrate(db, batch_size=1000, pause=0.0, target=None):
+    return Migrator(db, batch_size=batch_size, pause=pause).run(target)
+
+def init_app(app):
+    if not app.config['MIGRATE_ON_STARTUP']:
+        return
+    pool = get_pool(app)
+    db = pool.acquire()
+    try:
+        reports = migrate(db, app.config['MIGRATION_BATCH_SIZE'], app.config['MIGRATION_BATCH_PAUSE'])
+    finally:
+        pool.release(db)
+    for report in reports:
+        app.logger.info("Applied migration %(version)d (%(name)s): %(rows)d rows in %(seconds).2fs,"
+                        " longest write lock %(max_lock_seconds).3fs", report)
@@ -1,5 +1,25 @@
+import re
 import sqlite3
 from dataclasses import dataclass, field
+from .search import MIN_QUERY_LENGTH, is_missing_index, match_expression
+
+PUBLIC_COLUMNS = "users.id, users.name, users.email"
+# SQLite encodes the same fields itself, skipping a dict and an encoder call per row.
+PUBLIC_JSON = "users.id, json_object('id', users.id, 'name', users.name, 'email', users.email)"
+
+def _columns(as_json):
+    return PUBLIC_JSON if as_json else PUBLIC_COLUMNS
+
+def _public(rows, as_json):
+    if as_json:
+        return rows
+    return [
+        {
+            "id": row[0],
+            "name": row[1],
+            "email": row[2],
+        } for row in rows
+    ]
 
 @dataclass
 class User:
@@ -39,41 +59,95 @@ class User:
         return None
 
     @staticmethod
-    def get_all(db):
-        rows = db.execute("SELECT id, name, email, password FROM users").fetchall()
-        return [User.from_row(row) for row in rows]
+    def list_page(db, after_id, limit, as_json=False):
+        """Public fields of up to ``limit`` users with ids above ``after_id``,
+        in id order. Seeks on the primary key, so deep pages cost the same
+        as the first. With ``as_json`` each user is an (id, JSON text) row
+        that SQLite encoded, ready to be joined into a response."""
+        rows = db.execute(
+            f"SELECT {_columns(as_json)} FROM users WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        ).fetchall()
+        return _public(rows, as_json)
+
+    @staticmethod
+    def iter_pages(connect, after_id=0, batch_size=1000, as_json=False):
+        """Yield every user after ``after_id`` as successive ``list_page``
+        batches. Each batch is its own short query on a connection from
+        ``connect()``, a context manager entered per batch, so a slow reader
+        holds neither a read transaction nor a connection between batches."""
+        while True:
+            with connect() as db:
+                page = User.list_page(db, after_id, batch_size, as_json)
+            if not page:
+                return
+            yield page
+            after_id = page[-1][0]
+
+    # The mutations below issue one statement each and leave committing to
+    # the caller, so several can share one transaction (database.transaction).
 
     @staticmethod
     def create(db, name, email, password_hash):
+        """Insert a user and return it, or None if the email is taken."""
         try:
-            cursor = db.execute("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", (name, email, password_hash))
-            db.commit()
-            return cursor.lastrowid
+            # fetchall steps the statement to completion before any commit.
+            rows = db.execute(
+                "INSERT INTO users (name, email, password) VALUES (?, ?, ?) RETURNING id, name, email, password",
+                (name, email, password_hash)
+            ).fetchall()
+            return User.from_row(rows[0])
         except sqlite3.IntegrityError:
             return None
 
     @staticmethod
     def update(db, user_id, name, email):
+        """Return the updated user, None if there is no such user, or False
+        if another user has the email."""
         try:
-            result = db.execute("UPDATE users SET name = ?, email = ? WHERE id = ?", (name, email, user_id))
-            db.commit()
-            return result.rowcount > 0
+            rows = db.execute(
+                "UPDATE users SET name = ?, email = ? WHERE id = ? RETURNING id, name, email, password",
+                (name, email, user_id)
+            ).fetchall()
         except sqlite3.IntegrityError:
-            return None
+            return False
+        return User.from_row(rows[0]) if rows else None
+
+    @staticmethod
+    def update_password(db, user_id, password_hash):
+        result = db.execute("UPDATE users SET password = ? WHERE id = ?", (password_hash, user_id))
+        return result.rowcount > 0
 
     @staticmethod
     def delete(db, user_id):
         result = db.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        db.commit()
         return result.rowcount > 0
 
     @staticmethod
-    def search_by_name(db, name):
-        rows = db.execute("SELECT id, name, email FROM users WHERE name LIKE ?", (f"%{name}%",)).fetchall()
-        return [
-            {
-                "id": row["id"],
-                "name": row["name"],
-                "email": row["email"],
-            } for row in rows
-        ]
+    def search(db, text, column=None, limit=20, offset=0, as_json=False):
+        """Users whose ``column`` (name or email when None) contains ``text``,
+        best bm25 match first. Uses the users_fts trigram index; queries too
+        short for a trigram, and databases without the index, fall back to
+        a LIKE scan in id order. ``as_json`` is as for ``list_page``."""
+        if len(text) >= MIN_QUERY_LENGTH:
+            try:
+                rows = db.execute(
+                    f"SELECT {_columns(as_json)} FROM users_fts"
+                    " JOIN users ON users.id = users_fts.rowid"
+                    " WHERE users_fts MATCH ? ORDER BY rank, users.id LIMIT ? OFFSET ?",
+                    (match_expression(text, column), limit, offset)
+                ).fetchall()
+            except sqlite3.OperationalError as e:
+                if not is_missing_index(e):
+                    raise
+            else:
+                return _public(rows, as_json)
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", text) + "%"
+        if column:
+            where, params = f"{column} LIKE ? ESCAPE '\\'", (pattern,)
+        else:
+            where, params = "name LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\'", (pattern, pattern)
+        rows = db.execute(
+            f"SELECT {_columns(as_json)} FROM users WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+            params + (limit, offset)
+        ).fetchall()
+        return _public(rows, as_json)
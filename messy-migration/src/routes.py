@@ -1,32 +1,92 @@
-from flask import Blueprint, request, jsonify, g
-from .database import get_db
+import io
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context, url_for
+from .database import borrowed_db, close_db, get_db, get_lock_retry
 from .services import UserService
-from .auth import token_required, generate_token
-from .errors import bad_request_error, unauthorized_error, forbidden_error, not_found_error, conflict_error
+from .auth import token_required, generate_token, get_user_cache
+from .hashing import get_hasher
+from .json_provider import json_response
+from .versions import conditional, get_versions, set_validators
+from .importer import ImportFormatError, UserImporter, get_reader
+from .errors import handle_error, bad_request_error, unauthorized_error, forbidden_error, not_found_error, conflict_error
 
 bp = Blueprint('routes', __name__)
 
 @bp.before_request
 def before_request():
-    g.user_service = UserService(get_db())
+    g.user_service = UserService(get_db(), get_user_cache(), get_hasher(), get_lock_retry())
 
 @bp.route('/')
 def home():
     return jsonify({"status": "ok", "message": "User Management System"}), 200
 
+def _json_array(pages):
+    # Pages hold (id, JSON text) rows that SQLite encoded; they are only spliced.
+    yield "["
+    separator = ""
+    for page in pages:
+        yield separator + ",".join(row[1] for row in page)
+        separator = ","
+    yield "]"
+
+def _ndjson(pages):
+    for page in pages:
+        yield "".join(row[1] + "\n" for row in page)
+
 @bp.route('/users', methods=['GET'])
 @token_required
 def get_all_users():
-    users = g.user_service.get_all_users()
-    return jsonify(users), 200
+    """Without ``limit`` every user after ``after_id`` is streamed from the
+    database in batches; with it one keyset page is returned, plus a
+    ``Link: rel="next"`` header when more may follow. ``Accept:
+    application/x-ndjson`` switches either mode to one user per line."""
+    try:
+        after_id = int(request.args.get('after_id', 0))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return bad_request_error("after_id and limit must be integers")
+    if after_id < 0:
+        return bad_request_error("after_id must not be negative")
+    max_limit = current_app.config['USERS_PAGE_MAX']
+    if limit is not None and not 1 <= limit <= max_limit:
+        return bad_request_error(f"limit must be between 1 and {max_limit}")
+
+    ndjson = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+    etag, modified, not_modified = conditional(get_versions().table(get_db()), "-ndjson" if ndjson else "")
+    if not_modified is not None:
+        not_modified.vary.add('Accept')
+        return not_modified
+    if limit is None:
+        # The stream borrows a connection per batch; holding the request's
+        # until the last byte would let slow readers drain the pool.
+        close_db()
+        pages = g.user_service.iter_users(borrowed_db, after_id, current_app.config['USERS_STREAM_BATCH'], as_json=True)
+    else:
+        users = g.user_service.list_users(after_id, limit, as_json=True)
+        pages = [users]
+    if ndjson:
+        response = Response(stream_with_context(_ndjson(pages)), mimetype='application/x-ndjson')
+    elif limit is None:
+        response = Response(stream_with_context(_json_array(pages)), mimetype='application/json')
+    else:
+        response = json_response("".join(_json_array(pages)))
+    if limit is not None and len(users) == limit:
+        next_url = url_for('routes.get_all_users', after_id=users[-1][0], limit=limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    response.vary.add('Accept')
+    return set_validators(response, etag, modified), 200
 
 @bp.route('/user/<int:user_id>', methods=['GET'])
 @token_required
 def get_user(user_id):
+    # The version is read before the row, so a body is never tagged newer than it is.
+    etag, modified, not_modified = conditional(get_versions().record(get_db(), user_id))
+    if not_modified is not None:
+        return not_modified
     user = g.user_service.get_user_by_id(user_id)
     if user is None:
         return not_found_error(f"User with id {user_id} not found")
-    return jsonify(user), 200
+    return set_validators(jsonify(user), etag, modified), 200
 
 @bp.route('/users', methods=['POST'])
 def create_user():
@@ -42,6 +102,25 @@ def create_user():
 
     return jsonify(user), 201
 
+@bp.route('/users/import', methods=['POST'])
+@token_required
+def import_users():
+    """Bulk-create users from a ``text/csv`` or ``application/x-ndjson``
+    body, read as it arrives. Answers with counts and the rows that failed."""
+    try:
+        reader = get_reader(request.mimetype)
+    except ImportFormatError as e:
+        return handle_error(415, str(e))
+    importer = UserImporter(get_db(), get_hasher(), current_app.config['IMPORT_CHUNK_SIZE'], get_lock_retry())
+    try:
+        # request.stream is unbuffered; reading lines from it goes byte by byte.
+        summary = importer.run(reader(io.BufferedReader(request.stream, 64 * 1024)))
+    except UnicodeDecodeError:
+        return bad_request_error("Body must be UTF-8")
+    except ImportFormatError as e:
+        return bad_request_error(str(e))
+    return jsonify(summary), 200
+
 @bp.route('/user/<int:user_id>', methods=['PUT'])
 @token_required
 def update_user(user_id):
@@ -76,11 +155,28 @@ def delete_user(user_id):
 @bp.route('/search', methods=['GET'])
 @token_required
 def search_users():
-    name = request.args.get('name')
-    users, message = g.user_service.search_users(name)
+    """``?name=`` matches names, ``?q=`` names or emails, as substrings.
+    Results are ranked; ``limit`` and ``offset`` page through them, with a
+    ``Link: rel="next"`` header when the page is full."""
+    column, text = ('name', request.args.get('name')) if 'name' in request.args else (None, request.args.get('q'))
+    try:
+        limit = int(request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE']))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return bad_request_error("limit and offset must be integers")
+    max_limit = current_app.config['SEARCH_PAGE_MAX']
+    if offset < 0 or not 1 <= limit <= max_limit:
+        return bad_request_error(f"limit must be between 1 and {max_limit}")
+
+    users, message = g.user_service.search_users(text, column, limit, offset, as_json=True)
     if users is None:
         return bad_request_error(message)
-    return jsonify(users), 200
+    response = json_response("".join(_json_array([users])))
+    if len(users) == limit:
+        args = {'name': text} if column else {'q': text}
+        next_url = url_for('routes.search_users', **args, limit=limit, offset=offset + limit)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response, 200
 
 @bp.route('/login', methods=['POST'])
 def login():
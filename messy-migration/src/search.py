@@ -0,0 +1,45 @@
+import sqlite3
+
+# Trigrams match any substring of three or more characters, like LIKE '%q%'.
+MIN_QUERY_LENGTH = 3
+
+TABLE = """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+    name, email, content='users', content_rowid='id', tokenize='trigram'
+)"""
+
+TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, email ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END""",
+)
+
+def has_search_index(db):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").fetchone() is not None
+
+def create_search_index(db):
+    """Create the users_fts index and its sync triggers, and index the rows
+    already in ``users``. Safe to run again on a database that has them."""
+    existed = has_search_index(db)
+    for statement in (TABLE, *TRIGGERS):
+        db.execute(statement)
+    if not existed:
+        db.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    db.commit()
+
+def drop_search_index(db):
+    db.execute("DROP TABLE IF EXISTS users_fts")
+
+def match_expression(text, column=None):
+    """Quote ``text`` as one FTS5 phrase, so operators in it are matched literally."""
+    phrase = '"' + text.replace('"', '""') + '"'
+    return f"{column} : {phrase}" if column else phrase
+
+def is_missing_index(error):
+    return isinstance(error, sqlite3.OperationalError) and "no such table: users_fts" in str(error)
@@ -1,17 +1,32 @@
-import bcrypt
 import re
 from .models import User
 from .auth import generate_token
+from .hashing import PasswordHasher
+from .database import LockRetry
 
 EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
 
 class UserService:
-    def __init__(self, db):
+    def __init__(self, db, user_cache=None, hasher=None, lock_retry=None):
         self.db = db
+        self.user_cache = user_cache
+        self.hasher = hasher or PasswordHasher(workers=0)
+        self.lock_retry = lock_retry or LockRetry(attempts=1)
 
-    def get_all_users(self):
-        users = User.get_all(self.db)
-        return [user.to_dict() for user in users]
+    def _write(self, fn, *args):
+        """Run ``fn(db, *args)`` as one committed transaction."""
+        return self.lock_retry.run(self.db, fn, self.db, *args)
+
+    def _user_changed(self, user_id):
+        """Called after the change commits."""
+        if self.user_cache is not None:
+            self.user_cache.invalidate(user_id)
+
+    def list_users(self, after_id, limit, as_json=False):
+        return User.list_page(self.db, after_id, limit, as_json)
+
+    def iter_users(self, connect, after_id, batch_size, as_json=False):
+        return User.iter_pages(connect, after_id, batch_size, as_json)
 
     def get_user_by_id(self, user_id):
         user = User.get_by_id(self.db, user_id)
@@ -30,13 +45,12 @@ class UserService:
         if not re.match(EMAIL_REGEX, email):
             return None, "Invalid email format"
 
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = self.hasher.hash(password)
 
-        user_id = User.create(self.db, name, email, hashed_password)
-        if not user_id:
+        new_user = self._write(User.create, name, email, hashed_password)
+        if not new_user:
             return None, "Email already exists"
-
-        new_user = User.get_by_id(self.db, user_id)
+        self._user_changed(new_user.id)
         return new_user.to_dict(), "User created"
 
     def update_user(self, user_id, data, current_user):
@@ -52,28 +66,27 @@ class UserService:
         if not re.match(EMAIL_REGEX, email):
             return None, "Invalid email format"
 
-        user = User.get_by_id(self.db, user_id)
-        if not user:
+        updated_user = self._write(User.update, user_id, name, email)
+        if updated_user is None:
             return None, "User not found"
-
-        success = User.update(self.db, user_id, name, email)
-        if not success:
+        if not updated_user:
             return None, "Email already exists"
-
-        updated_user = User.get_by_id(self.db, user_id)
+        self._user_changed(user_id)
         return updated_user.to_dict(), "User updated"
 
     def delete_user(self, user_id, current_user):
         if user_id != current_user.id:
             return False, "Permission denied"
 
-        success = User.delete(self.db, user_id)
+        success = self._write(User.delete, user_id)
+        if success:
+            self._user_changed(user_id)
         return success, "User deleted" if success else "User not found"
 
-    def search_users(self, name):
-        if not name:
+    def search_users(self, text, column, limit, offset, as_json=False):
+        if not text:
             return None, "Please provide a name to search"
-        users = User.search_by_name(self.db, name)
+        users = User.search(self.db, text, column, limit, offset, as_json)
         return users, "Users found"
 
     def login(self, data):
@@ -85,7 +98,12 @@ class UserService:
 
         user = User.get_by_email(self.db, email)
 
-        if user and bcrypt.checkpw(password.encode('utf-8'), user.password):
+        if user and self.hasher.verify(password, user.password):
+            if self.hasher.needs_rehash(user.password):
+                # The configured cost changed since this hash was made.
+                self._write(User.update_password, user.id, self.hasher.hash(password))
+                self.hasher.record_rehash()
+                self._user_changed(user.id)
             return user, "Login successful"
 
         return None, "Invalid credentials"
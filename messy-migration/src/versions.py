@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+import time
+from flask import current_app, request
+
+# Seconds since the epoch, with a fraction, as SQLite computes it.
+NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+# Row 0 is the version of the users table and row -1 the version every user
+# starts at; the others hold the version each user last changed at.
+TABLE = """CREATE TABLE IF NOT EXISTS user_versions (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    modified REAL NOT NULL
+)"""
+
+# Both start at a random version, so a recreated database never repeats
+# the ETags of the one it replaced.
+SEED = (
+    f"INSERT OR IGNORE INTO user_versions VALUES (-1, random() & 1099511627775, {NOW})",
+    "INSERT OR IGNORE INTO user_versions SELECT 0, version, modified FROM user_versions WHERE id = -1",
+)
+
+_BUMP_TABLE = f"UPDATE user_versions SET version = version + 1, modified = {NOW} WHERE id = 0;"
+_COPY_TO = """INSERT INTO user_versions SELECT {row}.id, version, modified FROM user_versions WHERE id = 0
+        ON CONFLICT (id) DO UPDATE SET version = excluded.version, modified = excluded.modified;"""
+
+# They run inside the statement that writes the user, so every commit that
+# changes what /users or /user/<id> return moves its version with it.
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS user_versions_insert AFTER INSERT ON users BEGIN
+        {_BUMP_TABLE}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_versions_update AFTER UPDATE OF name, email ON users BEGIN
+        {_BUMP_TABLE}
+        {_COPY_TO.format(row="new")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS user_versions_delete AFTER DELETE ON users BEGIN
+        {_BUMP_TABLE}
+        {_COPY_TO.format(row="old")}
+    END""",
+)
+
+class Versions:
+    """Reads the versions behind the ETags of /users and /user/<id>.
+
+    The versions are kept in the database by triggers, so writes from other
+    workers, import_users.py or the sqlite3 shell move them too. A database
+    without the user_versions table (migration 3) gets no validators.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.unavailable = 0
+        self.not_modified = 0
+
+    def _read(self, db, sql, params=()):
+        try:
+            row = db.execute(sql, params).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        with self._lock:
+            self.lookups += 1
+            if row is None:
+                self.unavailable += 1
+        return row and (row[0], row[1])
+
+    def table(self, db):
+        return self._read(db, "SELECT version, modified FROM user_versions WHERE id = 0")
+
+    def record(self, db, user_id):
+        return self._read(db, "SELECT version, modified FROM user_versions WHERE id IN (?, -1) "
+                              "ORDER BY id DESC LIMIT 1", (user_id,))
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "unavailable": self.unavailable,
+                "not_modified": self.not_modified,
+            }
+
+def last_modified(version):
+    """The version's time in whole seconds, or None while that second is
+    still running: a later change in the same second would otherwise carry
+    the same Last-Modified."""
+    modified = int(version[1])
+    return modified if modified < int(time.time()) else None
+
+def is_not_modified(etag, modified):
+    """Whether the request's validators still match. ``If-None-Match``
+    takes precedence over ``If-Modified-Since``, as in RFC 9110."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and modified is not None and modified <= since.timestamp()
+
+def set_validators(response, etag, modified):
+    if etag is None:
+        return response
+    response.set_etag(etag, weak=True)
+    if modified is not None:
+        response.last_modified = modified
+    # Clients may keep the body but must ask before reusing it.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def conditional(version, variant=""):
+    """``(etag, last_modified, not_modified_response)`` for a representation
+    at ``version``; the response is None unless the client's copy is current.
+    A ``version`` of None means none is known: no validators, never a 304."""
+    if version is None:
+        return None, None, None
+    etag = f"{version[0]}{variant}"
+    modified = last_modified(version)
+    if not is_not_modified(etag, modified):
+        return etag, modified, None
+    get_versions().record_not_modified()
+    return etag, modified, set_validators(current_app.response_class(status=304), etag, modified)
+
+def get_versions():
+    return current_app.extensions['versions']
+
+def init_app(app):
+    app.extensions['versions'] = Versions()
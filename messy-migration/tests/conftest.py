@@ -0,0 +1,61 @@
+import pytest
+from src import create_app
+from src.auth import generate_token
+from src.database import get_db, get_pool
+from src.migrations import MIGRATIONS, migrate
+
+
+@pytest.fixture
+def app_config():
+    """Config overrides for ``app``; modules redefine it as needed."""
+    return {}
+
+
+@pytest.fixture
+def users():
+    """``(name, email, password)`` rows ``app`` starts with."""
+    return [("Ann", "ann@example.com", b"x"), ("Bob", "bob@example.com", b"x")]
+
+
+@pytest.fixture
+def app(tmp_path, app_config, users):
+    """An app on a fresh database, migrated to the latest schema."""
+    app = create_app(config_override={
+        'TESTING': True, 'DATABASE_NAME': str(tmp_path / "users.db"), 'BCRYPT_ROUNDS': 4, **app_config,
+    })
+    with app.app_context():
+        db = get_db()
+        migrate(db)
+        db.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, ?)", users)
+        db.commit()
+    yield app
+    get_pool(app).close()
+
+
+@pytest.fixture
+def bearer(app):
+    """``bearer(user_id)`` is an Authorization header for that user."""
+    def bearer(user_id):
+        with app.app_context():
+            return {"Authorization": f"Bearer {generate_token(user_id)}"}
+    return bearer
+
+
+@pytest.fixture
+def auth_headers(bearer):
+    return bearer(1)
+
+
+@pytest.fixture
+def client(app, auth_headers):
+    """A test client that sends ``auth_headers`` with every request."""
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = auth_headers['Authorization']
+    return client
+
+
+@pytest.fixture
+def legacy_schema():
+    """``legacy_schema(db)`` creates the users table as init_db.py did
+    before migrations existed, without recording a schema version."""
+    return MIGRATIONS[0].apply
@@ -0,0 +1,50 @@
+import time
+
+import jwt
+from src.cache import TTLCache
+
+def test_repeat_requests_hit_the_caches(app, auth_headers):
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get('/user/2', headers=auth_headers).status_code == 200
+    metrics = client.get('/metrics', headers={'Accept': 'application/json'}).get_json()
+    assert metrics['token_cache']['hits'] == 2 and metrics['token_cache']['misses'] == 1
+    assert metrics['user_cache']['hits'] == 2 and metrics['user_cache']['misses'] == 1
+
+def test_update_and_delete_invalidate_the_cached_user(app, auth_headers):
+    client = app.test_client()
+    response = client.put('/user/1', headers=auth_headers, json={"name": "Ann B", "email": "ann@example.com"})
+    assert response.status_code == 200
+    assert app.extensions['user_cache'].get(1) is None
+
+    assert client.get('/user/2', headers=auth_headers).status_code == 200
+    assert app.extensions['user_cache'].get(1).name == "Ann B"
+    assert client.delete('/user/1', headers=auth_headers).status_code == 200
+    assert client.get('/user/2', headers=auth_headers).status_code == 401
+
+def test_bad_tokens_are_rejected_and_not_cached(app):
+    client = app.test_client()
+    response = client.get('/user/1', headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+    assert app.extensions['token_cache'].metrics()['size'] == 0
+
+def test_tokens_without_exp_are_rejected(app):
+    token = jwt.encode({"sub": "1"}, app.config['SECRET_KEY'], algorithm="HS256")
+    response = app.test_client().get('/user/1', headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+def test_ttl_cache_caps_entries_at_expiry_and_size():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, expires_at=time.time() - 1)
+    assert cache.get("a") is None
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.get("b")
+    cache.set("d", 4)
+    assert cache.get("c") is None and cache.get("b") == 2
+    metrics = cache.metrics()
+    assert metrics['expirations'] == 1 and metrics['evictions'] == 1
+
+    disabled = TTLCache(maxsize=0, ttl=60)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
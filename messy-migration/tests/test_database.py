@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+
+import pytest
+from src import create_app
+from src.database import ConnectionPool, PoolTimeout, get_pool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2, timeout=0.05)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_initialized_and_reused(pool):
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    assert conn.row_factory is sqlite3.Row
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.metrics()["open"] == 1
+
+
+def test_saturated_pool_waits_then_times_out(pool):
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    threading.Timer(0.01, pool.release, args=(first,)).start()
+    assert pool.acquire() is first
+    metrics = pool.metrics()
+    assert metrics["saturation"] == 1.0
+    assert metrics["timeouts"] == 1
+    assert metrics["waits"] == 1
+    assert metrics["max_wait_seconds"] > 0
+    pool.release(second)
+
+
+def test_release_rolls_back_open_transactions(pool):
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    pool.release(conn)
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.release(conn)
+
+
+def test_requests_share_pooled_connections(tmp_path):
+    app = create_app(config_override={'TESTING': True, 'DATABASE_NAME': str(tmp_path / "app.db")})
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get('/').status_code == 200
+        client.get('/user/1')
+    metrics = client.get('/metrics', headers={'Accept': 'application/json'}).get_json()['db_pool']
+    assert metrics['open'] == 1
+    assert metrics['in_use'] == 0
+    get_pool(app).close()
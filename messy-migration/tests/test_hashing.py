@@ -0,0 +1,71 @@
+import threading
+
+import bcrypt
+import pytest
+from src.database import get_db
+from src.hashing import HasherBusy, PasswordHasher
+from src.models import User
+
+
+@pytest.fixture
+def users():
+    return [("Ann", "ann@example.com", bcrypt.hashpw(b"pw", bcrypt.gensalt(4)))]
+
+
+def block_workers(hasher):
+    """Occupy every worker and queue slot until the returned event is set."""
+    release = threading.Event()
+    threads = [threading.Thread(target=hasher._run, args=(release.wait,))
+               for _ in range(hasher.workers + hasher.queue_size)]
+    for thread in threads:
+        thread.start()
+    while hasher.metrics()["in_flight"] < len(threads):
+        pass
+    return release, threads
+
+
+def test_hash_and_verify_on_workers():
+    hasher = PasswordHasher(rounds=4, workers=1)
+    hashed = hasher.hash("secret")
+    assert hashed.startswith(b"$2b$04$")
+    assert hasher.verify("secret", hashed)
+    assert not hasher.verify("wrong", hashed)
+    assert not hasher.needs_rehash(hashed)
+    assert PasswordHasher(rounds=5).needs_rehash(hashed)
+    assert hasher.metrics()["completed"] == 3
+    hasher.shutdown()
+
+
+def test_saturated_hasher_fails_fast():
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=1)
+    release, threads = block_workers(hasher)
+    with pytest.raises(HasherBusy):
+        hasher.hash("secret")
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert hasher.metrics()["rejected"] == 1
+    assert hasher.verify("secret", hasher.hash("secret"))
+    hasher.shutdown()
+
+
+@pytest.mark.parametrize('app_config', [{'HASHER_WORKERS': 1, 'HASHER_QUEUE_SIZE': 0}])
+def test_login_returns_503_with_retry_after_when_saturated(app):
+    client = app.test_client()
+    release, threads = block_workers(app.extensions['hasher'])
+    response = client.post('/login', json={"email": "ann@example.com", "password": "pw"})
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/login', json={"email": "ann@example.com", "password": "pw"}).status_code == 200
+
+
+@pytest.mark.parametrize('app_config', [{'BCRYPT_ROUNDS': 5}])
+def test_login_rehashes_when_cost_is_raised(app):
+    # Ann's password was hashed at cost 4.
+    assert app.test_client().post('/login', json={"email": "ann@example.com", "password": "pw"}).status_code == 200
+    with app.app_context():
+        assert User.get_by_email(get_db(), "ann@example.com").password.startswith(b"$2b$05$")
+    assert app.extensions['hasher'].metrics()["rehashes"] == 1
@@ -0,0 +1,108 @@
+import json
+import sqlite3
+
+import bcrypt
+import pytest
+from src.hashing import PasswordHasher
+from src.migrations import migrate
+from import_users import import_users_main
+
+PREHASHED = bcrypt.hashpw(b"legacy", bcrypt.gensalt(4)).decode()
+
+
+@pytest.fixture
+def app_config():
+    return {'IMPORT_CHUNK_SIZE': 2, 'DB_BUSY_TIMEOUT': 0.01, 'DB_WRITE_ATTEMPTS': 2, 'DB_WRITE_BACKOFF': 0.001}
+
+
+@pytest.fixture
+def users():
+    return [("Ann", "ann@example.com", "x")]
+
+
+def test_imports_csv_and_reports_conflicts(client):
+    body = (
+        "name,email,password,password_hash\n"
+        "Bob,bob@example.com,pw,\n"
+        "Ann Again,ann@example.com,pw,\n"
+        "Cy,cy@example.com,,{}\n"
+        "Bob Twin,bob@example.com,pw,\n"
+        "Dee,not-an-email,pw,\n"
+        "Eve,eve@example.com,,\n"
+    ).format(PREHASHED)
+    response = client.post('/users/import', data=body, content_type='text/csv')
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['imported'] == 2
+    assert sorted((e['row'], e['error']) for e in summary['errors']) == [
+        (2, "Email already exists"), (4, "Email already exists"),
+        (5, "Invalid email format"), (6, "Missing required fields"),
+    ]
+    assert client.post('/login', json={"email": "bob@example.com", "password": "pw"}).status_code == 200
+    assert client.post('/login', json={"email": "cy@example.com", "password": "legacy"}).status_code == 200
+    assert [u['name'] for u in client.get('/search?name=Bob').get_json()] == ["Bob"]
+
+
+def test_imports_ndjson(client):
+    lines = [
+        json.dumps({"name": "Bob", "email": "bob@example.com", "password": "pw"}),
+        "",
+        "{not json",
+        json.dumps({"name": "Cy", "email": "cy@example.com", "password_hash": "$2b$04$short"}),
+        json.dumps({"name": 5, "email": "dee@example.com", "password": "pw"}),
+    ]
+    response = client.post('/users/import', data="\n".join(lines), content_type='application/x-ndjson')
+    summary = response.get_json()
+    assert summary['imported'] == 1
+    assert [(e['row'], e['error']) for e in summary['errors']] == [
+        (2, "Invalid JSON"), (3, "Invalid bcrypt hash"), (4, "Fields must be strings"),
+    ]
+
+
+def test_rejects_other_content_types(client):
+    assert client.post('/users/import', json=[]).status_code == 415
+
+
+def test_rejects_malformed_csv(client):
+    # Past the csv module's field size limit.
+    body = "name,email,password\nBob,bob@example.com,{}\n".format("x" * 200000)
+    response = client.post('/users/import', data=body, content_type='text/csv')
+    assert response.status_code == 400
+    assert "Invalid CSV in row 1" in response.get_json()['error']
+
+
+def test_locked_import_is_answered_with_503(app, client):
+    blocker = sqlite3.connect(app.config['DATABASE_NAME'])
+    blocker.execute("BEGIN IMMEDIATE")
+    body = "name,email,password\nBob,bob@example.com,pw\n"
+    response = client.post('/users/import', data=body, content_type='text/csv')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    blocker.rollback()
+    blocker.close()
+    assert client.post('/users/import', data=body, content_type='text/csv').get_json()['imported'] == 1
+
+
+def test_hash_many_keeps_order():
+    hasher = PasswordHasher(rounds=4, workers=2, queue_size=0)
+    passwords = [f"pw{i}" for i in range(6)]
+    hashes = hasher.hash_many(passwords)
+    assert all(bcrypt.checkpw(p.encode(), h) for p, h in zip(passwords, hashes))
+    assert hasher.metrics()["completed"] == 6
+    hasher.shutdown()
+
+
+def test_cli_imports_a_file(tmp_path):
+    db_path = str(tmp_path / "cli.db")
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.close()
+    path = tmp_path / "users.ndjson"
+    path.write_text("".join(json.dumps({"name": f"U{i}", "email": f"u{i}@example.com", "password": "pw"}) + "\n"
+                            for i in range(5)))
+
+    summary = import_users_main(str(path), db_path, chunk_size=2, workers=2, rounds=4)
+    assert summary == {"imported": 5, "failed": 0, "errors": []}
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT count(*) FROM users").fetchone() == (5,)
+    conn.close()
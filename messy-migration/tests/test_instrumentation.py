@@ -0,0 +1,80 @@
+import logging
+import re
+import sqlite3
+
+import bcrypt
+import pytest
+from src.database import get_db
+from src.instrumentation import InstrumentedConnection
+
+
+@pytest.fixture
+def users():
+    password = bcrypt.hashpw(b"pw", bcrypt.gensalt(4))
+    return [(f"User {i}", f"user{i}@example.com", password) for i in range(5)]
+
+
+def sample(text, metric, endpoint):
+    match = re.search(rf'^{metric}\{{endpoint="{endpoint}"\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_metrics_are_prometheus_text(client):
+    assert client.get('/user/1').status_code == 200
+    assert len(client.get('/users').get_json()) == 5
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert sample(text, "users_api_request_seconds_count", "routes.get_user") == 1
+    assert sample(text, "users_api_request_db_seconds_sum", "routes.get_user") > 0
+    assert sample(text, "users_api_request_jwt_seconds_sum", "routes.get_user") > 0
+    # The token's user, the ETag version and the user asked for.
+    assert sample(text, "users_api_db_statements_total", "routes.get_user") == 3
+    # Rows streamed after the view returned still count, as does the version
+    # row; the user came from the cache.
+    assert sample(text, "users_api_db_rows_total", "routes.get_all_users") == 5 + 1
+    assert 'users_api_request_seconds_bucket{endpoint="routes.get_user",le="+Inf"} 1' in text
+    assert re.search(r"^# TYPE users_api_db_pool_size gauge\nusers_api_db_pool_size 8$", text, re.M)
+    assert re.search(r"^# TYPE users_api_db_pool_acquisitions_total counter\n"
+                     r"users_api_db_pool_acquisitions_total [1-9]", text, re.M)
+    assert "users_api_token_cache_hits_total " in text
+    assert "users_api_slow_queries_total 0" in text
+
+
+def test_login_time_is_split_into_bcrypt_and_jwt(app):
+    client = app.test_client()
+    assert client.post('/login', json={"email": "user0@example.com", "password": "pw"}).status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, "users_api_request_bcrypt_seconds_sum", "routes.login") > 0
+    assert sample(text, "users_api_request_jwt_seconds_sum", "routes.login") > 0
+    request_seconds = sample(text, "users_api_request_seconds_sum", "routes.login")
+    assert request_seconds >= sample(text, "users_api_request_bcrypt_seconds_sum", "routes.login")
+
+
+@pytest.mark.parametrize('app_config', [{'SLOW_QUERY_THRESHOLD': 0.0}])
+def test_slow_queries_are_logged_with_their_plan(client, caplog):
+    with caplog.at_level(logging.WARNING, logger="src.instrumentation.slow_queries"):
+        client.get('/user/2')
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("endpoint=routes.get_user" in m and "SEARCH users USING INTEGER PRIMARY KEY" in m for m in messages)
+    assert "users_api_slow_queries_total 0" not in client.get('/metrics').get_data(as_text=True)
+
+
+@pytest.mark.parametrize('app_config', [{'QUERY_INSTRUMENTATION': False}])
+def test_instrumentation_can_be_turned_off(app, client):
+    with app.test_request_context('/'):
+        assert isinstance(get_db(), sqlite3.Connection)
+    assert client.get('/user/1').status_code == 200
+    assert 'endpoint="routes.get_user"' not in client.get('/metrics').get_data(as_text=True)
+
+
+def test_wrapped_connection_behaves_like_the_raw_one(app):
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        db = get_db()
+        assert isinstance(db, InstrumentedConnection)
+        assert [row['id'] for row in db.execute("SELECT id FROM users ORDER BY id")] == [1, 2, 3, 4, 5]
+        assert db.execute("UPDATE users SET name = 'x' WHERE id < 3").rowcount == 2
+        db.rollback()
+        stats = db.stats
+        assert (stats.statements, stats.rows) == (2, 7)
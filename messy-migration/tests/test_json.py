@@ -0,0 +1,64 @@
+import datetime
+import json
+
+import pytest
+from flask import Flask
+from src import create_app, json_provider
+from src.json_provider import FastJSONProvider
+
+NAMES = ['Ann "Quote" Lee', "Zoë Back\\slash", "Bob\nNewline"]
+
+
+@pytest.fixture
+def users():
+    return [(name, f"user{i}@example.com", b"x") for i, name in enumerate(NAMES)]
+
+
+def expected(ids):
+    return [{"id": i, "name": NAMES[i - 1], "email": f"user{i - 1}@example.com"} for i in ids]
+
+
+def test_provider_matches_the_stdlib_encoding():
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    value = {"b": [1, 2.5, None, True], "a": "Zoë", "when": datetime.date(2024, 1, 2)}
+    assert json.loads(provider.dumps(value)) == json.loads(Flask(__name__).json.dumps(value))
+    assert provider.dumps({"b": 1, "a": 2}) == '{"a":2,"b":1}'
+    assert provider.loads(b'{"a": [1, "x"]}') == {"a": [1, "x"]}
+    with app.app_context():
+        response = provider.response({"ok": True})
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == b'{"ok":true}\n'
+
+
+def test_integers_past_64_bits_fall_back_to_the_stdlib():
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    assert provider.dumps({"n": 2 ** 70}) == '{"n": %d}' % 2 ** 70
+    with app.app_context():
+        assert json.loads(provider.response({"n": 2 ** 70}).get_data()) == {"n": 2 ** 70}
+
+
+def test_provider_falls_back_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    provider = FastJSONProvider(Flask(__name__))
+    assert provider.dumps({"b": 1, "a": 2}) == '{"a": 2, "b": 1}'
+    assert provider.loads('[1]') == [1]
+
+
+def test_fast_json_can_be_disabled(tmp_path):
+    assert isinstance(create_app(config_override={'FAST_JSON': True}).json, FastJSONProvider)
+    assert not isinstance(create_app(config_override={'FAST_JSON': False}).json, FastJSONProvider)
+
+
+def test_rows_are_encoded_by_sqlite(client):
+    streamed = client.get('/users')
+    assert streamed.get_json() == expected([1, 2, 3])
+    page = client.get('/users?limit=2')
+    assert page.mimetype == 'application/json'
+    assert page.get_json() == expected([1, 2])
+    assert 'after_id=2' in page.headers['Link']
+    ndjson = client.get('/users', headers={'Accept': 'application/x-ndjson'})
+    assert [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()] == expected([1, 2, 3])
+    assert client.get('/search?q=Quote').get_json() == expected([1])
+    assert client.get('/search?name=zz').get_json() == []
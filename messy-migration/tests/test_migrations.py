@@ -0,0 +1,129 @@
+import sqlite3
+
+import pytest
+from src import create_app
+from src.database import get_pool
+from src.migrations import MIGRATIONS, BatchedMigration, Migration, Migrator, UsersSearchIndex
+from src.search import create_search_index
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+@pytest.fixture
+def legacy_db(tmp_path, legacy_schema):
+    """A database made by init_db.py before migrations existed."""
+    path = str(tmp_path / "legacy.db")
+    conn = connect(path)
+    legacy_schema(conn)
+    conn.executemany("INSERT INTO users (name, email, password) VALUES (?, ?, 'x')",
+                     ((f"User {i}", f"user{i}@example.com") for i in range(25)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def fts_ids(conn, query):
+    return [row[0] for row in conn.execute(
+        "SELECT rowid FROM users_fts WHERE users_fts MATCH ? ORDER BY rowid", (f'"{query}"',))]
+
+
+def test_applies_pending_migrations_once(legacy_db):
+    conn = connect(legacy_db)
+    reports = Migrator(conn, batch_size=10).run()
+    assert [(r['version'], r['rows'], r['batches']) for r in reports] == [(1, 0, 0), (2, 25, 3), (3, 0, 0)]
+    assert all(r['max_lock_seconds'] <= r['lock_seconds'] for r in reports)
+    assert Migrator(conn).run() == []
+    assert conn.execute("SELECT version FROM schema_version WHERE applied_at IS NOT NULL").fetchall() == [(1,), (2,), (3,)]
+    assert len(fts_ids(conn, "User 1")) == 11
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_fts_backfill'").fetchone() is None
+    conn.execute("UPDATE users SET name = 'Renamed' WHERE id = 1")
+    assert fts_ids(conn, "Renamed") == [1]
+    conn.close()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resumes_an_interrupted_backfill_and_keeps_writes_in_sync(legacy_db):
+    class FailingIndex(UsersSearchIndex):
+        def run_batch(self, db, batch_size):
+            result = super().run_batch(db, batch_size)
+            if db.execute("SELECT after_id FROM users_fts_backfill").fetchone()[0] >= 10:
+                raise Interrupted
+            return result
+
+    conn = connect(legacy_db)
+    with pytest.raises(Interrupted):
+        Migrator(conn, (MIGRATIONS[0], FailingIndex()), batch_size=5).run()
+    assert conn.execute("SELECT after_id FROM users_fts_backfill").fetchone() == (5,)
+
+    # Writes while the backfill is half done: an indexed row, an unindexed one, a new one.
+    conn.execute("UPDATE users SET name = 'Early' WHERE id = 2")
+    conn.execute("UPDATE users SET name = 'Late' WHERE id = 20")
+    conn.execute("DELETE FROM users WHERE id = 21")
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('Newcomer', 'new@example.com', 'x')")
+    conn.commit()
+
+    reports = Migrator(conn, batch_size=5).run()
+    assert [(r['version'], r['rows']) for r in reports] == [(2, 19), (3, 0)]
+    assert fts_ids(conn, "Early") == [2]
+    assert fts_ids(conn, "Late") == [20]
+    assert fts_ids(conn, "Newcomer") == [26]
+    assert fts_ids(conn, "User 2") == [3, 22, 23, 24, 25]
+    # Raises if the index and the users table disagree.
+    conn.execute("INSERT INTO users_fts(users_fts, rank) VALUES ('integrity-check', 1)")
+    conn.close()
+
+
+def test_skips_backfill_when_index_already_built(legacy_db):
+    conn = connect(legacy_db)
+    create_search_index(conn)
+    reports = Migrator(conn).run()
+    assert [(r['version'], r['rows']) for r in reports] == [(1, 0), (2, 0), (3, 0)]
+    assert fts_ids(conn, "User 3") == [4]
+    conn.close()
+
+
+def test_runs_custom_migrations_up_to_a_target(tmp_path):
+    class Backfill(BatchedMigration):
+        def start(self, db):
+            db.execute("CREATE TABLE todo (n INTEGER)")
+            db.executemany("INSERT INTO todo VALUES (?)", ((n,) for n in range(7)))
+
+        def run_batch(self, db, batch_size):
+            rows = db.execute("DELETE FROM todo WHERE rowid IN (SELECT rowid FROM todo LIMIT ?)",
+                              (batch_size,)).rowcount
+            return rows, rows < batch_size
+
+        def finish(self, db):
+            db.execute("DROP TABLE todo")
+
+    migrations = [Migration(1, "t", ("CREATE TABLE t (x)",)), Backfill(2, "backfill"),
+                  Migration(3, "u", ("CREATE TABLE u (x)",))]
+    conn = connect(str(tmp_path / "custom.db"))
+    assert [r['version'] for r in Migrator(conn, migrations).run(target=2)] == [1, 2]
+    assert [m.version for m in Migrator(conn, migrations).pending()] == [3]
+    assert [r['rows'] for r in Migrator(conn, migrations, batch_size=3).run()] == [0]
+    conn.close()
+
+
+def test_batched_migrations_must_define_run_batch():
+    class Incomplete(BatchedMigration):
+        def start(self, db):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(2, "incomplete")
+
+
+def test_migrates_on_startup_when_enabled(legacy_db):
+    app = create_app(config_override={'TESTING': True, 'DATABASE_NAME': legacy_db, 'MIGRATE_ON_STARTUP': True})
+    get_pool(app).close()
+    conn = connect(legacy_db)
+    assert Migrator(conn).pending() == []
+    conn.close()
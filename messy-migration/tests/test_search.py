@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+from src.database import get_db
+from src.models import User
+from src.search import has_search_index
+from migrate import migrate_main
+
+NAMES = ["Ann Lee", "Annabel Lee", "Joanna Smith", "Bob Stone", "Zoe 100%"]
+
+
+@pytest.fixture
+def users():
+    return [(name, f"user{i}@example.com", b"x") for i, name in enumerate(NAMES)]
+
+
+def names(response):
+    return [user['name'] for user in response.get_json()]
+
+
+def test_matches_substrings_case_insensitively(client):
+    response = client.get('/search?name=ANN')
+    assert response.status_code == 200
+    assert sorted(names(response)) == ["Ann Lee", "Annabel Lee", "Joanna Smith"]
+    assert set(response.get_json()[0]) == {'id', 'name', 'email'}
+
+
+def test_short_queries_fall_back_to_like(client):
+    assert sorted(names(client.get('/search?name=Le'))) == ["Ann Lee", "Annabel Lee"]
+    assert names(client.get('/search?name=%')) == ["Zoe 100%"]
+
+
+def test_query_syntax_is_matched_literally(client):
+    assert names(client.get('/search?name="Lee" OR Bob')) == []
+    assert names(client.get('/search?name=100%')) == ["Zoe 100%"]
+
+
+def test_q_searches_email_too(client):
+    assert names(client.get('/search?q=user3@')) == ["Bob Stone"]
+    assert names(client.get('/search?name=user3@')) == []
+
+
+def test_pages_through_ranked_results(client):
+    first = client.get('/search?name=Lee&limit=1')
+    assert len(first.get_json()) == 1
+    assert first.headers['Link'] == '</search?name=Lee&limit=1&offset=1>; rel="next"'
+    second = client.get('/search?name=Lee&limit=1&offset=1')
+    assert sorted(names(first) + names(second)) == ["Ann Lee", "Annabel Lee"]
+    last = client.get('/search?name=Lee&limit=2&offset=1')
+    assert len(last.get_json()) == 1
+    assert 'Link' not in last.headers
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=101", "limit=x", "offset=-1"])
+def test_rejects_bad_paging(client, query):
+    assert client.get(f'/search?name=Lee&{query}').status_code == 400
+
+
+def test_index_follows_inserts_updates_and_deletes(app):
+    with app.app_context():
+        db = get_db()
+        User.create(db, "Carla Nunez", "carla@example.com", b"x")
+        assert [u['name'] for u in User.search(db, "Nunez")] == ["Carla Nunez"]
+        User.update(db, 4, "Robert Stone", "bob@example.com")
+        assert [u['name'] for u in User.search(db, "Robert")] == ["Robert Stone"]
+        assert User.search(db, "Bob St") == []
+        User.delete(db, 1)
+        assert sorted(u['name'] for u in User.search(db, "Ann", "name")) == ["Annabel Lee", "Joanna Smith"]
+
+
+def test_migrate_indexes_an_existing_database(tmp_path, legacy_schema):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    legacy_schema(conn)
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('Ann Lee', 'ann@example.com', 'x')")
+    conn.commit()
+    conn.close()
+
+    assert [report['name'] for report in migrate_main(path)] == ["users table", "users_fts search index", "user_versions for ETags"]
+    assert migrate_main(path) == []
+    conn = sqlite3.connect(path)
+    assert has_search_index(conn)
+    assert conn.execute("SELECT rowid FROM users_fts WHERE users_fts MATCH 'Lee'").fetchall() == [(1,)]
+    conn.close()
+
+
+def test_searches_without_the_index_until_migrated(tmp_path, legacy_schema):
+    conn = sqlite3.connect(str(tmp_path / "old.db"))
+    conn.row_factory = sqlite3.Row
+    legacy_schema(conn)
+    conn.execute("INSERT INTO users (name, email, password) VALUES ('Ann Lee', 'ann@example.com', 'x')")
+    assert [u['name'] for u in User.search(conn, "Lee")] == ["Ann Lee"]
+    conn.close()
@@ -0,0 +1,66 @@
+import json
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def app_config():
+    return {'USERS_STREAM_BATCH': 3}
+
+
+@pytest.fixture
+def users():
+    return [(f"User {i}", f"user{i}@example.com", b"x") for i in range(10)]
+
+
+def test_streams_every_user_as_a_json_array(client):
+    response = client.get('/users')
+    assert response.status_code == 200
+    users = response.get_json()
+    assert [user['id'] for user in users] == list(range(1, 11))
+    assert set(users[0]) == {'id', 'name', 'email'}
+
+
+def test_streams_ndjson_when_asked(client):
+    response = client.get('/users?after_id=4', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [user['id'] for user in lines] == list(range(5, 11))
+
+
+def test_keyset_pages_link_to_the_next_page(client):
+    response = client.get('/users?limit=4')
+    assert [user['id'] for user in response.get_json()] == [1, 2, 3, 4]
+    assert response.headers['Link'] == '</users?after_id=4&limit=4>; rel="next"'
+
+    response = client.get('/users?after_id=8&limit=4')
+    assert [user['id'] for user in response.get_json()] == [9, 10]
+    assert 'Link' not in response.headers
+
+
+@pytest.mark.parametrize('app_config', [{'USERS_STREAM_BATCH': 3, 'DB_POOL_SIZE': 1, 'DB_POOL_TIMEOUT': 0.1}])
+def test_streams_hold_no_connection_between_batches(app, client):
+    response = client.get('/users', buffered=False)
+    chunks = iter(response.response)
+    body = [next(chunks), next(chunks)]
+    assert body[1].startswith(b'{"id":1,')
+    assert app.extensions['db_pool'].metrics()['in_use'] == 0
+    # From another thread, as a server would: the stream keeps its request
+    # context pushed on this one.
+    statuses = []
+    thread = threading.Thread(target=lambda: statuses.append(client.get('/user/1').status_code))
+    thread.start()
+    thread.join()
+    assert statuses == [200]
+    assert [user['id'] for user in json.loads(b"".join(body + list(chunks)))] == list(range(1, 11))
+    response.close()
+
+
+def test_rejects_bad_pagination(client):
+    assert client.get('/users?limit=0').status_code == 400
+    assert client.get('/users?limit=100000').status_code == 400
+    assert client.get('/users?after_id=abc').status_code == 400
+    response = client.get('/users?after_id=-1')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "after_id must not be negative"
@@ -0,0 +1,118 @@
+import sqlite3
+import time
+
+import pytest
+from src import create_app
+from src.auth import generate_token
+from src.database import get_db, get_pool
+from src.versions import last_modified
+
+
+@pytest.fixture
+def users():
+    return [(f"User {i}", f"user{i}@example.com", b"x") for i in range(3)]
+
+
+def test_user_etag_answers_304_until_the_user_changes(app, auth_headers, bearer):
+    client = app.test_client()
+    response = client.get('/user/2', headers=auth_headers)
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    for _ in range(3):
+        not_modified = client.get('/user/2', headers=dict(auth_headers, **{'If-None-Match': etag}))
+        assert not_modified.status_code == 304
+        assert not_modified.data == b''
+    assert app.extensions['versions'].metrics()['not_modified'] == 3
+
+    # Another user's change leaves user 2 alone.
+    client.put('/user/1', json={"name": "Ann", "email": "ann@example.com"}, headers=auth_headers)
+    assert client.get('/user/2', headers=dict(auth_headers, **{'If-None-Match': etag})).status_code == 304
+
+    client.put('/user/2', json={"name": "Renamed", "email": "user1@example.com"}, headers=bearer(2))
+    changed = client.get('/user/2', headers=dict(auth_headers, **{'If-None-Match': etag}))
+    assert changed.status_code == 200
+    assert changed.get_json()['name'] == "Renamed"
+    assert changed.headers['ETag'] != etag
+
+
+def test_writes_from_other_connections_move_the_etags(app, auth_headers):
+    client = app.test_client()
+    user_etag = client.get('/user/2', headers=auth_headers).headers['ETag']
+    users_etag = client.get('/users?limit=10', headers=auth_headers).headers['ETag']
+
+    # As another worker or import_users.py would.
+    other = sqlite3.connect(app.config['DATABASE_NAME'])
+    other.execute("UPDATE users SET name = 'Elsewhere' WHERE id = 2")
+    other.commit()
+    other.close()
+
+    changed = client.get('/user/2', headers=dict(auth_headers, **{'If-None-Match': user_etag}))
+    assert changed.status_code == 200
+    assert changed.get_json()['name'] == "Elsewhere"
+    assert client.get('/users?limit=10', headers=dict(auth_headers, **{'If-None-Match': users_etag})).status_code == 200
+
+
+def test_password_changes_leave_the_etags_alone(app, auth_headers):
+    client = app.test_client()
+    etag = client.get('/user/2', headers=auth_headers).headers['ETag']
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE users SET password = 'rehashed' WHERE id = 2")
+        db.commit()
+    assert client.get('/user/2', headers=dict(auth_headers, **{'If-None-Match': etag})).status_code == 304
+
+
+def test_no_validators_without_the_versions_table(tmp_path, legacy_schema):
+    app = create_app(config_override={'TESTING': True, 'DATABASE_NAME': str(tmp_path / "users.db")})
+    with app.app_context():
+        db = get_db()
+        legacy_schema(db)
+        db.execute("INSERT INTO users (name, email, password) VALUES ('A', 'a@example.com', 'x')")
+        db.commit()
+        headers = {"Authorization": f"Bearer {generate_token(1)}"}
+    response = app.test_client().get('/user/1', headers=dict(headers, **{'If-None-Match': '*'}))
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert app.extensions['versions'].metrics()['unavailable'] == 1
+    get_pool(app).close()
+
+
+def test_users_etag_follows_the_table(app, auth_headers):
+    client = app.test_client()
+    response = client.get('/users?limit=10', headers=auth_headers)
+    etag = response.headers['ETag']
+    assert 'Accept' in response.headers['Vary']
+    headers = dict(auth_headers, **{'If-None-Match': etag})
+    assert client.get('/users?limit=10', headers=headers).status_code == 304
+    ndjson = client.get('/users', headers=dict(headers, Accept='application/x-ndjson'))
+    assert ndjson.status_code == 200
+    assert ndjson.headers['ETag'] != etag
+
+    client.post('/users', json={"name": "New", "email": "new@example.com", "password": "pw"})
+    changed = client.get('/users?limit=10', headers=headers)
+    assert changed.status_code == 200
+    assert len(changed.get_json()) == 4
+
+    etag = changed.headers['ETag']
+    body = "name,email,password\nBulk,bulk@example.com,pw\n"
+    client.post('/users/import', data=body, content_type='text/csv', headers=auth_headers)
+    assert client.get('/users?limit=10', headers=dict(auth_headers, **{'If-None-Match': etag})).status_code == 200
+
+
+def test_last_modified_is_withheld_within_its_second(app, auth_headers):
+    now = time.time()
+    assert last_modified((1, now)) is None
+    assert last_modified((1, now - 5)) == int(now - 5)
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE user_versions SET modified = ? WHERE id = 0", (now - 5,))
+        db.commit()
+    client = app.test_client()
+    response = client.get('/users?limit=10', headers=auth_headers)
+    since = response.headers['Last-Modified']
+    assert client.get('/users?limit=10', headers=dict(auth_headers, **{'If-Modified-Since': since})).status_code == 304
+    client.post('/users', json={"name": "New", "email": "new@example.com", "password": "pw"})
+    assert client.get('/users?limit=10', headers=dict(auth_headers, **{'If-Modified-Since': since})).status_code == 200
+
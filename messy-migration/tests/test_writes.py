@@ -0,0 +1,92 @@
+import re
+import sqlite3
+
+import pytest
+from src.database import LockRetry, DatabaseBusy, get_db, transaction
+from src.models import User
+
+
+@pytest.fixture
+def app_config():
+    return {'DB_BUSY_TIMEOUT': 0.01, 'DB_WRITE_ATTEMPTS': 2, 'DB_WRITE_BACKOFF': 0.001}
+
+
+def statements(client, endpoint):
+    text = client.get('/metrics').get_data(as_text=True)
+    return int(re.search(rf'^users_api_db_statements_total{{endpoint="{endpoint}"}} (\d+)$', text, re.M).group(1))
+
+
+def test_create_is_one_statement(app):
+    client = app.test_client()
+    response = client.post('/users', json={"name": "Cy", "email": "cy@example.com", "password": "pw"})
+    assert response.status_code == 201
+    assert response.get_json() == {"id": 3, "name": "Cy", "email": "cy@example.com"}
+    assert statements(client, "routes.create_user") == 1
+    assert client.post('/users', json={"name": "Cy", "email": "cy@example.com", "password": "pw"}).status_code == 409
+
+
+def test_update_is_one_statement(app, auth_headers):
+    client = app.test_client()
+    client.get('/user/1', headers=auth_headers)  # caches the authenticated user
+    response = client.put('/user/1', json={"name": "Ann B", "email": "annb@example.com"}, headers=auth_headers)
+    assert response.get_json() == {"id": 1, "name": "Ann B", "email": "annb@example.com"}
+    assert statements(client, "routes.update_user") == 1
+    taken = client.put('/user/1', json={"name": "Ann", "email": "bob@example.com"}, headers=auth_headers)
+    assert taken.status_code == 409
+    assert client.get('/user/1', headers=auth_headers).get_json()['name'] == "Ann B"
+
+
+def test_transaction_rolls_back_on_error(app):
+    with app.app_context():
+        db = get_db()
+        with pytest.raises(RuntimeError):
+            with transaction(db):
+                User.delete(db, 1)
+                raise RuntimeError
+        with transaction(db, immediate=True):
+            User.update(db, 2, "Robert", "bob@example.com")
+        assert User.get_by_id(db, 1) is not None
+        assert not db.in_transaction
+        assert User.get_by_id(db, 2).name == "Robert"
+
+
+def test_locked_writes_are_retried_then_answered_with_503(app):
+    blocker = sqlite3.connect(app.config['DATABASE_NAME'])
+    blocker.execute("BEGIN IMMEDIATE")
+    client = app.test_client()
+    response = client.post('/users', json={"name": "Cy", "email": "cy@example.com", "password": "pw"})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    blocker.rollback()
+    blocker.close()
+    assert client.post('/users', json={"name": "Cy", "email": "cy@example.com", "password": "pw"}).status_code == 201
+    metrics = client.get('/metrics', headers={'Accept': 'application/json'}).get_json()['db_writes']
+    assert (metrics['runs'], metrics['retries'], metrics['gave_up']) == (2, 1, 1)
+
+
+def test_retry_succeeds_once_the_lock_is_free(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "retry.db"))
+    db.execute("CREATE TABLE t (x)")
+    calls = []
+
+    def write():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        db.execute("INSERT INTO t VALUES (1)")
+        return "ok"
+
+    retry = LockRetry(attempts=3, backoff=0.001)
+    assert retry.run(db, write) == "ok"
+    assert db.execute("SELECT count(*) FROM t").fetchone() == (1,)
+    assert retry.metrics()['retries'] == 1
+
+    def fail(message):
+        raise sqlite3.OperationalError(message)
+
+    with pytest.raises(sqlite3.OperationalError):
+        retry.run(db, fail, "no such table: nope")
+    assert retry.metrics()['retries'] == 1
+    with pytest.raises(DatabaseBusy):
+        LockRetry(attempts=1).run(db, fail, "database is locked")
+    db.close()
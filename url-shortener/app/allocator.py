@@ -0,0 +1,135 @@
+import fcntl
+import hashlib
+import os
+import string
+import threading
+from .config import Config
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+class CodeSpaceExhausted(Exception):
+    pass
+
+
+def encode_base62(number, length):
+    chars = []
+    for _ in range(length):
+        number, digit = divmod(number, BASE)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class LocalBlockSource:
+    """Hands out ID blocks from an in-process counter."""
+
+    def __init__(self, start=0):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def reserve(self, size):
+        with self._lock:
+            start = self._next
+            self._next += size
+            return start
+
+
+class FileBlockSource:
+    """Hands out ID blocks from a counter file shared by every process that
+    points at it. Each reservation is one ``flock``-protected read-modify-write,
+    so workers only coordinate once per block rather than once per code."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def reserve(self, size):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.pread(fd, 32, 0).strip()
+            start = int(raw) if raw else 0
+            data = b"%d\n" % (start + size)
+            os.pwrite(fd, data.ljust(32), 0)
+            os.fsync(fd)
+            return start
+        finally:
+            os.close(fd)
+
+
+class ShortCodeAllocator:
+    """Allocates short codes that can never collide.
+
+    Codes come from a monotonically increasing ID, reserved ``block_size`` at
+    a time from ``source``. Each ID is run through a keyed Feistel permutation
+    of ``[0, 62**length)`` (cycle-walking back into range) before being
+    base62 encoded, so consecutive IDs do not produce guessable neighbours.
+    Being a bijection, distinct IDs always yield distinct codes.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, length=6, key="url-shortener", block_size=1000, source=None):
+        self.length = length
+        self.block_size = block_size
+        self.space = BASE ** length
+        self._source = source if source is not None else LocalBlockSource()
+        bits = (self.space - 1).bit_length()
+        self._half_bits = (bits + 1) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        digest = hashlib.blake2b(key.encode(), digest_size=8 * self.ROUNDS).digest()
+        self._round_keys = [int.from_bytes(digest[i:i + 8], "little") for i in range(0, len(digest), 8)]
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _round(self, value, key):
+        value = ((value ^ key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        return (value ^ (value >> 29)) & self._half_mask
+
+    def permute(self, value):
+        half_bits, half_mask = self._half_bits, self._half_mask
+        while True:
+            left, right = value >> half_bits, value & half_mask
+            for key in self._round_keys:
+                left, right = right, left ^ self._round(right, key)
+            value = (left << half_bits) | right
+            if value < self.space:
+                return value
+
+    def _next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._source.reserve(self.block_size)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+        if value >= self.space:
+            raise CodeSpaceExhausted("all %d-character short codes are allocated" % self.length)
+        return value
+
+    def allocate(self):
+        return encode_base62(self.permute(self._next_id()), self.length)
+
+    def allocate_many(self, count):
+        return [self.allocate() for _ in range(count)]
+
+
+def create_allocator(config=Config):
+    source = None
+    if config.DATA_DIR:
+        source = FileBlockSource(os.path.join(config.DATA_DIR, "id-counter"))
+    elif config.SHARED_MEMORY_PATH:
+        # Workers sharing a table must not number codes from their own zero.
+        source = FileBlockSource(config.SHARED_MEMORY_PATH + ".id-counter")
+    return ShortCodeAllocator(
+        length=config.SHORT_CODE_LENGTH,
+        key=config.SHORT_CODE_KEY,
+        block_size=config.ID_BLOCK_SIZE,
+        source=source,
+    )
+
+# Global instance to be used by the Flask app
+code_allocator = create_allocator()
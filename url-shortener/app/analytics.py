@@ -0,0 +1,135 @@
+import datetime
+import struct
+from array import array
+from .config import Config
+
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+
+_RETENTION = {
+    "minute": Config.ANALYTICS_MINUTE_BUCKETS,
+    "hour": Config.ANALYTICS_HOUR_BUCKETS,
+    "day": Config.ANALYTICS_DAY_BUCKETS,
+}
+# (name, bucket width in seconds, bucket count, offset into the counts array)
+LEVELS = []
+_offset = 0
+for _name, _width in GRANULARITIES.items():
+    LEVELS.append((_name, _width, _RETENTION[_name], _offset))
+    _offset += _RETENTION[_name]
+TOTAL_BUCKETS = _offset
+_LEVEL_INDEX = {level[0]: index for index, level in enumerate(LEVELS)}
+_SIZES = struct.Struct("<%dI" % len(LEVELS))
+
+
+class ClickTimeline:
+    """Per-link click counts in fixed-size, array-backed ring buffers.
+
+    Every click is added to the current minute, hour and day bucket at once,
+    so when a minute bucket is overwritten its clicks live on, downsampled,
+    in the hour and day rings. Memory is fixed per link (one int64 head per
+    granularity plus one uint32 per retained bucket) regardless of traffic.
+    """
+
+    __slots__ = ("heads", "counts")
+
+    def __init__(self):
+        self.heads = array("q", [-1] * len(LEVELS))
+        self.counts = array("I", bytes(4 * TOTAL_BUCKETS))
+
+    def record(self, timestamp, count=1):
+        heads, counts = self.heads, self.counts
+        for index, (_, width, size, offset) in enumerate(LEVELS):
+            bucket = timestamp // width
+            head = heads[index]
+            if bucket > head:
+                if head < 0 or bucket - head >= size:
+                    counts[offset:offset + size] = array("I", bytes(4 * size))
+                else:
+                    for stale in range(head + 1, bucket + 1):
+                        counts[offset + stale % size] = 0
+                heads[index] = head = bucket
+            elif bucket <= head - size:
+                continue  # Older than this ring's retention.
+            counts[offset + bucket % size] += count
+
+    def series(self, start, end, granularity):
+        """``[(bucket_start, clicks), ...]`` covering ``[start, end]``, clipped
+        to the buckets this granularity still retains."""
+        index = _LEVEL_INDEX[granularity]
+        _, width, size, offset = LEVELS[index]
+        head = self.heads[index]
+        last = end // width
+        first = max(start // width, last - size + 1)
+        return [
+            (bucket * width, self.counts[offset + bucket % size] if head - size < bucket <= head else 0)
+            for bucket in range(first, last + 1)
+        ]
+
+    def to_bytes(self):
+        return _SIZES.pack(*(level[2] for level in LEVELS)) + self.heads.tobytes() + self.counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a timeline; returns None if it was written with different
+        retention settings."""
+        if len(data) < _SIZES.size or _SIZES.unpack_from(data) != tuple(level[2] for level in LEVELS):
+            return None
+        timeline = cls()
+        heads_end = _SIZES.size + 8 * len(LEVELS)
+        timeline.heads = array("q", bytes(data[_SIZES.size:heads_end]))
+        timeline.counts = array("I", bytes(data[heads_end:]))
+        return timeline
+
+
+# The last second of 9999, the latest time an ISO-8601 ``to`` can name.
+MAX_TIMESTAMP = 253402300799
+
+
+def empty_series(start, end, granularity):
+    width = GRANULARITIES[granularity]
+    size = _RETENTION[granularity]
+    last = end // width
+    return [(bucket * width, 0) for bucket in range(max(start // width, last - size + 1), last + 1)]
+
+
+def _parse_time(value, key):
+    try:
+        timestamp = int(value)
+    except ValueError:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        timestamp = int(parsed.timestamp())
+    if not 0 <= timestamp <= MAX_TIMESTAMP:
+        raise ValueError("%s must be between 1970 and 9999" % key)
+    return timestamp
+
+
+def parse_range(params, now):
+    """Read ``from``/``to`` (epoch seconds or ISO-8601) and ``granularity``
+    from a query mapping. Defaults to the whole retained window ending now.
+    Raises ValueError on bad input."""
+    granularity = params.get("granularity", "hour")
+    if granularity not in GRANULARITIES:
+        raise ValueError("granularity must be one of: %s" % ", ".join(GRANULARITIES))
+    end = _parse_time(params["to"], "to") if params.get("to") else now
+    if params.get("from"):
+        start = _parse_time(params["from"], "from")
+    else:
+        start = max(0, end - GRANULARITIES[granularity] * (_RETENTION[granularity] - 1))
+    if start > end:
+        raise ValueError("from must not be after to")
+    return start, end, granularity
+
+
+def _iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def timeline_payload(series, start, end, granularity):
+    return {
+        "granularity": granularity,
+        "from": _iso(start),
+        "to": _iso(end),
+        "buckets": [{"start": _iso(bucket_start), "clicks": clicks} for bucket_start, clicks in series],
+    }
@@ -0,0 +1,240 @@
+"""ASGI entry point serving the shortener's routes without Flask.
+
+Run it with any ASGI server, e.g. ``uvicorn app.asgi:app``. It shares the
+process-global store, allocator and redirect cache with the WSGI app.
+"""
+import asyncio
+import time
+from urllib.parse import parse_qsl
+from werkzeug.http import parse_etags, quote_etag
+from .analytics import parse_range, timeline_payload
+from .allocator import CodeSpaceExhausted, code_allocator
+from .cache import redirect_cache
+from .expiry import limits_payload, parse_limits
+from .json_provider import dumps_bytes, loads
+from .models import url_store
+from .shared import SharedStoreFull
+from .storage import StorageBackend
+from .utils import is_valid_url
+
+MAX_BODY_SIZE = 1024 * 1024
+
+class AsyncURLStore:
+    """Awaitable facade over URLStore.
+
+    In-memory operations finish in microseconds and run inline on the event
+    loop. When the store persists to a real backend or is shared between
+    processes, calls that may block are offloaded to the default executor:
+    writes, which wait on the WAL or on another process's lock; clicks,
+    since the one that crosses the buffer's flush threshold flushes inline;
+    stats, which wait for a flush in progress; and lookups, which on the
+    shared store wait out another process's compaction.
+    """
+
+    def __init__(self, store, offload_writes=None):
+        self.store = store
+        if offload_writes is None:
+            # The shared store's inserts take a lock other processes hold
+            # while they compact the whole table.
+            offload_writes = type(store.backend) is not StorageBackend
+        self.offload_writes = offload_writes
+
+    async def _offload(self, fn, *args):
+        if self.offload_writes:
+            return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        return fn(*args)
+
+    async def get_url(self, short_code):
+        return await self._offload(self.store.get_url, short_code)
+
+    async def is_cacheable(self, short_code):
+        return await self._offload(self.store.is_cacheable, short_code)
+
+    async def find_url(self, long_url):
+        return self.store.find_url(long_url)
+
+    async def get_version(self, short_code):
+        return await self._offload(self.store.get_version, short_code)
+
+    async def get_stats(self, short_code):
+        return await self._offload(self.store.get_stats, short_code)
+
+    async def get_click_series(self, short_code, start, end, granularity):
+        return self.store.get_click_series(short_code, start, end, granularity)
+
+    async def add_url(self, short_code, long_url, expires_at=None, max_clicks=None):
+        return await self._offload(self.store.add_url, short_code, long_url, expires_at, max_clicks)
+
+    async def increment_clicks(self, short_code):
+        return await self._offload(self.store.increment_clicks, short_code)
+
+    async def record_click(self, short_code):
+        return await self._offload(self.store.record_click, short_code)
+
+
+async_store = AsyncURLStore(url_store)
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send(send, status, body, headers):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, payload, status=200, headers=()):
+    body = dumps_bytes(payload)
+    await _send(send, status, body, [(b"content-type", b"application/json"),
+                                     (b"content-length", str(len(body)).encode()), *headers])
+
+
+def _host_url(scope):
+    headers = dict(scope.get("headers") or ())
+    host = headers.get(b"host")
+    if host is None:
+        name, port = scope.get("server") or ("localhost", 80)
+        # A unix socket is (path, None); like werkzeug, use the path alone.
+        host = (name if port is None else "%s:%d" % (name, port)).encode()
+    return "%s://%s/" % (scope.get("scheme", "http"), host.decode("latin-1"))
+
+
+async def health_check(scope, receive, send):
+    await _send_json(send, {"status": "healthy", "service": "URL Shortener API"})
+
+
+async def api_health(scope, receive, send):
+    await _send_json(send, {"status": "ok", "message": "URL Shortener API is running"})
+
+
+async def shorten_url(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return await _send_json(send, {"error": "Request body too large"}, 413)
+    try:
+        data = loads(body) if body else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or 'url' not in data:
+        return await _send_json(send, {"error": "URL not provided"}, 400)
+
+    long_url = data['url']
+    if not is_valid_url(long_url):
+        return await _send_json(send, {"error": "Invalid URL"}, 400)
+    try:
+        expires_at, max_clicks = parse_limits(data, int(time.time()))
+    except ValueError as e:
+        return await _send_json(send, {"error": str(e)}, 400)
+    limited = expires_at is not None or max_clicks is not None
+
+    host_url = _host_url(scope)
+    if url_store.dedup and not limited:
+        short_code = await async_store.find_url(long_url)
+        if short_code is not None:
+            return await _send_json(send, {"short_code": short_code, "short_url": host_url + short_code})
+
+    try:
+        short_code = code_allocator.allocate()
+        while await async_store.add_url(short_code, long_url, expires_at, max_clicks) is None:
+            short_code = code_allocator.allocate()
+    except CodeSpaceExhausted:
+        return await _send_json(send, {"error": "No short codes left"}, 503)
+    except SharedStoreFull:
+        return await _send_json(send, {"error": "Store is full"}, 503)
+    result = {"short_code": short_code, "short_url": host_url + short_code}
+    if limited:
+        result.update(limits_payload(expires_at, max_clicks))
+    await _send_json(send, result, 201)
+
+
+async def redirect_to_url(scope, receive, send, short_code):
+    cached = redirect_cache.get(short_code)
+    if cached is not None:
+        await async_store.record_click(short_code)
+    else:
+        long_url = await async_store.increment_clicks(short_code)
+        if not long_url:
+            return await _send_json(send, {"error": "Not Found"}, 404)
+        if await async_store.is_cacheable(short_code):
+            cached = redirect_cache.put(short_code, long_url)
+        else:
+            cached = redirect_cache.build(long_url)
+    headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in cached.headers]
+    headers.append((b"content-length", str(len(cached.body)).encode()))
+    await _send(send, cached.status, cached.body, headers)
+
+
+async def get_url_stats(scope, receive, send, short_code):
+    params = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+    timeline = any(key in params for key in ("from", "to", "granularity"))
+    version = None if timeline else await async_store.get_version(short_code)
+    headers = ()
+    if version is not None:
+        headers = ((b"etag", quote_etag(version, weak=True).encode()), (b"cache-control", b"no-cache"))
+        if_none_match = dict(scope.get("headers") or ()).get(b"if-none-match")
+        if if_none_match is not None and parse_etags(if_none_match.decode("latin-1")).contains_weak(version):
+            return await _send(send, 304, b"", list(headers))
+    stats = await async_store.get_stats(short_code)
+    if stats:
+        if timeline:
+            if not async_store.store.timelines:
+                return await _send_json(send, {"error": "Click timelines are not kept by this store"}, 501)
+            try:
+                start, end, granularity = parse_range(params, int(time.time()))
+            except ValueError as e:
+                return await _send_json(send, {"error": str(e)}, 400)
+            series = await async_store.get_click_series(short_code, start, end, granularity)
+            stats["timeline"] = timeline_payload(series or [], start, end, granularity)
+        return await _send_json(send, stats, headers=headers)
+    await _send_json(send, {"error": "Short code not found"}, 404)
+
+
+ROUTES = {
+    ("GET", "/"): health_check,
+    ("GET", "/api/health"): api_health,
+    ("POST", "/api/shorten"): shorten_url,
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            url_store.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    handler = ROUTES.get((method, path))
+    if handler is not None:
+        return await handler(scope, receive, send)
+
+    if method == "GET":
+        if path.startswith("/api/stats/") and "/" not in path[11:] and path[11:]:
+            return await get_url_stats(scope, receive, send, path[11:])
+        if path.count("/") == 1 and len(path) > 1:
+            return await redirect_to_url(scope, receive, send, path[1:])
+
+    if any(route_path == path for _, route_path in ROUTES):
+        return await _send_json(send, {"error": "Method Not Allowed"}, 405)
+    await _send_json(send, {"error": "Not Found"}, 404)
@@ -0,0 +1,131 @@
+import threading
+from werkzeug.utils import redirect
+from .config import Config
+from .models import url_store
+
+DEFAULT_CAPACITY = 4096
+
+class CachedRedirect:
+    __slots__ = ("status", "headers", "body", "referenced")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.referenced = False
+
+    def response(self, response_class):
+        return response_class(self.body, self.status, self.headers)
+
+
+class RedirectCache:
+    """Bounded cache of prebuilt redirect responses keyed by short code.
+
+    The status line, ``Location``, cache headers and HTML body are computed
+    once per code, so a hit only instantiates a response object. Eviction is
+    CLOCK (second chance): a hit just sets the entry's reference bit without
+    taking a lock, and only inserts, evictions and invalidations lock.
+    Hit/miss counters are plain integers and may under-count slightly when
+    threads race on them.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, status=302, cache_control="no-store"):
+        self.capacity = capacity
+        self.status = status
+        # Browsers must not cache the redirect, or its clicks would never reach us.
+        self.cache_control = cache_control
+        self._entries = {}
+        # Each cached code holds one ring slot; invalidated slots are reused
+        # before the hand evicts anything.
+        self._ring = []
+        self._slots = {}
+        self._free = []
+        self._hand = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, short_code):
+        entry = self._entries.get(short_code)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry.referenced = True
+        self.hits += 1
+        return entry
+
+    def build(self, long_url):
+        template = redirect(long_url, self.status)
+        headers = [("Location", template.headers["Location"]),
+                   ("Content-Type", template.headers["Content-Type"]),
+                   ("Cache-Control", self.cache_control)]
+        return CachedRedirect(self.status, headers, template.get_data())
+
+    def put(self, short_code, long_url):
+        entry = self.build(long_url)
+        if self.capacity <= 0:
+            return entry
+        with self._lock:
+            if short_code not in self._slots:
+                if self._free:
+                    slot = self._free.pop()
+                elif len(self._ring) < self.capacity:
+                    slot = len(self._ring)
+                    self._ring.append(None)
+                else:
+                    slot = self._evict_slot()
+                self._ring[slot] = short_code
+                self._slots[short_code] = slot
+            self._entries[short_code] = entry
+        return entry
+
+    def _evict_slot(self):
+        # Only called with every slot taken.
+        ring, entries = self._ring, self._entries
+        while True:
+            slot = self._hand
+            self._hand = (slot + 1) % len(ring)
+            victim = entries[ring[slot]]
+            if victim.referenced:
+                victim.referenced = False
+                continue
+            del entries[ring[slot]]
+            del self._slots[ring[slot]]
+            self.evictions += 1
+            return slot
+
+    def invalidate(self, short_code=None):
+        """Drop one code, or everything when ``short_code`` is None."""
+        with self._lock:
+            if short_code is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._ring = []
+                self._slots.clear()
+                self._free = []
+                self._hand = 0
+                return
+            slot = self._slots.pop(short_code, None)
+            if slot is not None:
+                del self._entries[short_code]
+                self._ring[slot] = None
+                self._free.append(slot)
+                self.invalidations += 1
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "capacity": self.capacity,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+# Global instance shared by the WSGI and ASGI entry points
+redirect_cache = RedirectCache(capacity=Config.REDIRECT_CACHE_SIZE)
+url_store.subscribe(redirect_cache.invalidate)
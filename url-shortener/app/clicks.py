@@ -0,0 +1,178 @@
+import threading
+import time
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_FLUSH_THRESHOLD = 1000
+
+class _ThreadCounts:
+    __slots__ = ("lock", "counts", "pending", "first_pending_at", "thread")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.pending = 0
+        self.first_pending_at = None
+        self.thread = threading.current_thread()
+
+
+class ClickBuffer:
+    """Aggregates redirect clicks in per-thread counters and merges them into
+    a sink in batches.
+
+    Each thread only ever touches its own (uncontended) counter lock on the
+    redirect path. Buffers are flushed when any thread crosses
+    ``flush_threshold`` pending clicks, and every ``flush_interval`` seconds
+    by a background thread started with the first buffered click. Holding ``frozen()`` blocks flushes so a reader can
+    combine the sink's counts with ``pending()`` without double counting.
+    """
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_threshold=DEFAULT_FLUSH_THRESHOLD, autostart=True):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._autostart = autostart
+        self._sink = None
+        self._local = threading.local()
+        self._buffers = []
+        self._registry_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = self._last_flush = time.monotonic()
+        self._flushes = 0
+        self._flushed_clicks = 0
+        self._flush_seconds = 0.0
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    def bind(self, sink):
+        """Set the callable that receives ``{short_code: delta}`` batches."""
+        self._sink = sink
+
+    def _register(self):
+        buffer = _ThreadCounts()
+        with self._registry_lock:
+            self._buffers.append(buffer)
+        self._local.buffer = buffer
+        if self._autostart and self._flusher is None:
+            self.start()
+        return buffer
+
+    def add(self, short_code, count=1):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._register()
+        with buffer.lock:
+            counts = buffer.counts
+            counts[short_code] = counts.get(short_code, 0) + count
+            if not buffer.pending:
+                buffer.first_pending_at = time.monotonic()
+            buffer.pending += count
+            pending = buffer.pending
+        if pending >= self.flush_threshold:
+            self.flush(blocking=False)
+
+    def pending(self, short_code):
+        total = 0
+        for buffer in list(self._buffers):
+            total += buffer.counts.get(short_code, 0)
+        return total
+
+    def frozen(self):
+        return self._flush_lock
+
+    def flush(self, blocking=True):
+        """Merge every thread's counters into the sink; returns clicks flushed."""
+        if not self._flush_lock.acquire(blocking):
+            return 0
+        try:
+            return self._flush_locked()
+        finally:
+            self._flush_lock.release()
+
+    def _flush_locked(self):
+        started = time.monotonic()
+        with self._registry_lock:
+            buffers = list(self._buffers)
+        merged = {}
+        flushed = 0
+        oldest = None
+        dead = []
+        for buffer in buffers:
+            with buffer.lock:
+                counts, buffer.counts = buffer.counts, {}
+                first_pending_at, buffer.first_pending_at = buffer.first_pending_at, None
+                flushed += buffer.pending
+                buffer.pending = 0
+            for short_code, count in counts.items():
+                merged[short_code] = merged.get(short_code, 0) + count
+            if first_pending_at is not None and (oldest is None or first_pending_at < oldest):
+                oldest = first_pending_at
+            if not buffer.thread.is_alive():
+                dead.append(buffer)
+        if dead:
+            with self._registry_lock:
+                self._buffers = [b for b in self._buffers if b not in dead]
+        if merged and self._sink is not None:
+            self._sink(merged)
+        finished = time.monotonic()
+        self._last_flush = finished
+        self._flushes += 1
+        self._flushed_clicks += flushed
+        self._flush_seconds += finished - started
+        if oldest is not None:
+            self._last_lag = finished - oldest
+            self._max_lag = max(self._max_lag, self._last_lag)
+        return flushed
+
+    def discard(self):
+        """Drop every unflushed click without applying it."""
+        with self._flush_lock:
+            with self._registry_lock:
+                buffers = list(self._buffers)
+            for buffer in buffers:
+                with buffer.lock:
+                    buffer.counts = {}
+                    buffer.pending = 0
+                    buffer.first_pending_at = None
+
+    def start(self):
+        with self._flusher_lock:
+            if self._flusher is not None:
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._run, name="click-flusher", daemon=True)
+            self._flusher.start()
+
+    def stop(self):
+        # Held through the join so a concurrent start() cannot clear _stop
+        # before the old flusher has seen it.
+        with self._flusher_lock:
+            flusher, self._flusher = self._flusher, None
+            if flusher is not None:
+                self._stop.set()
+                flusher.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def metrics(self):
+        buffers = list(self._buffers)
+        return {
+            "flush_interval_seconds": self.flush_interval,
+            "flush_threshold": self.flush_threshold,
+            "flushes": self._flushes,
+            "flushed_clicks": self._flushed_clicks,
+            "pending_clicks": sum(buffer.pending for buffer in buffers),
+            "thread_buffers": len(buffers),
+            "avg_seconds_between_flushes": (
+                (self._last_flush - self._started) / self._flushes if self._flushes else 0.0),
+            "seconds_since_last_flush": time.monotonic() - self._last_flush,
+            "avg_flush_seconds": self._flush_seconds / self._flushes if self._flushes else 0.0,
+            "last_flush_lag_seconds": self._last_lag,
+            "max_flush_lag_seconds": self._max_lag,
+        }
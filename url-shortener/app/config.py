@@ -0,0 +1,35 @@
+import os
+
+class Config:
+    # Directory for the write-ahead log and snapshots; unset keeps URLs in memory only.
+    DATA_DIR = os.environ.get('URL_SHORTENER_DATA_DIR')
+    NUM_SHARDS = int(os.environ.get('URL_SHORTENER_SHARDS', 16))
+    CLICK_FLUSH_INTERVAL = float(os.environ.get('URL_SHORTENER_CLICK_FLUSH_INTERVAL', 1.0))
+    CLICK_FLUSH_THRESHOLD = int(os.environ.get('URL_SHORTENER_CLICK_FLUSH_THRESHOLD', 1000))
+    WAL_FSYNC_INTERVAL = float(os.environ.get('URL_SHORTENER_WAL_FSYNC_INTERVAL', 1.0))
+    SNAPSHOT_BYTES = int(os.environ.get('URL_SHORTENER_SNAPSHOT_BYTES', 64 * 1024 * 1024))
+    # Share one string object between records that shorten the same long URL.
+    INTERN_URLS = os.environ.get('URL_SHORTENER_INTERN_URLS', '').lower() in ('1', 'true', 'yes')
+    SHORT_CODE_LENGTH = int(os.environ.get('URL_SHORTENER_CODE_LENGTH', 6))
+    # Keys the short code permutation; keep it stable once codes have been issued.
+    SHORT_CODE_KEY = os.environ.get('URL_SHORTENER_CODE_KEY', 'url-shortener')
+    ID_BLOCK_SIZE = int(os.environ.get('URL_SHORTENER_ID_BLOCK_SIZE', 1000))
+    # Answer repeat shortens of the same long URL with the code minted first.
+    DEDUP_URLS = os.environ.get('URL_SHORTENER_DEDUP_URLS', '').lower() in ('1', 'true', 'yes')
+    # JSON batch bodies are buffered whole, so they are capped; NDJSON bodies are streamed.
+    MAX_BATCH_SIZE = int(os.environ.get('URL_SHORTENER_MAX_BATCH_SIZE', 10000))
+    BATCH_CHUNK_SIZE = int(os.environ.get('URL_SHORTENER_BATCH_CHUNK_SIZE', 1000))
+    # Encode JSON with orjson when it is installed.
+    FAST_JSON = os.environ.get('URL_SHORTENER_FAST_JSON', 'true').lower() in ('1', 'true', 'yes')
+    # Prebuilt redirect responses kept for the hottest short codes; 0 disables the cache.
+    REDIRECT_CACHE_SIZE = int(os.environ.get('URL_SHORTENER_REDIRECT_CACHE_SIZE', 4096))
+    # Retained click-timeline buckets per link at each granularity.
+    ANALYTICS_MINUTE_BUCKETS = int(os.environ.get('URL_SHORTENER_ANALYTICS_MINUTES', 60))
+    ANALYTICS_HOUR_BUCKETS = int(os.environ.get('URL_SHORTENER_ANALYTICS_HOURS', 48))
+    ANALYTICS_DAY_BUCKETS = int(os.environ.get('URL_SHORTENER_ANALYTICS_DAYS', 30))
+    # Seconds between sweeps that remove links past their TTL.
+    EXPIRY_SWEEP_INTERVAL = float(os.environ.get('URL_SHORTENER_EXPIRY_SWEEP_INTERVAL', 1.0))
+    # Share one store between worker processes through this file (e.g. under /dev/shm).
+    SHARED_MEMORY_PATH = os.environ.get('URL_SHORTENER_SHM_PATH')
+    SHARED_CAPACITY = int(os.environ.get('URL_SHORTENER_SHM_CAPACITY', 1 << 20))
+    SHARED_ARENA_BYTES = int(os.environ.get('URL_SHORTENER_SHM_ARENA_BYTES', 256 * 1024 * 1024))
@@ -0,0 +1,144 @@
+import datetime
+import threading
+import time
+
+DEFAULT_SWEEP_INTERVAL = 1.0
+# Caps that keep expiry dates printable and both limits within the 64-bit
+# fields of the WAL and the shared-memory slots.
+MAX_TTL = 10 * 365 * 24 * 3600
+MAX_CLICKS = 2 ** 31 - 1
+
+
+def _positive_int(data, key, maximum):
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= maximum:
+        raise ValueError("%s must be an integer between 1 and %d" % (key, maximum))
+    return value
+
+
+def parse_limits(data, now):
+    """Read the optional ``ttl`` (seconds) and ``max_clicks`` of a shorten
+    request; returns ``(expires_at, max_clicks)``. Raises ValueError."""
+    ttl = _positive_int(data, "ttl", MAX_TTL)
+    return (now + ttl if ttl is not None else None), _positive_int(data, "max_clicks", MAX_CLICKS)
+
+
+def limits_payload(expires_at, max_clicks):
+    payload = {}
+    if expires_at is not None:
+        payload["expires_at"] = datetime.datetime.fromtimestamp(expires_at, datetime.timezone.utc).isoformat()
+    if max_clicks is not None:
+        payload["max_clicks"] = max_clicks
+    return payload
+
+
+class ExpirySweeper:
+    """Timer wheel of short codes keyed by their expiry second.
+
+    ``schedule`` appends the code to the slot for its second; ``sweep`` pops
+    only the slots that have come due since the previous sweep and hands
+    their codes to the sink, so its cost follows what expires rather than
+    how many links are live. A background thread started with the first
+    scheduled code sweeps every ``sweep_interval`` seconds. Slots may name
+    codes already removed (e.g. by reaching their click limit); the sink is
+    expected to ignore those.
+    """
+
+    def __init__(self, sweep_interval=DEFAULT_SWEEP_INTERVAL, autostart=True):
+        self.sweep_interval = sweep_interval
+        self._autostart = autostart
+        self._sink = None
+        self._slots = {}
+        self._cursor = int(time.time())
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._scheduled = 0
+        self._sweeps = 0
+        self._expired = 0
+        self._last_sweep_seconds = 0.0
+        self._max_sweep_seconds = 0.0
+
+    def bind(self, sink):
+        """Set the callable that receives ``(short_codes, now)`` and returns
+        how many codes it removed."""
+        self._sink = sink
+
+    def schedule(self, short_code, expires_at):
+        with self._lock:
+            # Anything at or before the cursor goes out with the next sweep.
+            second = max(expires_at, self._cursor + 1)
+            slot = self._slots.get(second)
+            if slot is None:
+                self._slots[second] = [short_code]
+            else:
+                slot.append(short_code)
+            self._scheduled += 1
+        if self._autostart and self._sweeper is None:
+            self.start()
+
+    def sweep(self, now=None):
+        """Expire every code due by ``now``; returns how many were removed."""
+        started = time.perf_counter()
+        if now is None:
+            now = int(time.time())
+        due = []
+        with self._lock:
+            if now - self._cursor > len(self._slots):
+                # Long gap (or a clock jump): visiting the slots is cheaper than the seconds.
+                seconds = [second for second in self._slots if second <= now]
+            else:
+                seconds = range(self._cursor + 1, now + 1)
+            for second in seconds:
+                slot = self._slots.pop(second, None)
+                if slot is not None:
+                    due.extend(slot)
+            self._cursor = max(self._cursor, now)
+            self._scheduled -= len(due)
+        expired = self._sink(due, now) if due and self._sink is not None else 0
+        elapsed = time.perf_counter() - started
+        self._sweeps += 1
+        self._expired += expired
+        self._last_sweep_seconds = elapsed
+        self._max_sweep_seconds = max(self._max_sweep_seconds, elapsed)
+        return expired
+
+    def discard(self):
+        with self._lock:
+            self._slots.clear()
+            self._scheduled = 0
+
+    def start(self):
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop(self):
+        # Held through the join so a concurrent start() cannot clear _stop
+        # before the old sweeper has seen it.
+        with self._sweeper_lock:
+            sweeper, self._sweeper = self._sweeper, None
+            if sweeper is not None:
+                self._stop.set()
+                sweeper.join()
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            self.sweep()
+
+    def metrics(self):
+        return {
+            "sweep_interval_seconds": self.sweep_interval,
+            "scheduled": self._scheduled,
+            "slots": len(self._slots),
+            "sweeps": self._sweeps,
+            "expired": self._expired,
+            "last_sweep_seconds": self._last_sweep_seconds,
+            "max_sweep_seconds": self._max_sweep_seconds,
+        }
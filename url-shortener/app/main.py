@@ -1,8 +1,21 @@
-from flask import Flask, jsonify, request, redirect, abort
+import time
+from itertools import islice
+from flask import Flask, Response, abort, jsonify, request, stream_with_context
+from .analytics import parse_range, timeline_payload
+from .allocator import CodeSpaceExhausted, code_allocator
+from .cache import redirect_cache
+from .config import Config
+from .expiry import limits_payload, parse_limits
+from .json_provider import FastJSONProvider
 from .models import url_store
-from .utils import generate_short_code, is_valid_url
+from .shared import STORE_FULL, SharedStoreFull
+from .utils import is_valid_url, validate_urls
 
 app = Flask(__name__)
+if Config.FAST_JSON:
+    app.json = FastJSONProvider(app)
+
+_INVALID_JSON = object()
 
 @app.route('/')
 def health_check():
@@ -18,6 +31,15 @@ def api_health():
         "message": "URL Shortener API is running"
     })
 
+@app.route('/api/metrics')
+def api_metrics():
+    metrics = {"urls": len(url_store), "storage": url_store.backend.metrics()}
+    if url_store.click_buffer is not None:
+        metrics["clicks"] = url_store.click_buffer.metrics()
+    metrics["redirect_cache"] = redirect_cache.metrics()
+    metrics["expiry"] = url_store.sweeper.metrics()
+    return jsonify(metrics)
+
 @app.route('/api/shorten', methods=['POST'])
 def shorten_url():
     data = request.get_json()
@@ -27,29 +49,161 @@ def shorten_url():
     long_url = data['url']
     if not is_valid_url(long_url):
         return jsonify({"error": "Invalid URL"}), 400
+    try:
+        expires_at, max_clicks = parse_limits(data, int(time.time()))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limited = expires_at is not None or max_clicks is not None
 
-    short_code = generate_short_code()
-    while url_store.get_url(short_code) is not None:
-        short_code = generate_short_code()
+    if url_store.dedup and not limited:
+        short_code = url_store.find_url(long_url)
+        if short_code is not None:
+            return jsonify({"short_code": short_code, "short_url": request.host_url + short_code}), 200
 
-    url_store.add_url(short_code, long_url)
+    try:
+        short_code = code_allocator.allocate()
+        # Allocated codes never repeat; this only skips codes a restarted process
+        # without a persistent ID counter may hand out again.
+        while url_store.add_url(short_code, long_url, expires_at, max_clicks) is None:
+            short_code = code_allocator.allocate()
+    except CodeSpaceExhausted:
+        return jsonify({"error": "No short codes left"}), 503
+    except SharedStoreFull:
+        return jsonify({"error": "Store is full"}), 503
 
     short_url = request.host_url + short_code
-    return jsonify({"short_code": short_code, "short_url": short_url}), 201
+    result = {"short_code": short_code, "short_url": short_url}
+    if limited:
+        result.update(limits_payload(expires_at, max_clicks))
+    return jsonify(result), 201
+
+def shorten_many(long_urls, host_url):
+    """Validate, allocate and insert a chunk of URLs; one result per input."""
+    results = [None] * len(long_urls)
+    pending = []
+    repeats = []
+    first_seen = {}
+    valid = validate_urls(long_urls)
+    for position, long_url in enumerate(long_urls):
+        if long_url is _INVALID_JSON:
+            results[position] = {"error": "Invalid JSON"}
+        elif not valid[position]:
+            results[position] = {"url": long_url, "error": "Invalid URL"}
+        elif not url_store.dedup:
+            pending.append(position)
+        elif long_url in first_seen:
+            repeats.append((position, first_seen[long_url]))
+        else:
+            short_code = url_store.find_url(long_url)
+            if short_code is not None:
+                results[position] = {"url": long_url, "short_code": short_code}
+            else:
+                first_seen[long_url] = position
+                pending.append(position)
+
+    try:
+        while pending:
+            codes = code_allocator.allocate_many(len(pending))
+            added = url_store.add_many([(code, long_urls[p]) for code, p in zip(codes, pending)])
+            retry = []
+            for position, short_code in zip(pending, added):
+                if short_code is None:
+                    retry.append(position)
+                elif short_code is STORE_FULL:
+                    results[position] = {"url": long_urls[position], "error": "Store is full"}
+                else:
+                    results[position] = {"url": long_urls[position], "short_code": short_code}
+            pending = retry
+    except CodeSpaceExhausted:
+        for position in pending:
+            results[position] = {"url": long_urls[position], "error": "No short codes left"}
+
+    for position, first in repeats:
+        results[position] = dict(results[first])
+    for result in results:
+        if "short_code" in result:
+            result["short_url"] = host_url + result["short_code"]
+    return results
+
+def _read_ndjson_urls(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = app.json.loads(line)
+        except ValueError:
+            yield _INVALID_JSON
+            continue
+        yield item.get("url") if isinstance(item, dict) else item
+
+@app.route('/api/shorten/batch', methods=['POST'])
+def shorten_batch():
+    host_url = request.host_url
+    if request.mimetype == 'application/x-ndjson':
+        urls = _read_ndjson_urls(request.stream)
+
+        def generate():
+            dumps = app.json.dumps
+            while True:
+                chunk = list(islice(urls, Config.BATCH_CHUNK_SIZE))
+                if not chunk:
+                    break
+                yield "".join(dumps(result) + "\n" for result in shorten_many(chunk, host_url))
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('urls'), list):
+        return jsonify({"error": "URLs not provided"}), 400
+    if len(data['urls']) > Config.MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {Config.MAX_BATCH_SIZE} URLs per JSON batch; use NDJSON for more"}), 413
+    return jsonify({"results": shorten_many(data['urls'], host_url)}), 200
 
 @app.route('/<string:short_code>', methods=['GET'])
 def redirect_to_url(short_code):
+    cached = redirect_cache.get(short_code)
+    if cached is not None:
+        url_store.record_click(short_code)
+        return cached.response(app.response_class)
     long_url = url_store.increment_clicks(short_code)
     if long_url:
-        return redirect(long_url)
+        if not url_store.is_cacheable(short_code):
+            return redirect_cache.build(long_url).response(app.response_class)
+        return redirect_cache.put(short_code, long_url).response(app.response_class)
     else:
         abort(404)
 
+def _not_modified(version):
+    response = app.response_class(status=304)
+    response.set_etag(version, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/stats/<string:short_code>', methods=['GET'])
 def get_url_stats(short_code):
+    # Timelines default to windows ending now, so only plain stats get an ETag.
+    timeline = any(key in request.args for key in ("from", "to", "granularity"))
+    # Taken before the stats, so a body is never tagged older than it is.
+    version = None if timeline else url_store.get_version(short_code)
+    if version is not None and request.if_none_match.contains_weak(version):
+        return _not_modified(version)
     stats = url_store.get_stats(short_code)
     if stats:
-        return jsonify(stats), 200
+        if timeline:
+            if not url_store.timelines:
+                return jsonify({"error": "Click timelines are not kept by this store"}), 501
+            try:
+                start, end, granularity = parse_range(request.args, int(time.time()))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            series = url_store.get_click_series(short_code, start, end, granularity)
+            stats["timeline"] = timeline_payload(series or [], start, end, granularity)
+        response = jsonify(stats)
+        if version is not None:
+            response.set_etag(version, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
     else:
         return jsonify({"error": "Short code not found"}), 404
 
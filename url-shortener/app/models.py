@@ -1,43 +1,415 @@
 import datetime
+import hashlib
+import sys
 import threading
+import time
+import zlib
+from .analytics import GRANULARITIES, ClickTimeline, empty_series
+from .clicks import ClickBuffer
+from .config import Config
+from .expiry import ExpirySweeper, limits_payload
+from .storage import LogBackend, StorageBackend
+from .utils import normalize_url
 
-class URLStore:
-    def __init__(self):
-        self._urls = {}
-        self._lock = threading.Lock()
+DEFAULT_NUM_SHARDS = 16
 
-    def add_url(self, short_code, long_url):
-        with self._lock:
-            if short_code in self._urls:
-                return None  # Or raise an exception
-            self._urls[short_code] = {
-                "long_url": long_url,
-                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-                "clicks": 0
+class URLRecord:
+    """One short code's data, kept deliberately small for tens of millions of
+    entries: no per-record ``__dict__`` and an integer epoch instead of an
+    ISO-8601 string. The click ``timeline`` is only allocated on the first
+    click, so links nobody visits cost nothing extra."""
+
+    __slots__ = ("long_url", "created_at", "clicks", "timeline", "expires_at", "max_clicks")
+
+    def __init__(self, long_url, created_at, clicks=0, timeline=None, expires_at=None, max_clicks=None):
+        self.long_url = long_url
+        self.created_at = created_at
+        self.clicks = clicks
+        self.timeline = timeline
+        self.expires_at = expires_at
+        self.max_clicks = max_clicks
+
+    def expired(self, now):
+        return self.expires_at is not None and self.expires_at <= now
+
+    def add_clicks(self, count, timestamp):
+        self.clicks += count
+        if self.timeline is None:
+            self.timeline = ClickTimeline()
+        self.timeline.record(timestamp, count)
+
+    def created_at_iso(self):
+        return datetime.datetime.fromtimestamp(self.created_at, datetime.timezone.utc).isoformat()
+
+    def version(self, clicks):
+        """Identifies this record's stats with ``clicks`` counted. Only the
+        click count changes while a record lives, and it only grows."""
+        return f"{self.created_at:x}-{zlib.crc32(self.long_url.encode()):x}-{clicks}"
+
+
+class URLStoreBase:
+    """What URLStore and SharedURLStore share on top of their ``get_url``
+    and ``increment_clicks``: change listeners, redirect-cache checks and
+    stats that count a ``click_buffer``'s unflushed clicks."""
+
+    def subscribe(self, listener):
+        """Call ``listener(short_code)`` whenever this process removes or
+        changes a code; ``short_code`` is None when the store is cleared."""
+        self._listeners.append(listener)
+
+    def _notify(self, short_code):
+        for listener in self._listeners:
+            listener(short_code)
+
+    def is_cacheable(self, short_code):
+        """Whether a redirect for this code may be served without consulting
+        the store; limited links must be checked on every click."""
+        url_data = self.get_url(short_code)
+        return url_data is not None and url_data.expires_at is None and url_data.max_clicks is None
+
+    def record_click(self, short_code):
+        """Count a click on a code the caller already resolved, e.g. from a
+        redirect cache, without looking it up again when clicks are buffered."""
+        if self.click_buffer is not None:
+            self.click_buffer.add(short_code)
+        else:
+            self.increment_clicks(short_code)
+
+    def _clicks(self, short_code):
+        if self.click_buffer is None:
+            url_data = self.get_url(short_code)
+            return url_data, url_data and url_data.clicks
+        with self.click_buffer.frozen():
+            url_data = self.get_url(short_code)
+            return url_data, url_data and url_data.clicks + self.click_buffer.pending(short_code)
+
+    def get_version(self, short_code):
+        """A validator for ``get_stats(short_code)`` that skips building it,
+        or None for an unknown code."""
+        url_data, clicks = self._clicks(short_code)
+        if url_data and not url_data.expired(time.time()):
+            return url_data.version(clicks)
+        return None
+
+    def get_stats(self, short_code):
+        url_data, clicks = self._clicks(short_code)
+        if url_data and not url_data.expired(time.time()):
+            stats = {
+                "url": url_data.long_url,
+                "created_at": url_data.created_at_iso(),
+                "clicks": clicks
             }
-            return short_code
+            stats.update(limits_payload(url_data.expires_at, url_data.max_clicks))
+            return stats
+        return None
+
+
+class URLStore(URLStoreBase):
+    """In-memory short code store, striped across independently locked shards.
+
+    Writers only lock the shard owning the short code. Readers take no lock at
+    all: records are fully built before they are published into a shard dict,
+    and single dict lookups are atomic.
+
+    With a ``click_buffer`` the redirect path only bumps a per-thread counter;
+    buffered deltas reach the shards in batches through ``apply_clicks`` and
+    ``get_stats`` adds the unflushed remainder so counts stay exact.
+
+    Every mutation is also handed to ``backend`` (see ``app.storage``), which
+    is replayed once here to rebuild the shards after a restart. With
+    ``intern_urls`` identical long URLs share one string object.
+
+    With ``dedup`` a reverse index maps an 8-byte digest of each normalized
+    long URL to the first short code minted for it, so ``find_url`` answers a
+    repeat with one lookup. Two concurrent first requests for the same URL
+    may still both mint a code; the index keeps the first.
+
+    Clicks are also bucketed per minute, hour and day (see ``app.analytics``)
+    for ``get_click_series``. Buffered clicks are bucketed when they are
+    flushed, so they can land up to one flush interval late.
+
+    Links may carry an ``expires_at`` epoch and a ``max_clicks`` limit. Reads
+    treat an expired link as missing straight away; the ``sweeper`` removes
+    it from the shards once its second comes due. Click-limited links skip
+    the click buffer so the limit is enforced exactly, and are removed by the
+    click that reaches it.
+    """
+
+    timelines = True
+
+    def __init__(self, num_shards=DEFAULT_NUM_SHARDS, click_buffer=None, backend=None,
+                 intern_urls=False, dedup=False, sweeper=None):
+        if num_shards < 1 or num_shards & (num_shards - 1):
+            raise ValueError("num_shards must be a power of two")
+        self._mask = num_shards - 1
+        self._shards = [{} for _ in range(num_shards)]
+        self._locks = [threading.Lock() for _ in range(num_shards)]
+        self._intern = sys.intern if intern_urls else str
+        self.dedup = dedup
+        self._reverse = [{} for _ in range(num_shards)]
+        self._reverse_locks = [threading.Lock() for _ in range(num_shards)]
+        self._listeners = []
+        self.click_buffer = click_buffer
+        self.sweeper = sweeper if sweeper is not None else ExpirySweeper(autostart=False)
+        self.sweeper.bind(self.expire)
+        self.backend = backend if backend is not None else StorageBackend()
+        self.backend.replay(self._load_url, self._load_clicks, self._load_remove)
+        if click_buffer is not None:
+            click_buffer.bind(self.apply_clicks)
+
+    def _load_url(self, short_code, long_url, created_at, clicks, timeline=None,
+                  expires_at=None, max_clicks=None):
+        shard = self._shards[self._shard_index(short_code)]
+        if short_code not in shard:
+            if expires_at is not None and expires_at <= time.time():
+                return
+            if timeline is not None:
+                timeline = ClickTimeline.from_bytes(timeline)
+            shard[short_code] = URLRecord(self._intern(long_url), created_at, clicks, timeline,
+                                          expires_at, max_clicks)
+            if expires_at is not None:
+                self.sweeper.schedule(short_code, expires_at)
+            if self.dedup and expires_at is None and max_clicks is None:
+                self._index_url(short_code, long_url)
+
+    def _load_remove(self, short_code):
+        url_data = self._shards[self._shard_index(short_code)].pop(short_code, None)
+        if url_data is not None and self.dedup:
+            self._unindex_url(short_code, url_data.long_url)
+
+    def _load_clicks(self, short_code, count, timestamp):
+        url_data = self.get_url(short_code)
+        if url_data is not None:
+            url_data.add_clicks(count, timestamp)
+
+    def _shard_index(self, short_code):
+        return hash(short_code) & self._mask
+
+    @staticmethod
+    def _url_digest(normalized_url):
+        return int.from_bytes(hashlib.blake2b(normalized_url.encode(), digest_size=8).digest(), "little")
+
+    def _index_url(self, short_code, long_url):
+        digest = self._url_digest(normalize_url(long_url))
+        index = digest & self._mask
+        with self._reverse_locks[index]:
+            self._reverse[index].setdefault(digest, short_code)
+
+    def _unindex_url(self, short_code, long_url):
+        digest = self._url_digest(normalize_url(long_url))
+        index = digest & self._mask
+        with self._reverse_locks[index]:
+            if self._reverse[index].get(digest) == short_code:
+                del self._reverse[index][digest]
+
+    def find_url(self, long_url):
+        """Return the short code already minted for ``long_url``, if any."""
+        normalized = normalize_url(long_url)
+        digest = self._url_digest(normalized)
+        short_code = self._reverse[digest & self._mask].get(digest)
+        if short_code is None:
+            return None
+        url_data = self.get_url(short_code)
+        # Guards against digest collisions and codes removed since indexing.
+        if url_data is None or url_data.expired(time.time()):
+            return None
+        if url_data.long_url != long_url and normalize_url(url_data.long_url) != normalized:
+            return None
+        return short_code
+
+    def add_url(self, short_code, long_url, expires_at=None, max_clicks=None):
+        index = self._shard_index(short_code)
+        shard = self._shards[index]
+        with self._locks[index]:
+            if short_code in shard:
+                return None  # Or raise an exception
+            url_data = URLRecord(self._intern(long_url), int(time.time()),
+                                 expires_at=expires_at, max_clicks=max_clicks)
+            shard[short_code] = url_data
+            self.backend.record_add(short_code, url_data.long_url, url_data.created_at, expires_at, max_clicks)
+        if expires_at is not None:
+            self.sweeper.schedule(short_code, expires_at)
+        # Limited links must not answer repeats that outlive them.
+        if self.dedup and expires_at is None and max_clicks is None:
+            self._index_url(short_code, long_url)
+        return short_code
+
+    def add_many(self, entries):
+        """Insert ``(short_code, long_url)`` pairs, taking each shard lock
+        once. Returns the codes in order, with ``None`` for codes in use."""
+        created_at = int(time.time())
+        by_shard = {}
+        for position, (short_code, long_url) in enumerate(entries):
+            by_shard.setdefault(self._shard_index(short_code), []).append((position, short_code, long_url))
+        results = [None] * len(entries)
+        for index, items in by_shard.items():
+            shard = self._shards[index]
+            added = []
+            with self._locks[index]:
+                for position, short_code, long_url in items:
+                    if short_code in shard:
+                        continue
+                    long_url = self._intern(long_url)
+                    shard[short_code] = URLRecord(long_url, created_at)
+                    added.append((short_code, long_url, created_at))
+                    results[position] = short_code
+                self.backend.record_adds(added)
+            if self.dedup:
+                for short_code, long_url, _ in added:
+                    self._index_url(short_code, long_url)
+        return results
 
     def get_url(self, short_code):
-        with self._lock:
-            return self._urls.get(short_code)
+        return self._shards[self._shard_index(short_code)].get(short_code)
 
     def increment_clicks(self, short_code):
-        with self._lock:
-            if short_code in self._urls:
-                self._urls[short_code]["clicks"] += 1
-                return self._urls[short_code]["long_url"]
-            return None
+        if self.click_buffer is not None:
+            url_data = self.get_url(short_code)
+            if url_data is None:
+                return None
+            if url_data.max_clicks is None:
+                if url_data.expires_at is not None and url_data.expires_at <= time.time():
+                    return None
+                self.click_buffer.add(short_code)
+                return url_data.long_url
+        index = self._shard_index(short_code)
+        shard = self._shards[index]
+        with self._locks[index]:
+            url_data = shard.get(short_code)
+            if url_data is None:
+                return None
+            now = int(time.time())
+            if url_data.expired(now):
+                return None
+            url_data.add_clicks(1, now)
+            self.backend.record_clicks({short_code: 1}, now)
+            exhausted = url_data.max_clicks is not None and url_data.clicks >= url_data.max_clicks
+            if exhausted:
+                del shard[short_code]
+                self.backend.record_removes([short_code])
+        if exhausted:
+            self._notify(short_code)
+        return url_data.long_url
 
-    def get_stats(self, short_code):
-        with self._lock:
-            url_data = self._urls.get(short_code)
-            if url_data:
-                return {
-                    "url": url_data["long_url"],
-                    "created_at": url_data["created_at"],
-                    "clicks": url_data["clicks"]
-                }
+    def apply_clicks(self, deltas):
+        """Add a ``{short_code: count}`` batch, taking each shard lock once."""
+        by_shard = {}
+        for short_code, count in deltas.items():
+            by_shard.setdefault(self._shard_index(short_code), []).append((short_code, count))
+        applied = {}
+        now = int(time.time())
+        for index, items in by_shard.items():
+            shard = self._shards[index]
+            with self._locks[index]:
+                for short_code, count in items:
+                    url_data = shard.get(short_code)
+                    if url_data is not None:
+                        url_data.add_clicks(count, now)
+                        applied[short_code] = count
+        self.backend.record_clicks(applied, now)
+
+    def expire(self, short_codes, now):
+        """Remove the given codes that have expired by ``now``, taking each
+        shard lock once; returns how many were removed."""
+        by_shard = {}
+        for short_code in short_codes:
+            by_shard.setdefault(self._shard_index(short_code), []).append(short_code)
+        removed = []
+        for index, codes in by_shard.items():
+            shard = self._shards[index]
+            expired = []
+            with self._locks[index]:
+                for short_code in codes:
+                    url_data = shard.get(short_code)
+                    if url_data is not None and url_data.expired(now):
+                        del shard[short_code]
+                        expired.append(short_code)
+                self.backend.record_removes(expired)
+            removed.extend(expired)
+        for short_code in removed:
+            self._notify(short_code)
+        return len(removed)
+
+    def get_click_series(self, short_code, start, end, granularity):
+        """Clicks per ``granularity`` bucket between epoch seconds ``start``
+        and ``end`` as ``[(bucket_start, clicks), ...]``, or None for an
+        unknown code. Unflushed clicks count towards the current bucket."""
+        url_data = self.get_url(short_code)
+        if url_data is None or url_data.expired(time.time()):
             return None
+        index = self._shard_index(short_code)
+        if self.click_buffer is None:
+            with self._locks[index]:
+                timeline, pending = url_data.timeline, 0
+                series = timeline.series(start, end, granularity) if timeline is not None else None
+        else:
+            with self.click_buffer.frozen(), self._locks[index]:
+                timeline, pending = url_data.timeline, self.click_buffer.pending(short_code)
+                series = timeline.series(start, end, granularity) if timeline is not None else None
+        if series is None:
+            series = empty_series(start, end, granularity)
+        if pending:
+            current = int(time.time()) // GRANULARITIES[granularity] * GRANULARITIES[granularity]
+            for position, (bucket_start, clicks) in enumerate(series):
+                if bucket_start == current:
+                    series[position] = (bucket_start, clicks + pending)
+        return series
+
+    def clear(self):
+        if self.click_buffer is not None:
+            self.click_buffer.discard()
+        self.sweeper.discard()
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                shard.clear()
+        for lock, reverse in zip(self._reverse_locks, self._reverse):
+            with lock:
+                reverse.clear()
+        self.backend.clear()
+        self._notify(None)
+
+    def close(self):
+        if self.click_buffer is not None:
+            self.click_buffer.stop()
+        self.sweeper.stop()
+        self.backend.close()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+def create_store(config=Config):
+    click_buffer = ClickBuffer(
+        flush_interval=config.CLICK_FLUSH_INTERVAL,
+        flush_threshold=config.CLICK_FLUSH_THRESHOLD,
+    )
+    sweeper = ExpirySweeper(sweep_interval=config.EXPIRY_SWEEP_INTERVAL)
+    if config.SHARED_MEMORY_PATH:
+        if config.DEDUP_URLS:
+            raise ValueError("URL_SHORTENER_DEDUP_URLS is not supported with URL_SHORTENER_SHM_PATH")
+        from .shared import SharedURLStore  # app.shared builds on URLRecord
+
+        return SharedURLStore(
+            config.SHARED_MEMORY_PATH,
+            capacity=config.SHARED_CAPACITY,
+            arena_bytes=config.SHARED_ARENA_BYTES,
+            click_buffer=click_buffer,
+            sweeper=sweeper,
+        )
+    backend = None
+    if config.DATA_DIR:
+        backend = LogBackend(
+            config.DATA_DIR,
+            fsync_interval=config.WAL_FSYNC_INTERVAL,
+            snapshot_bytes=config.SNAPSHOT_BYTES,
+        )
+    return URLStore(
+        num_shards=config.NUM_SHARDS,
+        click_buffer=click_buffer,
+        backend=backend,
+        intern_urls=config.INTERN_URLS,
+        dedup=config.DEDUP_URLS,
+        sweeper=sweeper,
+    )
 
 # Global instance to be used by the Flask app
-url_store = URLStore()
\ No newline at end of file
+url_store = create_store()
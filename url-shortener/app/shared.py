@@ -0,0 +1,457 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from .expiry import ExpirySweeper
+from .models import URLRecord, URLStoreBase
+from .storage import StorageBackend
+
+DEFAULT_CAPACITY = 1 << 20
+DEFAULT_ARENA_BYTES = 256 * 1024 * 1024
+DEFAULT_LOCK_STRIPES = 64
+MAX_LOAD_FACTOR = 0.75
+# Share of the slots that may hold tombstones before inserts compact the table.
+MAX_TOMBSTONE_RATIO = 0.125
+
+_MAGIC = b"URLSHM01"
+# magic, capacity, arena bytes, arena used, slots used, deleted, generation,
+# earliest expires_at among live slots (0 for none)
+_HEADER = struct.Struct("<8sQQQQQQQ")
+_HEADER_BYTES = 64
+_USAGE = struct.Struct("<QQ")
+_USAGE_OFFSET = 24
+_COUNT = struct.Struct("<Q")
+_DELETED_OFFSET = 40
+_GENERATION_OFFSET = 48
+_EXPIRY_OFFSET = 56
+# hash, arena offset, url length, code length, state, created_at, expires_at,
+# max_clicks, clicks; padded to 64 bytes so no slot straddles a cache line.
+_SLOT = struct.Struct("<QQIHHqqqq8x")
+_HASH = struct.Struct("<Q")
+_STATE = struct.Struct("<H")
+_CLICKS = struct.Struct("<q")
+_STATE_OFFSET = 22
+_CLICKS_OFFSET = 48
+
+_LIVE = 1
+_DELETED = 2
+
+
+class SharedStoreFull(Exception):
+    pass
+
+
+# add_many's result for a pair that did not fit.
+STORE_FULL = object()
+
+
+class _ProcessLock:
+    """Mutual exclusion across threads and processes: a thread lock, then a
+    POSIX record lock on one byte of the shared file (record locks belong to
+    the process, so they do not exclude threads by themselves)."""
+
+    __slots__ = ("_thread_lock", "_fd", "_byte")
+
+    def __init__(self, fd, byte):
+        self._thread_lock = threading.Lock()
+        self._fd = fd
+        self._byte = byte
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._byte)
+
+    def __exit__(self, *exc):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._byte)
+        self._thread_lock.release()
+
+
+class SharedMemoryBackend(StorageBackend):
+    """Reports on the shared table; its state already lives in the mapped
+    file, so there is nothing to log or replay."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def metrics(self):
+        return self._store.table_metrics()
+
+
+def _code_hash(code):
+    # Python's str hash is salted per process, so it cannot index shared memory.
+    return int.from_bytes(hashlib.blake2b(code, digest_size=8).digest(), "little") or 1
+
+
+class SharedURLStore(URLStoreBase):
+    """URLStore for every worker process on a host, kept in one mmap'd file
+    (put it on /dev/shm for a memory-only store).
+
+    The file holds a fixed-capacity open-addressing hash table with linear
+    probing and an append-only string arena for codes and long URLs. Readers
+    take no lock: a slot's fields are written before its hash, which is what
+    publishes it. Inserts serialize on one global lock; clicks, expiry and
+    click limits lock one of ``lock_stripes`` stripes chosen by code hash, so
+    increments from different processes are atomic.
+
+    Removed links leave a tombstone and their arena bytes behind. Once
+    tombstones fill ``MAX_TOMBSTONE_RATIO`` of the slots, or an insert
+    would not fit while there are tombstones or expired links, the
+    inserting process compacts the table in place under every lock. Expired
+    links are dropped there too: only the process that created a link
+    schedules it with its sweeper, so after that process exits nothing
+    else would remove it. The header keeps the earliest expiry among live
+    links so inserts can tell without a scan. Compaction makes the header's generation odd while it runs
+    and bumps it again when done, and readers retry a lookup that saw it
+    change. Click timelines and the dedup index are per-process features
+    of URLStore and are not available here (``timelines`` is False, and
+    stats answer 501 when asked for one); a ``click_buffer`` only holds
+    this process's clicks, so other workers' unflushed clicks show up in
+    stats one flush later.
+    """
+
+    # create_store refuses URL_SHORTENER_DEDUP_URLS with this store.
+    dedup = False
+    timelines = False
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, arena_bytes=DEFAULT_ARENA_BYTES,
+                 click_buffer=None, sweeper=None, lock_stripes=DEFAULT_LOCK_STRIPES):
+        if capacity < 1 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._global = _ProcessLock(self._fd, 0)
+        self._stripes = [_ProcessLock(self._fd, 1 + i) for i in range(lock_stripes)]
+        # Guards the tombstone count, which deletes under any stripe bump.
+        self._deleted_lock = _ProcessLock(self._fd, 1 + lock_stripes)
+        with self._global:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, _HEADER_BYTES + capacity * _SLOT.size + arena_bytes)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, capacity, arena_bytes, 0, 0, 0, 0, 0), 0)
+            header = os.pread(self._fd, _HEADER.size, 0)
+        magic, capacity, arena_bytes = _HEADER.unpack(header)[:3]
+        if magic != _MAGIC:
+            raise ValueError("%s is not a shared URL store" % path)
+        self.capacity = capacity
+        self.arena_bytes = arena_bytes
+        self._mask = capacity - 1
+        self._arena_start = _HEADER_BYTES + capacity * _SLOT.size
+        self._mm = mmap.mmap(self._fd, self._arena_start + arena_bytes)
+        self._listeners = []
+        self.click_buffer = click_buffer
+        self.sweeper = sweeper if sweeper is not None else ExpirySweeper(autostart=False)
+        self.sweeper.bind(self.expire)
+        self.backend = SharedMemoryBackend(self)
+        self.compactions = 0
+        if click_buffer is not None:
+            click_buffer.bind(self.apply_clicks)
+
+    def _header(self):
+        return _HEADER.unpack_from(self._mm, 0)
+
+    def _usage(self):
+        """``[arena_used, slots_used]``; only written under the global lock."""
+        return list(_USAGE.unpack_from(self._mm, _USAGE_OFFSET))
+
+    def _set_usage(self, arena_used, used):
+        _USAGE.pack_into(self._mm, _USAGE_OFFSET, arena_used, used)
+
+    def _deleted(self):
+        return _COUNT.unpack_from(self._mm, _DELETED_OFFSET)[0]
+
+    def _next_expiry(self):
+        """Earliest ``expires_at`` of a live slot, or 0; written under the global lock."""
+        return _COUNT.unpack_from(self._mm, _EXPIRY_OFFSET)[0]
+
+    def _generation(self):
+        return _COUNT.unpack_from(self._mm, _GENERATION_OFFSET)[0]
+
+    def _bump_generation(self):
+        _COUNT.pack_into(self._mm, _GENERATION_OFFSET, self._generation() + 1)
+
+    @contextmanager
+    def _all_stripes(self):
+        """Taken after the global lock, to exclude every other writer."""
+        for stripe in self._stripes:
+            stripe.__enter__()
+        try:
+            yield
+        finally:
+            for stripe in reversed(self._stripes):
+                stripe.__exit__(None, None, None)
+
+    def _slot_offset(self, index):
+        return _HEADER_BYTES + index * _SLOT.size
+
+    def _find(self, code, code_hash):
+        """Offset of the live slot holding ``code``, or -1."""
+        mm = self._mm
+        index = code_hash & self._mask
+        for _ in range(self.capacity):
+            offset = self._slot_offset(index)
+            (slot_hash,) = _HASH.unpack_from(mm, offset)
+            if slot_hash == 0:
+                return -1
+            if slot_hash == code_hash:
+                _, arena_offset, _, code_len, state = _SLOT.unpack_from(mm, offset)[:5]
+                if state == _LIVE and mm[arena_offset:arena_offset + code_len] == code:
+                    return offset
+            index = (index + 1) & self._mask
+        return -1
+
+    def _lookup(self, code, code_hash):
+        """``(offset, record, generation)`` for ``code`` without locking,
+        retried if a compaction moved the table during the read."""
+        while True:
+            generation = self._generation()
+            if generation & 1:
+                # Compacting now; wait for it, or read under the lock if the
+                # process compacting died halfway.
+                with self._global:
+                    offset = self._find(code, code_hash)
+                    return offset, self._record(offset) if offset >= 0 else None, self._generation()
+            try:
+                offset = self._find(code, code_hash)
+                record = self._record(offset) if offset >= 0 else None
+            except UnicodeDecodeError:
+                record = None
+            if self._generation() == generation:
+                return offset, record, generation
+
+    def _record(self, offset):
+        _, arena_offset, url_len, code_len, state, created_at, expires_at, max_clicks, clicks = \
+            _SLOT.unpack_from(self._mm, offset)
+        start = arena_offset + code_len
+        return URLRecord(str(self._mm[start:start + url_len], "utf-8"), created_at, clicks,
+                         expires_at=expires_at or None, max_clicks=max_clicks or None)
+
+    def _fits(self, usage, size):
+        arena_used, used = usage
+        return used + 1 <= self.capacity * MAX_LOAD_FACTOR and arena_used + size <= self.arena_bytes
+
+    def _insert_locked(self, short_code, long_url, created_at, expires_at, max_clicks, usage):
+        code, url = short_code.encode(), long_url.encode()
+        code_hash = _code_hash(code)
+        if self._find(code, code_hash) >= 0:
+            return False
+        deleted = self._deleted()
+        next_expiry = self._next_expiry()
+        reclaimable = deleted or 0 < next_expiry <= time.time()
+        if reclaimable and (deleted >= self.capacity * MAX_TOMBSTONE_RATIO or not self._fits(usage, len(code) + len(url))):
+            usage[:] = self._compact_locked()
+        arena_used, used = usage
+        if used + 1 > self.capacity * MAX_LOAD_FACTOR:
+            raise SharedStoreFull("hash table is full")
+        if arena_used + len(code) + len(url) > self.arena_bytes:
+            raise SharedStoreFull("string arena is full")
+        self._place(code_hash, code, url, arena_used, created_at, expires_at or 0, max_clicks or 0, 0)
+        if expires_at and (not next_expiry or expires_at < next_expiry):
+            _COUNT.pack_into(self._mm, _EXPIRY_OFFSET, expires_at)
+        usage[0] = arena_used + len(code) + len(url)
+        usage[1] = used + 1
+        return True
+
+    def _place(self, code_hash, code, url, arena_used, created_at, expires_at, max_clicks, clicks):
+        mm = self._mm
+        arena_offset = self._arena_start + arena_used
+        mm[arena_offset:arena_offset + len(code)] = code
+        mm[arena_offset + len(code):arena_offset + len(code) + len(url)] = url
+        index = code_hash & self._mask
+        while _HASH.unpack_from(mm, self._slot_offset(index))[0]:
+            index = (index + 1) & self._mask
+        offset = self._slot_offset(index)
+        _SLOT.pack_into(mm, offset, 0, arena_offset, len(url), len(code), _LIVE,
+                        created_at, expires_at, max_clicks, clicks)
+        # Publishing the hash last makes the slot visible to lock-free readers.
+        _HASH.pack_into(mm, offset, code_hash)
+
+    def _compact_locked(self):
+        """Rebuild the table and arena from the live slots, dropping
+        tombstones, expired links and their strings. Called holding the
+        global lock; returns the new usage."""
+        now = time.time()
+        expired = []
+        with self._all_stripes():
+            mm = self._mm
+            live = []
+            next_expiry = 0
+            for index in range(self.capacity):
+                offset = self._slot_offset(index)
+                slot = _SLOT.unpack_from(mm, offset)
+                if not slot[0] or slot[4] != _LIVE:
+                    continue
+                expires_at = slot[6]
+                if 0 < expires_at <= now:
+                    expired.append(str(mm[slot[1]:slot[1] + slot[3]], "utf-8"))
+                    continue
+                if expires_at and (not next_expiry or expires_at < next_expiry):
+                    next_expiry = expires_at
+                live.append(slot)
+            # Strings only move towards the start, so copying in arena order
+            # never overwrites one that is still to be copied.
+            live.sort(key=lambda slot: slot[1])
+            self._bump_generation()
+            mm[_HEADER_BYTES:self._arena_start] = bytes(self._arena_start - _HEADER_BYTES)
+            arena_used = 0
+            for code_hash, arena_offset, url_len, code_len, _, created_at, expires_at, max_clicks, clicks in live:
+                strings = mm[arena_offset:arena_offset + code_len + url_len]
+                self._place(code_hash, strings[:code_len], strings[code_len:], arena_used,
+                            created_at, expires_at, max_clicks, clicks)
+                arena_used += len(strings)
+            self._set_usage(arena_used, len(live))
+            _COUNT.pack_into(mm, _DELETED_OFFSET, 0)
+            _COUNT.pack_into(mm, _EXPIRY_OFFSET, next_expiry)
+            self._bump_generation()
+        self.compactions += 1
+        for short_code in expired:
+            self._notify(short_code)
+        return [arena_used, len(live)]
+
+    def add_url(self, short_code, long_url, expires_at=None, max_clicks=None):
+        with self._global:
+            usage = self._usage()
+            if not self._insert_locked(short_code, long_url, int(time.time()), expires_at, max_clicks, usage):
+                return None
+            self._set_usage(*usage)
+        if expires_at is not None:
+            self.sweeper.schedule(short_code, expires_at)
+        return short_code
+
+    def add_many(self, entries):
+        """Insert ``(short_code, long_url)`` pairs under one global lock.
+        Returns the codes in order, with ``None`` for codes in use and
+        ``STORE_FULL`` for the pairs left out once the store filled up; the
+        ones before it stay inserted."""
+        created_at = int(time.time())
+        results = [None] * len(entries)
+        with self._global:
+            usage = self._usage()
+            try:
+                for position, (short_code, long_url) in enumerate(entries):
+                    if self._insert_locked(short_code, long_url, created_at, None, None, usage):
+                        results[position] = short_code
+            except SharedStoreFull:
+                results[position:] = [STORE_FULL] * (len(entries) - position)
+            finally:
+                self._set_usage(*usage)
+        return results
+
+    def find_url(self, long_url):
+        return None
+
+    def get_url(self, short_code):
+        code = short_code.encode()
+        return self._lookup(code, _code_hash(code))[1]
+
+    def _stripe(self, code_hash):
+        return self._stripes[code_hash % len(self._stripes)]
+
+    def _add_clicks_locked(self, offset, count):
+        (clicks,) = _CLICKS.unpack_from(self._mm, offset + _CLICKS_OFFSET)
+        _CLICKS.pack_into(self._mm, offset + _CLICKS_OFFSET, clicks + count)
+        return clicks + count
+
+    def _delete_locked(self, offset):
+        """Tombstone the slot; called holding its stripe."""
+        _STATE.pack_into(self._mm, offset + _STATE_OFFSET, _DELETED)
+        with self._deleted_lock:
+            _COUNT.pack_into(self._mm, _DELETED_OFFSET, self._deleted() + 1)
+
+    def increment_clicks(self, short_code):
+        code = short_code.encode()
+        code_hash = _code_hash(code)
+        offset, url_data, generation = self._lookup(code, code_hash)
+        if url_data is None:
+            return None
+        if self.click_buffer is not None and url_data.max_clicks is None:
+            if url_data.expired(time.time()):
+                return None
+            self.click_buffer.add(short_code)
+            return url_data.long_url
+        with self._stripe(code_hash):
+            if self._generation() != generation:
+                offset = self._find(code, code_hash)
+                if offset < 0:
+                    return None
+            state = _STATE.unpack_from(self._mm, offset + _STATE_OFFSET)[0]
+            if state != _LIVE or url_data.expired(time.time()):
+                return None
+            clicks = self._add_clicks_locked(offset, 1)
+            exhausted = url_data.max_clicks is not None and clicks >= url_data.max_clicks
+            if exhausted:
+                self._delete_locked(offset)
+        if exhausted:
+            self._notify(short_code)
+        return url_data.long_url
+
+    def apply_clicks(self, deltas):
+        """Add a ``{short_code: count}`` batch, taking each stripe lock once."""
+        by_stripe = {}
+        for short_code, count in deltas.items():
+            code = short_code.encode()
+            code_hash = _code_hash(code)
+            by_stripe.setdefault(code_hash % len(self._stripes), []).append((code, code_hash, count))
+        for stripe, items in by_stripe.items():
+            with self._stripes[stripe]:
+                for code, code_hash, count in items:
+                    offset = self._find(code, code_hash)
+                    if offset >= 0:
+                        self._add_clicks_locked(offset, count)
+
+    def expire(self, short_codes, now):
+        """Remove the given codes that have expired by ``now``; returns how
+        many were removed."""
+        removed = []
+        for short_code in short_codes:
+            code = short_code.encode()
+            code_hash = _code_hash(code)
+            with self._stripe(code_hash):
+                offset = self._find(code, code_hash)
+                if offset >= 0 and self._record(offset).expired(now):
+                    self._delete_locked(offset)
+                    removed.append(short_code)
+        for short_code in removed:
+            self._notify(short_code)
+        return len(removed)
+
+    def clear(self):
+        if self.click_buffer is not None:
+            self.click_buffer.discard()
+        self.sweeper.discard()
+        with self._global, self._all_stripes():
+            self._bump_generation()
+            self._mm[_HEADER_BYTES:self._arena_start] = bytes(self._arena_start - _HEADER_BYTES)
+            self._set_usage(0, 0)
+            _COUNT.pack_into(self._mm, _DELETED_OFFSET, 0)
+            _COUNT.pack_into(self._mm, _EXPIRY_OFFSET, 0)
+            self._bump_generation()
+        self._notify(None)
+
+    def close(self):
+        if self.click_buffer is not None:
+            self.click_buffer.stop()
+        self.sweeper.stop()
+        self._mm.flush()
+        self._mm.close()
+        os.close(self._fd)
+
+    def __len__(self):
+        _, _, _, _, used, deleted, _, _ = self._header()
+        return used - deleted
+
+    def table_metrics(self):
+        _, _, _, arena_used, used, deleted, _, _ = self._header()
+        return {
+            "backend": "shared_memory",
+            "path": self.path,
+            "capacity": self.capacity,
+            "slots_used": used,
+            "tombstones": deleted,
+            "load_factor": used / self.capacity,
+            "arena_bytes": self.arena_bytes,
+            "arena_used": arena_used,
+            "compactions": self.compactions,
+        }
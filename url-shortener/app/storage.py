@@ -0,0 +1,412 @@
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from .analytics import ClickTimeline
+
+DEFAULT_FSYNC_INTERVAL = 1.0
+DEFAULT_SNAPSHOT_BYTES = 64 * 1024 * 1024
+
+_HEADER = struct.Struct("<IIB")  # crc32, payload length, record kind
+_ADD = struct.Struct("<HIqqQ")  # code length, url length, created_at, expires_at, max_clicks
+_ENTRY = struct.Struct("<HIqqQQI")  # as _ADD, plus clicks and timeline length
+_CLICKS = struct.Struct("<qQ")  # batch timestamp, number of codes
+_CLICK = struct.Struct("<HQ")  # code length, click delta
+_CODE = struct.Struct("<H")  # code length
+_COUNT = struct.Struct("<Q")
+
+_KIND_ADD = 1
+_KIND_CLICKS = 2
+_KIND_ENTRY = 3
+_KIND_END = 4
+_KIND_REMOVE = 5
+
+
+class StorageBackend:
+    """Persistence hook for URLStore.
+
+    The store calls ``record_add``/``record_clicks``/``record_removes`` after
+    applying a mutation in memory and ``replay`` once at startup to rebuild
+    its shards, through ``on_add(short_code, long_url, created_at, clicks,
+    timeline, expires_at, max_clicks)`` (timeline being serialized
+    ``ClickTimeline`` bytes or None, limits None when unset),
+    ``on_clicks(short_code, delta, timestamp)`` and ``on_remove(short_code)``.
+    This base class keeps nothing, which is the behaviour of a plain
+    in-memory store.
+    """
+
+    def replay(self, on_add, on_clicks, on_remove):
+        pass
+
+    def record_add(self, short_code, long_url, created_at, expires_at=None, max_clicks=None):
+        pass
+
+    def record_adds(self, entries):
+        for short_code, long_url, created_at in entries:
+            self.record_add(short_code, long_url, created_at)
+
+    def record_clicks(self, deltas, timestamp):
+        pass
+
+    def record_removes(self, short_codes):
+        pass
+
+    def clear(self):
+        pass
+
+    def close(self):
+        pass
+
+    def metrics(self):
+        return {"backend": "memory"}
+
+
+def _encode_add(short_code, long_url, created_at, expires_at=None, max_clicks=None):
+    code, url = short_code.encode(), long_url.encode()
+    return _ADD.pack(len(code), len(url), created_at, expires_at or 0, max_clicks or 0) + code + url
+
+
+def _encode_entry(short_code, long_url, created_at, clicks, timeline, expires_at, max_clicks):
+    code, url = short_code.encode(), long_url.encode()
+    timeline = timeline.to_bytes() if timeline is not None else b""
+    return _ENTRY.pack(len(code), len(url), created_at, expires_at or 0, max_clicks or 0,
+                       clicks, len(timeline)) + code + url + timeline
+
+
+def _encode_clicks(deltas, timestamp):
+    parts = [_CLICKS.pack(timestamp, len(deltas))]
+    for short_code, count in deltas.items():
+        code = short_code.encode()
+        parts.append(_CLICK.pack(len(code), count))
+        parts.append(code)
+    return b"".join(parts)
+
+
+def _encode_removes(short_codes):
+    parts = [_COUNT.pack(len(short_codes))]
+    for short_code in short_codes:
+        code = short_code.encode()
+        parts.append(_CODE.pack(len(code)))
+        parts.append(code)
+    return b"".join(parts)
+
+
+def _frame(kind, payload):
+    return _HEADER.pack(zlib.crc32(payload, kind), len(payload), kind) + payload
+
+
+def _read_records(path):
+    """Yield ``(kind, payload, end_offset)`` for every intact record in a file,
+    stopping at the first torn or corrupt one."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            view = memoryview(data)
+            try:
+                offset = 0
+                while offset + _HEADER.size <= size:
+                    crc, length, kind = _HEADER.unpack_from(data, offset)
+                    start = offset + _HEADER.size
+                    end = start + length
+                    if end > size:
+                        break
+                    payload = view[start:end]
+                    if zlib.crc32(payload, kind) != crc:
+                        payload.release()
+                        break
+                    yield kind, payload, end
+                    payload.release()
+                    offset = end
+            finally:
+                view.release()
+
+
+def _decode_add(payload):
+    code_len, url_len, created_at, expires_at, max_clicks = _ADD.unpack_from(payload)
+    offset = _ADD.size + code_len
+    code = str(payload[_ADD.size:offset], "utf-8")
+    url = str(payload[offset:offset + url_len], "utf-8")
+    return code, url, created_at, 0, None, expires_at or None, max_clicks or None
+
+
+def _decode_entry(payload):
+    code_len, url_len, created_at, expires_at, max_clicks, clicks, timeline_len = _ENTRY.unpack_from(payload)
+    offset = _ENTRY.size + code_len
+    code = str(payload[_ENTRY.size:offset], "utf-8")
+    url = str(payload[offset:offset + url_len], "utf-8")
+    offset += url_len
+    timeline = bytes(payload[offset:offset + timeline_len]) if timeline_len else None
+    return code, url, created_at, clicks, timeline, expires_at or None, max_clicks or None
+
+
+def _decode_clicks(payload):
+    timestamp, count = _CLICKS.unpack_from(payload)
+    offset = _CLICKS.size
+    for _ in range(count):
+        code_len, delta = _CLICK.unpack_from(payload, offset)
+        offset += _CLICK.size
+        yield str(payload[offset:offset + code_len], "utf-8"), delta, timestamp
+        offset += code_len
+
+
+def _decode_removes(payload):
+    (count,) = _COUNT.unpack_from(payload)
+    offset = _COUNT.size
+    for _ in range(count):
+        (code_len,) = _CODE.unpack_from(payload, offset)
+        offset += _CODE.size
+        yield str(payload[offset:offset + code_len], "utf-8")
+        offset += code_len
+
+
+class LogBackend(StorageBackend):
+    """Append-only write-ahead log plus periodically compacted snapshots.
+
+    Files in ``directory`` are numbered by generation: ``snapshot-N`` holds
+    the full state of every ``wal-M`` with ``M < N``. Recovery loads the
+    newest snapshot and replays the WAL segments from its generation on. Each
+    record carries a CRC32, so a torn tail left by a crash is detected and
+    truncated instead of being replayed.
+
+    Once the active segment grows past ``snapshot_bytes`` the log is rotated
+    and a background thread folds the previous snapshot and the sealed
+    segments into a new one; writers keep appending to the new segment.
+    Records are handed to the OS on every append and fsynced at most every
+    ``fsync_interval`` seconds (``0`` syncs every append).
+    """
+
+    def __init__(self, directory, fsync_interval=DEFAULT_FSYNC_INTERVAL,
+                 snapshot_bytes=DEFAULT_SNAPSHOT_BYTES):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_bytes = snapshot_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        self._file = None
+        self._generation = 0
+        self._segment_bytes = 0
+        self._last_fsync = time.monotonic()
+        self._records = 0
+        self._bytes = 0
+        self._fsyncs = 0
+        self._compactions = 0
+        self._last_compaction_seconds = 0.0
+        self._recovery_seconds = 0.0
+        self._recovered_records = 0
+
+    def _path(self, kind, generation):
+        return os.path.join(self.directory, "%s-%010d" % (kind, generation))
+
+    def _generations(self, kind):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, kind + "-*")):
+            suffix = os.path.basename(path)[len(kind) + 1:]
+            if suffix.isdigit():
+                found.append(int(suffix))
+        return sorted(found)
+
+    def _load_snapshot(self, generation, on_entry):
+        complete = False
+        for kind, payload, _ in _read_records(self._path("snapshot", generation)):
+            if kind == _KIND_ENTRY:
+                on_entry(*_decode_entry(payload))
+            elif kind == _KIND_END:
+                complete = True
+        if not complete:
+            raise ValueError("snapshot %d is incomplete" % generation)
+
+    def _replay_segment(self, generation, on_add, on_clicks, on_remove):
+        path = self._path("wal", generation)
+        end = 0
+        records = 0
+        for kind, payload, end in _read_records(path):
+            records += 1
+            if kind == _KIND_ADD:
+                on_add(*_decode_add(payload))
+            elif kind == _KIND_CLICKS:
+                for short_code, delta, timestamp in _decode_clicks(payload):
+                    on_clicks(short_code, delta, timestamp)
+            elif kind == _KIND_REMOVE:
+                for short_code in _decode_removes(payload):
+                    on_remove(short_code)
+        return end, records
+
+    def replay(self, on_add, on_clicks, on_remove):
+        started = time.perf_counter()
+        snapshots = self._generations("snapshot")
+        base = snapshots[-1] if snapshots else 0
+        if snapshots:
+            self._load_snapshot(base, on_add)
+        segments = [g for g in self._generations("wal") if g >= base] or [base]
+        records = 0
+        for generation in segments:
+            path = self._path("wal", generation)
+            if not os.path.exists(path):
+                continue
+            end, count = self._replay_segment(generation, on_add, on_clicks, on_remove)
+            records += count
+            if generation == segments[-1] and end < os.path.getsize(path):
+                os.truncate(path, end)
+        self._open_segment(segments[-1])
+        self._recovered_records = records
+        self._recovery_seconds = time.perf_counter() - started
+
+    def _open_segment(self, generation):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+        path = self._path("wal", generation)
+        self._file = open(path, "ab", buffering=0)
+        self._generation = generation
+        self._segment_bytes = os.path.getsize(path)
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._fsyncs += 1
+        self._last_fsync = time.monotonic()
+
+    def _append(self, kind, payload):
+        self._write(_frame(kind, payload), 1)
+
+    def _write(self, record, count):
+        compactor = None
+        with self._lock:
+            if self._file is None:
+                self._open_segment(self._generation)
+            self._file.write(record)
+            self._records += count
+            self._bytes += len(record)
+            self._segment_bytes += len(record)
+            if not self.fsync_interval or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._sync()
+            if self._segment_bytes >= self.snapshot_bytes and self._compactor is None:
+                self._open_segment(self._generation + 1)
+                self._compactor = compactor = threading.Thread(
+                    target=self.compact, args=(self._generation,), name="wal-compactor", daemon=True)
+        if compactor is not None:
+            compactor.start()
+
+    def record_add(self, short_code, long_url, created_at, expires_at=None, max_clicks=None):
+        self._append(_KIND_ADD, _encode_add(short_code, long_url, created_at, expires_at, max_clicks))
+
+    def record_adds(self, entries):
+        if entries:
+            frames = [_frame(_KIND_ADD, _encode_add(*entry)) for entry in entries]
+            self._write(b"".join(frames), len(frames))
+
+    def record_clicks(self, deltas, timestamp):
+        if deltas:
+            self._append(_KIND_CLICKS, _encode_clicks(deltas, timestamp))
+
+    def record_removes(self, short_codes):
+        if short_codes:
+            self._append(_KIND_REMOVE, _encode_removes(short_codes))
+
+    def compact(self, generation):
+        """Write ``snapshot-<generation>`` from the older snapshot and every
+        sealed WAL segment below ``generation``, then delete them."""
+        try:
+            with self._compact_lock:
+                self._compact(generation)
+        finally:
+            self._compactor = None
+
+    def _compact(self, generation):
+        started = time.perf_counter()
+        snapshots = [g for g in self._generations("snapshot") if g < generation]
+        base = snapshots[-1] if snapshots else 0
+        state = {}
+
+        def on_add(short_code, long_url, created_at, clicks, timeline, expires_at, max_clicks):
+            if short_code not in state:
+                timeline = ClickTimeline.from_bytes(timeline) if timeline else None
+                state[short_code] = [long_url, created_at, clicks, timeline, expires_at, max_clicks]
+
+        def on_clicks(short_code, delta, timestamp):
+            entry = state.get(short_code)
+            if entry is not None:
+                entry[2] += delta
+                if entry[3] is None:
+                    entry[3] = ClickTimeline()
+                entry[3].record(timestamp, delta)
+
+        def on_remove(short_code):
+            state.pop(short_code, None)
+
+        if snapshots:
+            self._load_snapshot(base, on_add)
+        sealed = [g for g in self._generations("wal") if g < generation]
+        for segment in sealed:
+            if segment >= base:
+                self._replay_segment(segment, on_add, on_clicks, on_remove)
+
+        path = self._path("snapshot", generation)
+        tmp_path = path + ".tmp"
+        now = int(time.time())
+        written = 0
+        with open(tmp_path, "wb", buffering=1024 * 1024) as f:
+            for short_code, (long_url, created_at, clicks, timeline, expires_at, max_clicks) in state.items():
+                if expires_at is not None and expires_at <= now:
+                    continue
+                f.write(_frame(_KIND_ENTRY, _encode_entry(
+                    short_code, long_url, created_at, clicks, timeline, expires_at, max_clicks)))
+                written += 1
+            f.write(_frame(_KIND_END, _COUNT.pack(written)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+        for old in snapshots:
+            os.remove(self._path("snapshot", old))
+        for segment in sealed:
+            os.remove(self._path("wal", segment))
+        self._compactions += 1
+        self._last_compaction_seconds = time.perf_counter() - started
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def clear(self):
+        with self._compact_lock, self._lock:
+            generation = self._generation + 1
+            self._open_segment(generation)
+            for old in self._generations("snapshot"):
+                os.remove(self._path("snapshot", old))
+            for segment in self._generations("wal"):
+                if segment < generation:
+                    os.remove(self._path("wal", segment))
+
+    def close(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def metrics(self):
+        return {
+            "backend": "log",
+            "generation": self._generation,
+            "records_written": self._records,
+            "bytes_written": self._bytes,
+            "segment_bytes": self._segment_bytes,
+            "fsyncs": self._fsyncs,
+            "compactions": self._compactions,
+            "last_compaction_seconds": self._last_compaction_seconds,
+            "recovered_records": self._recovered_records,
+            "recovery_seconds": self._recovery_seconds,
+        }
@@ -1,19 +1,77 @@
 import random
 import string
 import re
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21, "ftps": 990}
+ALLOWED_SCHEMES = frozenset(DEFAULT_PORTS)
+MAX_URL_LENGTH = 2048
+
+_AUTHORITY_END = re.compile(r"[/?]")
+_WHITESPACE = re.compile(r"\s")
+_IPV4 = re.compile(r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\Z", re.ASCII)
+_LABEL = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\Z")
+_TLD = re.compile(r"[A-Za-z]{2,6}\Z|[A-Za-z0-9-]{2,63}\Z")
 
 def generate_short_code(length=6):
     """Generate a random short code of a given length."""
     characters = string.ascii_letters + string.digits
     return ''.join(random.choice(characters) for _ in range(length))
 
-def is_valid_url(url):
-    """Validate a URL using a regular expression."""
-    regex = re.compile(
-        r'^(?:http|ftp)s?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    return re.match(regex, url) is not None
\ No newline at end of file
+def is_valid_url(url, max_length=MAX_URL_LENGTH):
+    """Validate a URL by parsing it into scheme, host, port and path.
+
+    Every step is a bounded regex or a single linear scan, so the cost is
+    linear in the input length even for adversarial strings, and inputs over
+    ``max_length`` are rejected before any parsing.
+    """
+    if not isinstance(url, str) or (max_length is not None and len(url) > max_length):
+        return False
+    scheme, separator, rest = url.partition("://")
+    if not separator or scheme.lower() not in ALLOWED_SCHEMES:
+        return False
+
+    end = _AUTHORITY_END.search(rest)
+    authority, tail = (rest[:end.start()], rest[end.start():]) if end else (rest, "")
+    if tail and (tail == "?" or _WHITESPACE.search(tail)):
+        return False
+
+    host, colon, port = authority.rpartition(":")
+    if not colon:
+        host = authority
+    elif not (port.isascii() and port.isdigit()):
+        return False
+    return _is_valid_host(host)
+
+def _is_valid_host(host):
+    if not host or len(host) > 254 or not host.isascii():
+        return False
+    if host.lower() == "localhost" or _IPV4.match(host):
+        return True
+    labels = (host[:-1] if host.endswith(".") else host).split(".")
+    if len(labels) < 2 or not _TLD.match(labels[-1]):
+        return False
+    return all(_LABEL.match(label) for label in labels[:-1])
+
+def validate_urls(urls, max_length=MAX_URL_LENGTH):
+    """Batch form of ``is_valid_url``: one bool per input, in order."""
+    return [is_valid_url(url, max_length) for url in urls]
+
+def normalize_url(url):
+    """Canonical form used to recognise repeats of the same long URL.
+
+    Scheme and host are lower-cased, the scheme's default port is dropped and
+    an empty path becomes ``/``; path, query and fragment are kept verbatim.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").rstrip(".")
+    if ":" in netloc:
+        netloc = "[%s]" % netloc
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = "%s:%d" % (netloc, port)
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, parts.fragment))
@@ -0,0 +1,62 @@
+"""Short code allocation throughput as the code space fills up.
+
+    python -m benchmarks.bench_allocator --length 3 --fill 0.5 0.9 0.99
+
+Compares the original random-retry loop (generate a code, retry while it is
+already in the store) with ShortCodeAllocator at several fill ratios of a
+deliberately small code space, so high fill ratios are reachable.
+"""
+import argparse
+import time
+
+from app.allocator import ShortCodeAllocator
+from app.models import URLStore
+from app.utils import generate_short_code
+from benchmarks.common import print_table
+
+
+def random_retry(store, length, count):
+    for _ in range(count):
+        short_code = generate_short_code(length)
+        while store.get_url(short_code) is not None:
+            short_code = generate_short_code(length)
+        store.add_url(short_code, "https://example.com")
+
+
+def counter_based(store, allocator, count):
+    for _ in range(count):
+        store.add_url(allocator.allocate(), "https://example.com")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--length", type=int, default=3)
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.0, 0.5, 0.9, 0.99])
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    space = 62 ** args.length
+    rows = []
+    for fill in args.fill:
+        prefill = int(space * fill)
+        count = min(args.batch, space - prefill)
+
+        store = URLStore()
+        random_retry(store, args.length, prefill)
+        started = time.perf_counter()
+        random_retry(store, args.length, count)
+        retry_rate = count / (time.perf_counter() - started)
+
+        store = URLStore()
+        allocator = ShortCodeAllocator(length=args.length)
+        counter_based(store, allocator, prefill)
+        started = time.perf_counter()
+        counter_based(store, allocator, count)
+        counter_rate = count / (time.perf_counter() - started)
+
+        rows.append(("%.2f" % fill, "%.0f" % retry_rate, "%.0f" % counter_rate))
+    print_table(("fill ratio", "random retry allocs/s", "allocator allocs/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
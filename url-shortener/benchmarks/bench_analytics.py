@@ -0,0 +1,78 @@
+"""Cost of time-bucketed click analytics.
+
+    python -m benchmarks.bench_analytics --links 1000000 --active 0.1
+
+Populates a store with ``--links`` codes, of which an ``--active``
+fraction get clicked, and reports the traced memory each clicked link's
+ClickTimeline adds (it is fixed, whatever the traffic), the throughput of
+flushing click batches through ``apply_clicks`` into the shards and their
+timelines, and p50/p99 latency of ``get_click_series`` per granularity over
+the full retained window. First-click throughput is measured under
+tracemalloc and so reads low.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from app.analytics import GRANULARITIES, parse_range
+from app.models import URLStore
+from benchmarks.common import percentile, print_table
+
+
+def populate(num_links):
+    store = URLStore()
+    store.add_many([("%07x" % i, "https://example.com/%d" % i) for i in range(num_links)])
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=1_000_000)
+    parser.add_argument("--active", type=float, default=0.1, help="fraction of links that get clicks")
+    parser.add_argument("--batch", type=int, default=1000, help="codes per apply_clicks batch")
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    store = populate(args.links)
+    active = ["%07x" % i for i in random.sample(range(args.links), int(args.links * args.active))]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    for offset in range(0, len(active), args.batch):
+        store.apply_clicks({code: 1 for code in active[offset:offset + args.batch]})
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    # Once every active link has a timeline, further batches only bump counters.
+    started = time.perf_counter()
+    for offset in range(0, len(active), args.batch):
+        store.apply_clicks({code: 3 for code in active[offset:offset + args.batch]})
+    steady = time.perf_counter() - started
+
+    print_table(("links", "clicked", "timeline bytes/link", "first-click codes/s", "steady codes/s"), [(
+        args.links, len(active), "%.0f" % (used / max(1, len(active))),
+        "%.0f" % (len(active) / elapsed), "%.0f" % (len(active) / steady),
+    )])
+    print()
+
+    rows = []
+    now = int(time.time())
+    for granularity in GRANULARITIES:
+        start, end, _ = parse_range({"granularity": granularity}, now)
+        samples = []
+        for code in random.choices(active, k=args.queries):
+            began = time.perf_counter()
+            store.get_click_series(code, start, end, granularity)
+            samples.append(time.perf_counter() - began)
+        rows.append((granularity, "%.1f" % (percentile(samples, 50) * 1e6), "%.1f" % (percentile(samples, 99) * 1e6)))
+    print_table(("granularity", "p50 us", "p99 us"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Bulk shortening: per-URL POSTs vs the batch endpoint.
+
+    python -m benchmarks.bench_batch --urls 10000
+
+Drives the Flask app in-process through its test client, so the numbers
+cover request parsing, validation, allocation and insertion but not the
+network.
+"""
+import argparse
+import json
+import time
+
+from app.main import app
+from app.models import url_store
+from benchmarks.common import print_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    urls = ["https://mailer.example.com/issue/%d?utm_source=newsletter" % i for i in range(args.urls)]
+    client = app.test_client()
+    rows = []
+
+    url_store.clear()
+    started = time.perf_counter()
+    for url in urls:
+        client.post("/api/shorten", json={"url": url})
+    rows.append(("POST /api/shorten x N", "%.0f" % (args.urls / (time.perf_counter() - started))))
+
+    url_store.clear()
+    started = time.perf_counter()
+    for offset in range(0, args.urls, 10_000):
+        client.post("/api/shorten/batch", json={"urls": urls[offset:offset + 10_000]})
+    rows.append(("POST /api/shorten/batch (JSON)", "%.0f" % (args.urls / (time.perf_counter() - started))))
+
+    url_store.clear()
+    body = "".join(json.dumps(url) + "\n" for url in urls)
+    started = time.perf_counter()
+    client.post("/api/shorten/batch", data=body, content_type="application/x-ndjson").get_data()
+    rows.append(("POST /api/shorten/batch (NDJSON)", "%.0f" % (args.urls / (time.perf_counter() - started))))
+
+    url_store.clear()
+    print_table(("path", "urls/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Click counting benchmark: direct shard updates vs buffered aggregation.
+
+    python -m benchmarks.bench_clicks --threads 1 4 8 --interval 1.0 --threshold 1000
+
+Reports redirect throughput and the flush lag observed by the click buffer.
+"""
+import argparse
+
+from app.clicks import ClickBuffer
+from app.models import URLStore
+from benchmarks.bench_contention import populate, redirect_worker
+from benchmarks.common import print_table, run_threads
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--urls", type=int, default=100_000)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--threshold", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for num_threads in args.threads:
+        for mode in ("direct", "buffered"):
+            buffer = None
+            if mode == "buffered":
+                buffer = ClickBuffer(flush_interval=args.interval, flush_threshold=args.threshold)
+            store = URLStore(click_buffer=buffer)
+            codes = populate(store, args.urls)
+            ops, elapsed = run_threads(num_threads, redirect_worker(store, codes), args.duration)
+            lag = "-"
+            if buffer is not None:
+                buffer.stop()
+                metrics = buffer.metrics()
+                lag = "%.3f/%.3f" % (metrics["last_flush_lag_seconds"], metrics["max_flush_lag_seconds"])
+            rows.append((mode, num_threads, "%.0f" % (ops / elapsed), lag))
+    print_table(("mode", "threads", "redirects/s", "lag last/max (s)"), rows)
+
+
+if __name__ == "__main__":
+    main()
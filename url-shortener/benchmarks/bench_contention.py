@@ -0,0 +1,91 @@
+"""Redirect-path contention benchmark for URLStore.
+
+Simulates a redirect storm: every thread repeatedly looks up a random short
+code and increments its click count. The sharded store is compared against a
+single-lock store equivalent to the original implementation.
+
+    python -m benchmarks.bench_contention --threads 1 2 4 8 16
+
+On a GIL build, absolute throughput is bounded by the interpreter lock, so the
+interesting number is how much is lost to lock hand-offs as threads are added.
+On free-threaded builds the sharded store scales with the number of cores.
+"""
+import argparse
+import random
+import threading
+
+from app.models import URLStore
+from benchmarks.common import print_table, run_threads
+
+
+class GlobalLockStore:
+    """The pre-sharding store: every operation serializes on one lock."""
+
+    def __init__(self):
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    def add_url(self, short_code, long_url):
+        with self._lock:
+            self._urls[short_code] = {"long_url": long_url, "created_at": "", "clicks": 0}
+            return short_code
+
+    def get_url(self, short_code):
+        with self._lock:
+            return self._urls.get(short_code)
+
+    def increment_clicks(self, short_code):
+        with self._lock:
+            if short_code in self._urls:
+                self._urls[short_code]["clicks"] += 1
+                return self._urls[short_code]["long_url"]
+            return None
+
+
+def populate(store, num_urls):
+    codes = ["c%07d" % i for i in range(num_urls)]
+    for code in codes:
+        store.add_url(code, "https://example.com/" + code)
+    return codes
+
+
+def redirect_worker(store, codes):
+    def worker(index, stop):
+        rng = random.Random(index)
+        choice = rng.choice
+        get_url = store.get_url
+        increment_clicks = store.increment_clicks
+        ops = 0
+        while not stop.is_set():
+            for _ in range(256):
+                code = choice(codes)
+                if get_url(code) is not None:
+                    increment_clicks(code)
+            ops += 256
+        return ops
+    return worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--urls", type=int, default=100_000)
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    stores = {
+        "global-lock": GlobalLockStore(),
+        "sharded-%d" % args.shards: URLStore(num_shards=args.shards),
+    }
+    rows = []
+    for name, store in stores.items():
+        codes = populate(store, args.urls)
+        for num_threads in args.threads:
+            ops, elapsed = run_threads(num_threads, redirect_worker(store, codes), args.duration)
+            rows.append((name, num_threads, "%.0f" % (ops / elapsed)))
+    print_table(("store", "threads", "redirects/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
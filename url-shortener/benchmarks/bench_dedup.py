@@ -0,0 +1,66 @@
+"""Store growth and shorten latency on a heavily repeated workload.
+
+    python -m benchmarks.bench_dedup --requests 1000000 --distinct 20000
+
+Replays shorten requests whose long URLs follow a Zipf-like distribution
+(a few campaign links dominate) through the store, with and without the
+dedup reverse index, and reports store size, index size and per-request
+latency percentiles.
+"""
+import argparse
+import random
+import sys
+import time
+
+from app.allocator import ShortCodeAllocator
+from app.models import URLStore
+from benchmarks.common import percentile, print_table
+
+
+def shorten(store, allocator, long_url):
+    if store.dedup:
+        short_code = store.find_url(long_url)
+        if short_code is not None:
+            return short_code
+    short_code = allocator.allocate()
+    store.add_url(short_code, long_url)
+    return short_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=20_000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(42)
+    weights = [1.0 / (rank ** args.skew) for rank in range(1, args.distinct + 1)]
+    picks = rng.choices(range(args.distinct), weights=weights, k=args.requests)
+    workload = ["https://shop.example.com/sale/%d?utm_campaign=spring&utm_medium=email" % i for i in picks]
+
+    rows = []
+    for dedup in (False, True):
+        store = URLStore(dedup=dedup)
+        allocator = ShortCodeAllocator()
+        samples = []
+        started = time.perf_counter()
+        for long_url in workload:
+            t0 = time.perf_counter()
+            shorten(store, allocator, long_url)
+            samples.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        index_bytes = sum(sys.getsizeof(shard) for shard in store._reverse)
+        rows.append((
+            "on" if dedup else "off",
+            len(store),
+            "%.1f MiB" % (index_bytes / 1048576.0),
+            "%.0f" % (args.requests / elapsed),
+            "%.2f" % (percentile(samples, 50) * 1e6),
+            "%.2f" % (percentile(samples, 99) * 1e6),
+        ))
+    print_table(("dedup", "stored urls", "index dict size", "shortens/s", "p50 us", "p99 us"), rows)
+
+
+if __name__ == "__main__":
+    main()
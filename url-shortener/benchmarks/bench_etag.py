@@ -0,0 +1,57 @@
+"""Polling /api/stats with and without conditional requests.
+
+    python -m benchmarks.bench_etag --polls 20000 --click-every 50
+
+A poller requests the stats of one link over and over, and the link gets
+a click every ``--click-every`` polls. "plain" pollers get a full 200
+each time. "conditional" pollers send back the last ETag in
+If-None-Match. Until the next click they get a 304 with no body, built
+from the click count alone. The redirects are not timed.
+"""
+import argparse
+import time
+
+from app.main import app
+from app.models import url_store
+from benchmarks.common import print_table
+
+
+def run(client, short_code, conditional, polls, click_every):
+    elapsed = 0.0
+    sent = 0
+    not_modified = 0
+    etag = None
+    for index in range(polls):
+        if index and index % click_every == 0:
+            client.get("/" + short_code)
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        started = time.perf_counter()
+        response = client.get("/api/stats/" + short_code, headers=headers)
+        body = response.get_data()
+        elapsed += time.perf_counter() - started
+        sent += len(body)
+        not_modified += response.status_code == 304
+        etag = response.headers.get("ETag", etag)
+    return elapsed / polls, sent / polls, not_modified / polls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=20_000)
+    parser.add_argument("--click-every", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    url_store.clear()
+    client = app.test_client()
+    short_code = client.post("/api/shorten", json={
+        "url": "https://mailer.example.com/issue/1?utm_source=newsletter"}).get_json()["short_code"]
+    rows = []
+    for name, conditional in (("plain", False), ("conditional", True)):
+        latency, size, ratio = run(client, short_code, conditional, args.polls, args.click_every)
+        rows.append((name, "%.1f" % (latency * 1e6), "%.0f" % size, "%.0f%%" % (ratio * 100)))
+    url_store.clear()
+    print_table(("poller", "µs/poll", "body bytes/poll", "304s"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cost of TTL expiry with the timer-wheel sweeper.
+
+    python -m benchmarks.bench_expiry --links 10000000 --due 1000 10000 100000
+
+Loads ``--links`` live links whose TTLs are spread over ``--spread``
+seconds, then for each ``--due`` count expires that many of them and
+compares the wheel sweep with a full scan of every shard looking for
+expired records. Also reports the wheel's traced memory per scheduled link
+and the per-call cost of ``increment_clicks`` on live and expired links.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.expiry import ExpirySweeper
+from app.models import URLStore
+from benchmarks.common import print_table
+
+
+def full_scan(store, now):
+    due = []
+    for shard in store._shards:
+        for short_code, url_data in shard.items():
+            if url_data.expired(now):
+                due.append(short_code)
+    return store.expire(due, now)
+
+
+def populate(num_links, spread, now):
+    store = URLStore(sweeper=ExpirySweeper(autostart=False))
+    gc.collect()
+    started = time.perf_counter()
+    for i in range(num_links):
+        store.add_url("%07x" % i, "https://example.com/%d" % i, expires_at=now + 1 + i % spread)
+    return store, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=10_000_000)
+    parser.add_argument("--spread", type=int, default=86400, help="seconds the TTLs are spread over")
+    parser.add_argument("--due", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    now = int(time.time())
+    store, elapsed = populate(args.links, args.spread, now)
+    print("loaded %d links in %.1fs (%.0f adds/s)" % (args.links, elapsed, args.links / elapsed))
+
+    sweeper = ExpirySweeper(autostart=False)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(min(args.links, 1_000_000)):
+        sweeper.schedule("%07x" % i, now + 1 + i % args.spread)
+    codes_and_wheel = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print("wheel: %.1f bytes/scheduled link (codes included)\n" % (codes_and_wheel / min(args.links, 1_000_000)))
+
+    live, dead = "%07x" % (args.links - 1), "%07x" % 0
+    store.get_url(dead).expires_at = now - 1
+    rows = []
+    for name, code in (("live", live), ("expired", dead)):
+        started = time.perf_counter()
+        for _ in range(args.calls):
+            store.increment_clicks(code)
+        rows.append((name, "%.2f" % ((time.perf_counter() - started) / args.calls * 1e6)))
+    print_table(("increment_clicks", "us/call"), rows)
+    print()
+
+    rows = []
+    cutoff = now
+    for due in args.due:
+        # Links are spread evenly over the seconds, so advance by enough of them.
+        cutoff += max(1, due * args.spread // args.links)
+        started = time.perf_counter()
+        expired = store.sweeper.sweep(cutoff)
+        wheel = time.perf_counter() - started
+        cutoff += max(1, due * args.spread // args.links)
+        started = time.perf_counter()
+        scanned = full_scan(store, cutoff)
+        scan = time.perf_counter() - started
+        rows.append((len(store), expired, "%.2f" % (wheel * 1e3), scanned, "%.2f" % (scan * 1e3)))
+    print_table(("live links", "wheel expired", "wheel ms", "scan expired", "scan ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
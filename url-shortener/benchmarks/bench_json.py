@@ -0,0 +1,63 @@
+"""Cost of encoding a 10k-URL batch response: stdlib json vs orjson.
+
+    python -m benchmarks.bench_json --urls 10000 --repeat 20
+
+"encode" times only the ``{"results": [...]}`` body of a JSON batch, built
+from the result dicts ``shorten_many`` returns (there is no record to
+dict conversion to skip: the results are the response). "POST" times the
+whole batch request through the test client with each provider. Both
+produce the same compact body, so the bytes match.
+"""
+import argparse
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from app.json_provider import FastJSONProvider
+from app.main import app, shorten_many
+from app.models import url_store
+from benchmarks.common import print_table
+
+
+def best_of(repeat, fn):
+    fn()
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    urls = ["https://mailer.example.com/issue/%d?utm_source=newsletter" % i for i in range(args.urls)]
+    client = app.test_client()
+    original = app.json
+    rows = []
+    baseline = None
+    for name, provider in (("stdlib json", DefaultJSONProvider(app)), ("orjson", FastJSONProvider(app))):
+        app.json = provider
+        url_store.clear()
+        with app.test_request_context("/api/shorten/batch"):
+            payload = {"results": shorten_many(urls, "http://localhost/")}
+            encode = best_of(args.repeat, lambda: app.json.response(payload))
+            size = len(app.json.response(payload).get_data())
+
+        def post():
+            url_store.clear()
+            client.post("/api/shorten/batch", json={"urls": urls}).get_data()
+
+        request = best_of(max(args.repeat // 4, 1), post)
+        baseline = baseline or encode
+        rows.append((name, "%.2f" % (encode * 1e3), "%.1fx" % (baseline / encode), size, "%.1f" % (request * 1e3)))
+    app.json = original
+    url_store.clear()
+    print_table(("encoder", "encode ms", "speedup", "bytes", "POST ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
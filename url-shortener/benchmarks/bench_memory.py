@@ -0,0 +1,75 @@
+"""Memory footprint of URLStore records.
+
+    python -m benchmarks.bench_memory --sizes 1000000 10000000
+
+Reports traced bytes per URL (short code, long URL and record, plus the
+shard dict slots) for the original layout -- a dict per record holding an
+ISO-8601 string -- and for the slotted URLRecord layout, with and without
+long URL interning. ``--distinct`` controls how many different long
+URLs the population draws from, so interning has something to share.
+"""
+import argparse
+import datetime
+import gc
+import tracemalloc
+
+from app.models import URLStore
+from benchmarks.common import print_table
+
+
+def legacy_records(size, make_url):
+    shards = [{} for _ in range(16)]
+    for i in range(size):
+        code = "%06x" % i
+        shards[hash(code) & 15][code] = {
+            "long_url": make_url(i),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "clicks": 0,
+        }
+    return shards
+
+
+def compact_records(size, make_url, intern_urls):
+    store = URLStore(intern_urls=intern_urls)
+    for i in range(size):
+        store.add_url("%06x" % i, make_url(i))
+    return store
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--distinct", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    def make_url(i):
+        # Built per record, as request bodies are, so equal URLs are distinct objects.
+        return "https://example.com/campaign/%d?utm_source=mail" % (i % args.distinct)
+
+    rows = []
+    for size in args.sizes:
+        layouts = [
+            ("dict + iso string", lambda: legacy_records(size, make_url)),
+            ("slots + epoch", lambda: compact_records(size, make_url, False)),
+            ("slots + epoch + intern", lambda: compact_records(size, make_url, True)),
+        ]
+        for name, build in layouts:
+            used = measure(build)
+            rows.append((size, name, "%.1f" % (used / size)))
+    print_table(("urls", "layout", "bytes/url"), rows)
+
+
+if __name__ == "__main__":
+    main()
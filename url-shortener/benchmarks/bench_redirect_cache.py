@@ -0,0 +1,65 @@
+"""Redirect latency with the prebuilt-response cache on and off.
+
+    python -m benchmarks.bench_redirect_cache --links 5000 --requests 50000
+
+Drives GET /<short_code> through the Flask test client with a skewed
+popularity distribution and reports p50/p99 latency and the cache hit ratio.
+"""
+import argparse
+import random
+import time
+
+from app import main as shortener
+from app.cache import RedirectCache
+from app.models import url_store
+from benchmarks.common import percentile, print_table
+
+
+def run(client, codes, weights, requests):
+    rng = random.Random(7)
+    picks = rng.choices(codes, weights=weights, k=requests)
+    samples = []
+    for code in picks:
+        started = time.perf_counter()
+        client.get("/" + code)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--capacity", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    url_store.clear()
+    client = shortener.app.test_client()
+    codes = []
+    for i in range(args.links):
+        response = client.post("/api/shorten", json={"url": "https://example.com/landing/%d" % i})
+        codes.append(response.get_json()["short_code"])
+    weights = [1.0 / rank for rank in range(1, args.links + 1)]
+
+    rows = []
+    original = shortener.redirect_cache
+    try:
+        for label, capacity in (("off", 0), ("on", args.capacity)):
+            shortener.redirect_cache = RedirectCache(capacity=capacity)
+            samples = run(client, codes, weights, args.requests)
+            metrics = shortener.redirect_cache.metrics()
+            rows.append((
+                label,
+                "%.1f" % (percentile(samples, 50) * 1e6),
+                "%.1f" % (percentile(samples, 99) * 1e6),
+                "%.3f" % metrics["hit_ratio"],
+                metrics["evictions"],
+            ))
+    finally:
+        shortener.redirect_cache = original
+        url_store.clear()
+    print_table(("cache", "p50 us", "p99 us", "hit ratio", "evictions"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Multi-worker throughput of the shared-memory store.
+
+    python -m benchmarks.bench_shared --workers 1 2 4 8 --duration 3
+
+Each worker process opens the same SharedURLStore file and resolves random
+codes with ``increment_clicks`` for ``--duration`` seconds, the way a
+gunicorn worker serves redirects. The per-process URLStore on the same
+number of threads is shown for reference (it only scales to one core).
+After each run the clicks stored in the table are checked against the
+operations the workers reported, so lost increments would show up as a
+mismatch. ``--buffered`` routes clicks through each worker's ClickBuffer.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app.clicks import ClickBuffer
+from app.models import URLStore
+from app.shared import SharedURLStore
+from benchmarks.common import print_table, run_threads
+
+
+def codes(num_urls):
+    return ["%06x" % i for i in range(num_urls)]
+
+
+def shared_worker(path, all_codes, duration, buffered, ops):
+    buffer = ClickBuffer(autostart=False) if buffered else None
+    store = SharedURLStore(path, click_buffer=buffer)
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for code in random.choices(all_codes, k=100):
+            store.increment_clicks(code)
+        done += 100
+    store.close()
+    ops.value = done
+
+
+def run_shared(path, all_codes, workers, duration, buffered):
+    context = multiprocessing.get_context("fork")
+    counters = [context.Value("q", 0) for _ in range(workers)]
+    processes = [context.Process(target=shared_worker, args=(path, all_codes, duration, buffered, counter))
+                 for counter in counters]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return sum(counter.value for counter in counters), elapsed
+
+
+def run_local(all_codes, threads, duration):
+    store = URLStore()
+    store.add_many([(code, "https://example.com/" + code) for code in all_codes])
+
+    def worker(index, stop):
+        done = 0
+        while not stop.is_set():
+            for code in random.choices(all_codes, k=100):
+                store.increment_clicks(code)
+            done += 100
+        return done
+
+    return run_threads(threads, worker, duration)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--urls", type=int, default=100_000)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--buffered", action="store_true")
+    parser.add_argument("--directory", default="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    args = parser.parse_args(argv)
+
+    all_codes = codes(args.urls)
+    rows = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+            path = os.path.join(directory, "urls.shm")
+            store = SharedURLStore(path, capacity=1 << max(10, (args.urls * 2 - 1).bit_length()),
+                                   arena_bytes=args.urls * 64)
+            store.add_many([(code, "https://example.com/" + code) for code in all_codes])
+            ops, elapsed = run_shared(path, all_codes, workers, args.duration, args.buffered)
+            stored = sum(store.get_url(code).clicks for code in all_codes)
+            store.close()
+        rows.append(("shared, %d processes" % workers, "%.0f" % (ops / elapsed), "ok" if stored == ops else
+                     "LOST %d" % (ops - stored)))
+        ops, elapsed = run_local(all_codes, workers, args.duration)
+        rows.append(("local, %d threads" % workers, "%.0f" % (ops / elapsed), "-"))
+    print_table(("store", "clicks/s", "stored clicks"), rows)
+
+
+if __name__ == "__main__":
+    main()
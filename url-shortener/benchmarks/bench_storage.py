@@ -0,0 +1,87 @@
+"""Durable storage benchmark for the append-only log backend.
+
+    python -m benchmarks.bench_storage --urls 10000000 --tail 100000
+
+Measures sustained add_url and batched click throughput with the log
+backend, then builds a data directory holding ``--urls`` entries (a compacted
+snapshot plus a ``--tail`` of un-compacted WAL records) and times how long a
+fresh URLStore takes to recover it.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from app.models import URLStore
+from app.storage import LogBackend
+from benchmarks.common import print_table
+
+
+def bench_writes(directory, num_urls, fsync_interval):
+    store = URLStore(backend=LogBackend(directory, fsync_interval=fsync_interval))
+    codes = ["w%08d" % i for i in range(num_urls)]
+    started = time.perf_counter()
+    for code in codes:
+        store.add_url(code, "https://example.com/landing/" + code)
+    add_seconds = time.perf_counter() - started
+
+    batch = dict.fromkeys(codes[:1000], 3)
+    batches = max(1, num_urls // 1000)
+    started = time.perf_counter()
+    for _ in range(batches):
+        store.apply_clicks(batch)
+    click_seconds = time.perf_counter() - started
+    store.close()
+    return num_urls / add_seconds, batches * len(batch) / click_seconds
+
+
+def build_dataset(directory, num_urls, tail):
+    backend = LogBackend(directory, fsync_interval=60, snapshot_bytes=1 << 62)
+    backend.replay(lambda *args: None, lambda *args: None)
+    created_at = int(time.time())
+    for i in range(num_urls):
+        backend.record_add("r%08d" % i, "https://example.com/landing/r%08d" % i, created_at)
+        if i == num_urls - tail - 1:
+            backend.record_clicks({"r%08d" % j: 1 for j in range(min(num_urls, 1000))}, int(time.time()))
+            backend._open_segment(1)
+            backend.compact(1)
+    backend.close()
+
+
+def bench_recovery(directory):
+    started = time.perf_counter()
+    store = URLStore(backend=LogBackend(directory))
+    seconds = time.perf_counter() - started
+    count = len(store)
+    store.close()
+    return count, seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=10_000_000)
+    parser.add_argument("--tail", type=int, default=100_000)
+    parser.add_argument("--write-urls", type=int, default=200_000)
+    parser.add_argument("--fsync-interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="urlstore-bench-")
+    try:
+        adds_per_second, clicks_per_second = bench_writes(
+            directory + "/writes", args.write_urls, args.fsync_interval)
+        build_dataset(directory + "/recovery", args.urls, min(args.tail, args.urls - 1))
+        count, seconds = bench_recovery(directory + "/recovery")
+    finally:
+        shutil.rmtree(directory)
+
+    print_table(("metric", "value"), [
+        ("add_url/s (fsync every %.1fs)" % args.fsync_interval, "%.0f" % adds_per_second),
+        ("clicks applied/s (1000-code batches)", "%.0f" % clicks_per_second),
+        ("recovered urls", count),
+        ("recovery seconds", "%.2f" % seconds),
+        ("recovered urls/s", "%.0f" % (count / seconds)),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""URL validation microbenchmark: original per-call regex vs structured parser.
+
+    python -m benchmarks.bench_validation --iterations 200000
+
+Times a mixed corpus of valid and invalid URLs, then the worst case of each
+validator on growing adversarial inputs to show how cost scales with length.
+"""
+import argparse
+import re
+import time
+
+from app.utils import is_valid_url, validate_urls
+from benchmarks.common import print_table
+
+
+def legacy_is_valid_url(url):
+    regex = re.compile(
+        r'^(?:http|ftp)s?://'
+        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'
+        r'localhost|'
+        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'
+        r'(?::\d+)?'
+        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+    return re.match(regex, url) is not None
+
+
+CORPUS = [
+    "https://www.example.com/very/long/url?utm_source=newsletter&utm_medium=email",
+    "http://localhost:5000/api",
+    "http://192.168.1.10:8080/",
+    "ftp://files.example.org/pub/archive.tar.gz",
+    "not-a-url",
+    "http://example.com/has space",
+    "https://sub.domain.example.co.uk",
+    "javascript:alert(1)",
+]
+
+PATHOLOGICAL = {
+    "dotted labels": lambda n: "http://" + "a." * n + "!",
+    "hyphen labels": lambda n: "http://" + "a-" * n + ".com",
+    "long path, trailing space": lambda n: "http://example.com/" + "a" * n + " ",
+}
+
+
+def time_calls(fn, inputs, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        fn(inputs[i % len(inputs)])
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args(argv)
+
+    rows = []
+    for name, fn in (("legacy regex", legacy_is_valid_url), ("structured", is_valid_url)):
+        seconds = time_calls(fn, CORPUS, args.iterations)
+        rows.append((name, "mixed corpus", "%.0f" % (args.iterations / seconds)))
+    started = time.perf_counter()
+    for _ in range(args.iterations // len(CORPUS)):
+        validate_urls(CORPUS)
+    rows.append(("structured batch", "mixed corpus", "%.0f" % (args.iterations / (time.perf_counter() - started))))
+    print_table(("validator", "input", "urls/s"), rows)
+    print()
+
+    rows = []
+    for label, build in PATHOLOGICAL.items():
+        for length in args.lengths:
+            url = build(length)
+            legacy = time_calls(legacy_is_valid_url, [url], 1)
+            structured = time_calls(lambda u: is_valid_url(u, max_length=None), [url], 1)
+            rows.append((label, len(url), "%.3f" % (legacy * 1e3), "%.3f" % (structured * 1e3)))
+    print_table(("pathological input", "length", "legacy ms", "structured ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
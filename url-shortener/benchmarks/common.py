@@ -0,0 +1,185 @@
+import json
+import os
+import platform
+import threading
+import time
+
+
+def run_threads(num_threads, worker, duration=2.0):
+    """Run ``worker(thread_index, stop_event)`` on N threads for ``duration``
+    seconds and return the summed operation counts the workers report."""
+    stop = threading.Event()
+    counts = [0] * num_threads
+
+    def target(index):
+        counts[index] = worker(index, stop)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sum(counts), elapsed
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(row[i])) for row in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def calibrate(repeat=5):
+    """Seconds for a fixed pure-Python loop, best of ``repeat``: how fast
+    this machine is running right now."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = 0
+        for i in range(20_000):
+            total += i * i
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(make_op, threads=1, duration=1.0, batch=1, warmup=0.1, rounds=5):
+    """Call ``make_op(thread_index)()`` in a loop on ``threads`` threads,
+    timing each run of ``batch`` calls, after ``warmup`` seconds on one
+    thread. ``duration`` is split into ``rounds`` and the median round is
+    kept, so one round slowed or sped up by the rest of the machine does
+    not move the result. Returns calls per second, the p50/p99 latency
+    of one call in microseconds, and ``calibrate()`` taken alongside."""
+    op = make_op(0)
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        op()
+    measured = []
+    calibration = []
+    for _ in range(rounds):
+        calibration.append(calibrate())
+        latencies = []
+
+        def worker(index, stop):
+            op = make_op(index)
+            samples = []
+            while not stop.is_set():
+                started = time.perf_counter()
+                for _ in range(batch):
+                    op()
+                samples.append((time.perf_counter() - started) / batch)
+            latencies.extend(samples)
+            return len(samples) * batch
+
+        calls, elapsed = run_threads(threads, worker, duration / rounds)
+        measured.append({
+            "threads": threads,
+            "calls": calls,
+            "throughput": round(calls / elapsed, 1),
+            "p50_us": round(percentile(latencies, 50) * 1e6, 2),
+            "p99_us": round(percentile(latencies, 99) * 1e6, 2),
+        })
+    measured.sort(key=lambda result: result["throughput"])
+    result = measured[len(measured) // 2]
+    result["calibration_us"] = round(sorted(calibration)[len(calibration) // 2] * 1e6, 2)
+    return result
+
+
+def write_results(path, project, config, results):
+    document = {
+        "project": project,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance):
+    """Table rows comparing ``results`` with a baseline document, and the
+    names of the scenarios that regressed: throughput down by more than
+    ``tolerance`` (0.3 is 30%). Throughput is first scaled by how much
+    faster or slower the calibration loop ran than in the baseline, so a
+    busy machine is not mistaken for a regression. Latency changes are
+    reported only; with more threads than cores they mostly measure the
+    scheduler."""
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append((name, "%.0f" % result["throughput"], "", "", "", "new"))
+            continue
+        speed = result["calibration_us"] / base["calibration_us"]
+        throughput = result["throughput"] * speed / base["throughput"] - 1
+        p50 = result["p50_us"] / base["p50_us"] - 1
+        p99 = result["p99_us"] / base["p99_us"] - 1
+        regressed = throughput < -tolerance
+        if regressed:
+            regressions.append(name)
+        rows.append((name, "%.0f" % result["throughput"], "%+.0f%%" % (throughput * 100),
+                     "%+.0f%%" % (p50 * 100), "%+.0f%%" % (p99 * 100), "REGRESSED" if regressed else "ok"))
+    return rows, regressions
+
+
+def load_baseline(path, config):
+    """The baseline document at ``path``, or None if there is none or it
+    was recorded with a different ``config``."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline["config"] != config:
+        print("baseline was recorded with %s; skipping the comparison\n" % baseline["config"])
+        return None
+    return baseline
+
+
+def run_scenarios(scenarios, duration, baseline=None, tolerance=0.3):
+    """Measure each ``(name, make_op, threads, batch)``. A scenario that looks
+    regressed against ``baseline`` is measured once more and the faster
+    run kept, so one noisy run does not fail the suite."""
+    results = {}
+    for name, make_op, threads, batch in scenarios:
+        results[name] = measure(make_op, threads=threads, duration=duration, batch=batch)
+    if baseline is not None:
+        _, regressions = compare(results, baseline, tolerance)
+        for name, make_op, threads, batch in scenarios:
+            if name in regressions:
+                retry = measure(make_op, threads=threads, duration=duration, batch=batch)
+                if retry["throughput"] > results[name]["throughput"]:
+                    results[name] = retry
+    return results
+
+
+def report(results, baseline, tolerance):
+    """Print the results, and their comparison with ``baseline`` if given.
+    Returns the exit status: 1 if any scenario regressed."""
+    print_table(("scenario", "threads", "calls/s", "p50 µs", "p99 µs"), [
+        (name, r["threads"], "%.0f" % r["throughput"], "%.1f" % r["p50_us"], "%.1f" % r["p99_us"])
+        for name, r in results.items()])
+    if baseline is None:
+        return 0
+    rows, regressions = compare(results, baseline, tolerance)
+    print()
+    print_table(("scenario", "calls/s", "scaled vs baseline", "p50", "p99", "status"), rows)
+    if regressions:
+        print("\n%d scenario(s) regressed by more than %.0f%%: %s"
+              % (len(regressions), tolerance * 100, ", ".join(regressions)))
+        return 1
+    return 0
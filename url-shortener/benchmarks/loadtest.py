@@ -0,0 +1,153 @@
+"""Closed-loop HTTP load test comparing the WSGI and ASGI entry points.
+
+    python -m benchmarks.loadtest --compare --connections 50 200 1000
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 --connections 500
+
+With ``--compare`` the harness starts the Flask app on Werkzeug's threaded
+server and ``app.asgi:app`` on uvicorn (``pip install uvicorn``) as
+subprocesses, creates a short code on each and drives redirects against it.
+Every connection is a keep-alive asyncio client issuing one request at a
+time; the report lists requests/s, p50/p99/p99.9 latency and errors.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.common import percentile, print_table
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "wsgi (werkzeug threaded)": [
+        sys.executable, "-c",
+        "import sys; from werkzeug.serving import run_simple; from app.main import app; "
+        "run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)",
+    ],
+    "asgi (uvicorn)": [
+        sys.executable, "-m", "uvicorn", "app.asgi:app", "--host", "127.0.0.1",
+        "--log-level", "warning", "--no-access-log", "--port",
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port):
+    process = subprocess.Popen(command + [str(port)], cwd=PROJECT_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("server %r did not start" % command)
+
+
+def create_short_code(host, port):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.request("POST", "/api/shorten", json.dumps({"url": "https://example.com/load-test"}),
+                 {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    code = json.loads(response.read())["short_code"]
+    conn.close()
+    return code
+
+
+async def _connection(host, port, request, deadline, samples, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+            headers = {k.lower(): v for k, v in headers.items()}
+            await reader.readexactly(int(headers.get("content-length", 0)))
+            samples.append(time.perf_counter() - started)
+            if headers.get("connection", "").lower() == "close" or lines[0].startswith("HTTP/1.0"):
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            errors[0] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def drive(host, port, path, connections, duration):
+    request = ("GET %s HTTP/1.1\r\nHost: %s:%d\r\n\r\n" % (path, host, port)).encode()
+    samples, errors = [], [0]
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(_connection(host, port, request, deadline, samples, errors)
+                           for _ in range(connections)))
+    return samples, errors[0], time.perf_counter() - started
+
+
+def report_row(label, connections, samples, errors, elapsed):
+    return (
+        label, connections, "%.0f" % (len(samples) / elapsed),
+        "%.2f" % (percentile(samples, 50) * 1e3),
+        "%.2f" % (percentile(samples, 99) * 1e3),
+        "%.2f" % (percentile(samples, 99.9) * 1e3),
+        errors,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", help="base URL of an already running server")
+    parser.add_argument("--compare", action="store_true", help="start and compare WSGI and ASGI servers")
+    parser.add_argument("--connections", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    if not args.target and not args.compare:
+        parser.error("pass --target URL or --compare")
+
+    rows = []
+    if args.target:
+        parts = urlsplit(args.target)
+        host, port = parts.hostname, parts.port or 80
+        code = create_short_code(host, port)
+        for connections in args.connections:
+            rows.append(report_row(args.target, connections,
+                                   *asyncio.run(drive(host, port, "/" + code, connections, args.duration))))
+    else:
+        for label, command in SERVERS.items():
+            port = free_port()
+            process = start_server(command, port)
+            try:
+                code = create_short_code("127.0.0.1", port)
+                for connections in args.connections:
+                    rows.append(report_row(label, connections, *asyncio.run(
+                        drive("127.0.0.1", port, "/" + code, connections, args.duration))))
+            finally:
+                process.terminate()
+                process.wait()
+    print_table(("server", "connections", "req/s", "p50 ms", "p99 ms", "p99.9 ms", "errors"), rows)
+
+
+if __name__ == "__main__":
+    main()
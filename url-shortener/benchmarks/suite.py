@@ -0,0 +1,119 @@
+"""Benchmark suite: store and utility microbenchmarks plus threaded HTTP
+scenarios, compared against a stored baseline.
+
+    python -m benchmarks.suite                      # run, compare with baseline.json
+    python -m benchmarks.suite --quick --only store
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --save-baseline      # after an intended change
+
+Microbenchmarks call ``URLStore`` and ``app.utils`` directly on one
+thread, timing runs of 100 calls. HTTP scenarios drive the Flask app
+through one test client per thread, so they include routing and JSON
+but not the network. Each scenario reports calls/s and the p50/p99
+latency of one call.
+
+Results are compared with ``benchmarks/baseline.json`` when it exists.
+A scenario that looks regressed is measured again, and it fails only
+if the faster run still shows throughput down by more than
+``--tolerance``; the exit status is then 1. Baselines only compare like
+with like: record one on the machine and with the options CI uses.
+"""
+import argparse
+import itertools
+import os
+import sys
+
+from app.main import app
+from app.models import URLStore, url_store
+from app.utils import generate_short_code, is_valid_url
+from benchmarks.common import load_baseline, report, run_scenarios, write_results
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+URL = "https://mailer.example.com/issue/%d?utm_source=newsletter"
+
+
+def micro_scenarios(links):
+    store = URLStore()
+    codes = ["c%07d" % i for i in range(links)]
+    store.add_many([(code, URL % i) for i, code in enumerate(codes)])
+    added = itertools.count()
+    picks = itertools.count()
+
+    def pick():
+        return codes[next(picks) % links]
+
+    return [
+        ("store.add_url", lambda index: lambda: store.add_url("n%d" % next(added), URL % 0)),
+        ("store.get_url", lambda index: lambda: store.get_url(pick())),
+        ("store.increment_clicks", lambda index: lambda: store.increment_clicks(pick())),
+        ("store.get_stats", lambda index: lambda: store.get_stats(pick())),
+        ("utils.generate_short_code", lambda index: generate_short_code),
+        ("utils.is_valid_url", lambda index: lambda: is_valid_url(URL % 12345)),
+    ]
+
+
+def http_scenarios(links):
+    url_store.clear()
+    client = app.test_client()
+    codes = []
+    for offset in range(0, links, 10_000):
+        urls = [URL % i for i in range(offset, min(offset + 10_000, links))]
+        response = client.post("/api/shorten/batch", json={"urls": urls})
+        codes.extend(result["short_code"] for result in response.get_json()["results"])
+    shortened = itertools.count()
+    picks = itertools.count()
+
+    def redirect(index):
+        client = app.test_client()
+        return lambda: client.get("/" + codes[next(picks) % len(codes)])
+
+    def shorten(index):
+        client = app.test_client()
+        return lambda: client.post("/api/shorten", json={"url": URL % (10 ** 9 + next(shortened))})
+
+    def stats(index):
+        client = app.test_client()
+        return lambda: client.get("/api/stats/" + codes[next(picks) % len(codes)])
+
+    return [
+        ("http.redirect_storm", redirect),
+        ("http.shorten_burst", shorten),
+        ("http.stats", stats),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="shorter runs and fewer links")
+    parser.add_argument("--duration", type=float, help="seconds per scenario (default 2, or 0.5 with --quick)")
+    parser.add_argument("--threads", type=int, default=8, help="threads for the HTTP scenarios")
+    parser.add_argument("--links", type=int, help="links in the store (default 100000, or 10000 with --quick)")
+    parser.add_argument("--only", help="run only scenarios whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args(argv)
+    if args.only and args.save_baseline:
+        parser.error("--save-baseline records every scenario; drop --only")
+
+    duration = args.duration or (0.5 if args.quick else 2.0)
+    links = args.links or (10_000 if args.quick else 100_000)
+    config = {"duration": duration, "threads": args.threads, "links": links}
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline, config)
+    scenarios = [(name, make_op, 1, 100) for name, make_op in micro_scenarios(links)]
+    scenarios += [(name, make_op, args.threads, 1) for name, make_op in http_scenarios(links)]
+    results = run_scenarios([scenario for scenario in scenarios if not args.only or args.only in scenario[0]],
+                            duration, baseline, args.tolerance)
+    url_store.clear()
+
+    if args.output:
+        write_results(args.output, "url-shortener", config, results)
+    if args.save_baseline:
+        write_results(args.baseline, "url-shortener", config, results)
+    return report(results, baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import pytest
+from app.allocator import (ALPHABET, CodeSpaceExhausted, FileBlockSource, LocalBlockSource,
+                           ShortCodeAllocator, create_allocator)
+from app.config import Config
+
+def test_every_code_in_the_space_is_allocated_exactly_once():
+    allocator = ShortCodeAllocator(length=2, block_size=100)
+    codes = allocator.allocate_many(allocator.space)
+    assert len(set(codes)) == allocator.space == 62 ** 2
+    assert all(len(code) == 2 and set(code) <= set(ALPHABET) for code in codes)
+    with pytest.raises(CodeSpaceExhausted):
+        allocator.allocate()
+
+def test_consecutive_ids_do_not_yield_sequential_codes():
+    allocator = ShortCodeAllocator(length=6)
+    codes = allocator.allocate_many(100)
+    assert codes != sorted(codes)
+    assert len({code[:3] for code in codes}) > 50
+    assert ShortCodeAllocator(length=6, key="other").allocate() != codes[0]
+
+def test_code_length_is_configurable():
+    assert len(ShortCodeAllocator(length=9).allocate()) == 9
+
+def test_workers_sharing_a_counter_file_never_collide(tmp_path):
+    path = str(tmp_path / "id-counter")
+    workers = [ShortCodeAllocator(block_size=10, source=FileBlockSource(path)) for _ in range(3)]
+    codes = []
+    for _ in range(25):
+        for worker in workers:
+            codes.append(worker.allocate())
+    assert len(set(codes)) == len(codes)
+    assert FileBlockSource(path).reserve(1) == 9 * 10
+
+def test_local_block_source_reserves_disjoint_blocks():
+    source = LocalBlockSource(start=5)
+    assert [source.reserve(10), source.reserve(10)] == [5, 15]
+
+def test_workers_sharing_a_memory_store_share_its_counter(tmp_path):
+    class SharedConfig(Config):
+        DATA_DIR = None
+        SHARED_MEMORY_PATH = str(tmp_path / "urls.shm")
+        ID_BLOCK_SIZE = 10
+    workers = [create_allocator(SharedConfig) for _ in range(3)]
+    codes = [worker.allocate() for _ in range(25) for worker in workers]
+    assert len(set(codes)) == len(codes)
+    # A restarted worker carries on from the same counter.
+    assert create_allocator(SharedConfig).allocate() not in codes
@@ -0,0 +1,58 @@
+import time
+import pytest
+from app.analytics import ClickTimeline, LEVELS, parse_range
+from app.clicks import ClickBuffer
+from app.models import URLStore
+
+HOUR = 3600
+BASE = 1_700_000_000 // 86400 * 86400
+
+def test_clicks_land_in_every_granularity():
+    timeline = ClickTimeline()
+    timeline.record(BASE + 30)
+    timeline.record(BASE + 90, 2)
+    assert timeline.series(BASE, BASE + 119, "minute") == [(BASE, 1), (BASE + 60, 2)]
+    timeline.record(BASE + HOUR + 5)
+    assert timeline.series(BASE, BASE + HOUR, "hour") == [(BASE, 3), (BASE + HOUR, 1)]
+    assert timeline.series(BASE, BASE, "day") == [(BASE, 4)]
+
+def test_old_minutes_are_downsampled_into_hours():
+    timeline = ClickTimeline()
+    timeline.record(BASE + 10, 5)
+    timeline.record(BASE + 3 * HOUR, 1)
+    assert sum(c for _, c in timeline.series(BASE, BASE + 3 * HOUR, "minute")) == 1
+    assert timeline.series(BASE, BASE, "hour") == [(BASE, 5)]
+
+def test_series_is_clipped_to_retention():
+    timeline = ClickTimeline()
+    timeline.record(BASE)
+    _, _, size, _ = LEVELS[0]
+    assert len(timeline.series(0, BASE, "minute")) == size
+
+def test_timeline_round_trips_through_bytes():
+    timeline = ClickTimeline()
+    timeline.record(BASE + 61, 7)
+    restored = ClickTimeline.from_bytes(timeline.to_bytes())
+    assert restored.series(BASE, BASE + 120, "minute") == timeline.series(BASE, BASE + 120, "minute")
+    assert ClickTimeline.from_bytes(b"\x01") is None
+
+def test_parse_range_accepts_epoch_and_iso():
+    assert parse_range({"from": str(BASE), "to": "2023-11-14T00:10:00Z", "granularity": "minute"}, 0) == \
+        (BASE, BASE + 600, "minute")
+    start, end, granularity = parse_range({}, BASE)
+    assert (end, granularity) == (BASE, "hour") and start < end
+    for params in ({"granularity": "week"}, {"from": "yesterday"}, {"from": str(BASE + 1), "to": str(BASE)},
+                   {"to": "99999999999999"}, {"from": "-1"}, {"to": "9999-12-31T23:59:59-05:00"}):
+        with pytest.raises(ValueError):
+            parse_range(params, BASE)
+
+def test_store_series_includes_unflushed_clicks():
+    buffer = ClickBuffer(flush_interval=3600, autostart=False)
+    store = URLStore(click_buffer=buffer)
+    store.add_url("abc123", "http://example.com")
+    store.increment_clicks("abc123")
+    buffer.flush()
+    store.increment_clicks("abc123")
+    series = store.get_click_series("abc123", 0, int(time.time()), "day")
+    assert sum(clicks for _, clicks in series) == 2
+    assert store.get_click_series("missing", 0, 1, "day") is None
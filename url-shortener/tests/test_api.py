@@ -1,3 +1,4 @@
+import json
 import pytest
 from app.main import app
 from app.models import url_store
@@ -6,7 +7,7 @@ from app.models import url_store
 def client():
     app.config['TESTING'] = True
     # Reset the url_store before each test
-    url_store._urls = {}
+    url_store.clear()
     with app.test_client() as client:
         yield client
 
@@ -75,4 +76,139 @@ def test_click_increment(client):
     # Check the stats
     get_response = client.get(f'/api/stats/{short_code}')
     data = get_response.get_json()
-    assert data['clicks'] == 2
\ No newline at end of file
+    assert data['clicks'] == 2
+
+def test_metrics_report_click_flushing(client):
+    post_response = client.post('/api/shorten', json={'url': 'http://example.com'})
+    short_code = post_response.get_json()['short_code']
+    client.get(f'/{short_code}')
+
+    response = client.get('/api/metrics')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['urls'] == 1
+    assert 'last_flush_lag_seconds' in data['clicks']
+    assert 'flush_interval_seconds' in data['clicks']
+
+def test_shorten_same_url_reuses_code_with_dedup(client):
+    url_store.dedup = True
+    try:
+        first = client.post('/api/shorten', json={'url': 'http://example.com/campaign'})
+        second = client.post('/api/shorten', json={'url': 'http://EXAMPLE.com/campaign'})
+    finally:
+        url_store.dedup = False
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.get_json()['short_code'] == first.get_json()['short_code']
+    assert len(url_store) == 1
+
+def test_shorten_batch_json(client):
+    response = client.post('/api/shorten/batch', json={'urls': ['http://example.com/a', 'not-a-url', 'http://example.com/b']})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 3
+    assert len(results[0]['short_code']) == 6
+    assert results[1] == {'url': 'not-a-url', 'error': 'Invalid URL'}
+    assert results[2]['short_url'].endswith(results[2]['short_code'])
+
+    redirect_response = client.get(f"/{results[0]['short_code']}")
+    assert redirect_response.location == 'http://example.com/a'
+
+def test_shorten_batch_requires_url_list(client):
+    response = client.post('/api/shorten/batch', json={'urls': 'http://example.com'})
+    assert response.status_code == 400
+    response = client.post('/api/shorten/batch', json=['http://example.com'])
+    assert response.status_code == 400
+
+def test_shorten_batch_ndjson_stream(client):
+    body = '"http://example.com/a"\n{"url": "http://example.com/b"}\n\n{broken\n'
+    response = client.post('/api/shorten/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r.get('url') for r in results[:2]] == ['http://example.com/a', 'http://example.com/b']
+    assert all('short_code' in r for r in results[:2])
+    assert results[2] == {'error': 'Invalid JSON'}
+    assert len(url_store) == 2
+
+def test_cached_redirects_still_count_clicks(client):
+    post_response = client.post('/api/shorten', json={'url': 'http://example.com'})
+    short_code = post_response.get_json()['short_code']
+    hits_before = client.get('/api/metrics').get_json()['redirect_cache']['hits']
+
+    for _ in range(3):
+        response = client.get(f'/{short_code}')
+        assert response.status_code == 302
+        assert response.location == 'http://example.com'
+
+    assert client.get(f'/api/stats/{short_code}').get_json()['clicks'] == 3
+    cache_metrics = client.get('/api/metrics').get_json()['redirect_cache']
+    assert cache_metrics['hits'] - hits_before == 2
+    assert cache_metrics['size'] == 1
+
+def test_stats_timeline_query(client):
+    short_code = client.post('/api/shorten', json={'url': 'http://example.com'}).get_json()['short_code']
+    client.get(f'/{short_code}')
+    client.get(f'/{short_code}')
+
+    data = client.get(f'/api/stats/{short_code}?granularity=minute').get_json()
+    assert data['clicks'] == 2
+    assert data['timeline']['granularity'] == 'minute'
+    assert sum(bucket['clicks'] for bucket in data['timeline']['buckets']) == 2
+    assert 'timeline' not in client.get(f'/api/stats/{short_code}').get_json()
+
+    response = client.get(f'/api/stats/{short_code}?granularity=week')
+    assert response.status_code == 400
+    response = client.get(f'/api/stats/{short_code}?from=2024-01-02&to=2024-01-01')
+    assert response.status_code == 400
+    response = client.get(f'/api/stats/{short_code}?to=99999999999999')
+    assert response.status_code == 400
+
+def test_stats_timeline_unavailable_without_timelines(client):
+    short_code = client.post('/api/shorten', json={'url': 'http://example.com'}).get_json()['short_code']
+    url_store.timelines = False
+    try:
+        response = client.get(f'/api/stats/{short_code}?granularity=minute')
+    finally:
+        del url_store.timelines
+    assert response.status_code == 501
+    assert client.get(f'/api/stats/{short_code}').status_code == 200
+
+def test_shorten_with_limits(client):
+    response = client.post('/api/shorten', json={'url': 'http://example.com', 'ttl': 3600, 'max_clicks': 1})
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['max_clicks'] == 1 and 'expires_at' in data
+
+    assert client.get(f"/{data['short_code']}").status_code == 302
+    assert client.get(f"/{data['short_code']}").status_code == 404
+    assert client.get(f"/api/stats/{data['short_code']}").status_code == 404
+
+    response = client.post('/api/shorten', json={'url': 'http://example.com', 'ttl': -5})
+    assert response.status_code == 400
+    response = client.post('/api/shorten', json={'url': 'http://example.com', 'ttl': 10000000000000})
+    assert response.status_code == 400
+    assert len(url_store) == 0
+
+def test_stats_conditional_requests(client):
+    short_code = client.post('/api/shorten', json={'url': 'http://example.com'}).get_json()['short_code']
+    response = client.get(f'/api/stats/{short_code}')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    not_modified = client.get(f'/api/stats/{short_code}', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+
+    client.get(f'/{short_code}')
+    changed = client.get(f'/api/stats/{short_code}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['clicks'] == 1
+    assert changed.headers['ETag'] != etag
+    assert client.get(f'/api/stats/{short_code}', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
+
+    timeline = client.get(f'/api/stats/{short_code}?granularity=minute', headers={'If-None-Match': changed.headers['ETag']})
+    assert timeline.status_code == 200
+    assert 'ETag' not in timeline.headers
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from app.asgi import MAX_BODY_SIZE, AsyncURLStore, _host_url, app
+from app.clicks import ClickBuffer
+from app.models import URLStore, url_store
+from app.shared import SharedURLStore
+
+@pytest.fixture(autouse=True)
+def clear_store():
+    url_store.clear()
+    yield
+    url_store.clear()
+
+def call(method, path, body=None, headers=()):
+    payload = json.dumps(body).encode() if body is not None else b""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "scheme": "http",
+             "headers": [(b"host", b"testserver"), *headers]}
+    asyncio.run(app(scope, receive, send))
+    start, body_message = messages
+    headers = {k.decode(): v.decode() for k, v in start["headers"]}
+    return start["status"], headers, body_message["body"]
+
+def test_asgi_health():
+    status, _, body = call("GET", "/")
+    assert status == 200
+    assert json.loads(body)["status"] == "healthy"
+    assert json.loads(call("GET", "/api/health")[2])["status"] == "ok"
+
+def test_asgi_shorten_redirect_and_stats():
+    status, _, body = call("POST", "/api/shorten", {"url": "http://example.com"})
+    assert status == 201
+    data = json.loads(body)
+    assert data["short_url"] == "http://testserver/" + data["short_code"]
+
+    status, headers, _ = call("GET", "/" + data["short_code"])
+    assert status == 302
+    assert headers["location"] == "http://example.com"
+    call("GET", "/" + data["short_code"])
+
+    status, _, body = call("GET", "/api/stats/" + data["short_code"])
+    assert status == 200
+    assert json.loads(body)["clicks"] == 2
+
+def test_asgi_errors():
+    assert call("POST", "/api/shorten", {"url": "not-a-url"})[0] == 400
+    assert call("POST", "/api/shorten")[0] == 400
+    assert call("GET", "/missing")[0] == 404
+    assert call("GET", "/api/stats/missing")[0] == 404
+    assert call("GET", "/api/shorten")[0] == 405
+
+def test_asgi_rejects_oversized_body():
+    status, _, body = call("POST", "/api/shorten", {"url": "http://example.com/" + "a" * MAX_BODY_SIZE})
+    assert status == 413
+    assert json.loads(body)["error"] == "Request body too large"
+
+def test_host_url_without_host_header():
+    assert _host_url({"server": ("example.com", 8000)}) == "http://example.com:8000/"
+    assert _host_url({"server": ("/run/app.sock", None)}) == "http:///run/app.sock/"
+    assert _host_url({}) == "http://localhost:80/"
+
+def test_asgi_stats_conditional():
+    code = json.loads(call("POST", "/api/shorten", {"url": "http://example.com"})[2])["short_code"]
+    status, headers, _ = call("GET", "/api/stats/" + code)
+    etag = headers["etag"]
+    assert etag.startswith('W/"')
+    status, headers, body = call("GET", "/api/stats/" + code, headers=[(b"if-none-match", etag.encode())])
+    assert (status, body, headers["etag"]) == (304, b"", etag)
+    call("GET", "/" + code)
+    assert call("GET", "/api/stats/" + code, headers=[(b"if-none-match", etag.encode())])[0] == 200
+
+def test_offloaded_clicks_flush_off_the_event_loop():
+    buffer = ClickBuffer(flush_interval=3600, flush_threshold=2, autostart=False)
+    store = URLStore(click_buffer=buffer)
+    store.add_url("abc123", "http://example.com")
+    flushed_on = []
+    buffer.bind(lambda deltas: flushed_on.append(threading.get_ident()))
+    async_store = AsyncURLStore(store, offload_writes=True)
+
+    async def clicks():
+        for _ in range(4):
+            await async_store.increment_clicks("abc123")
+        await async_store.get_stats("abc123")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(clicks())
+    assert len(flushed_on) == 2 and loop_thread not in flushed_on
+
+def test_shared_store_is_offloaded(tmp_path):
+    store = SharedURLStore(str(tmp_path / "urls.shm"), capacity=16, arena_bytes=1024)
+    assert AsyncURLStore(store).offload_writes
+    assert not AsyncURLStore(URLStore()).offload_writes
+    store.close()
@@ -0,0 +1,48 @@
+from app.cache import RedirectCache
+
+def test_cached_response_matches_redirect():
+    cache = RedirectCache(capacity=2)
+    cache.put("abc123", "http://example.com/a")
+    entry = cache.get("abc123")
+    assert entry.status == 302
+    assert dict(entry.headers)["Location"] == "http://example.com/a"
+    assert dict(entry.headers)["Cache-Control"] == "no-store"
+    assert cache.get("missing") is None
+    assert cache.metrics()["hits"] == 1
+    assert cache.metrics()["misses"] == 1
+
+def test_clock_eviction_keeps_referenced_entries():
+    cache = RedirectCache(capacity=2)
+    cache.put("hot", "http://example.com/hot")
+    cache.put("cold", "http://example.com/cold")
+    cache.get("hot")
+    cache.put("new", "http://example.com/new")
+    assert cache.get("hot") is not None
+    assert cache.get("cold") is None
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["size"] == 2
+
+def test_invalidate():
+    cache = RedirectCache(capacity=4)
+    cache.put("a", "http://example.com/a")
+    cache.put("b", "http://example.com/b")
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.invalidate()
+    assert cache.get("b") is None
+    assert cache.metrics()["invalidations"] == 2
+
+def test_invalidated_and_replaced_codes_keep_one_slot():
+    cache = RedirectCache(capacity=2)
+    cache.put("a", "http://example.com/a")
+    cache.put("a", "http://example.com/a2")
+    cache.put("b", "http://example.com/b")
+    cache.invalidate("a")
+    cache.put("a", "http://example.com/a3")
+    assert sorted(cache._ring) == ["a", "b"]
+    assert dict(cache.get("a").headers)["Location"] == "http://example.com/a3"
+    cache.put("c", "http://example.com/c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.metrics()["evictions"] == 1
+    assert cache.metrics()["size"] == 2
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+from app.clicks import ClickBuffer
+from app.expiry import MAX_CLICKS, MAX_TTL, ExpirySweeper, parse_limits
+from app.models import URLStore
+
+def make_store(**kwargs):
+    return URLStore(sweeper=ExpirySweeper(autostart=False), **kwargs)
+
+def test_sweep_only_hands_over_due_codes():
+    sweeper = ExpirySweeper(autostart=False)
+    seen = []
+    sweeper.bind(lambda codes, now: seen.extend(codes) or len(codes))
+    now = int(time.time())
+    sweeper.schedule("a", now + 5)
+    sweeper.schedule("b", now + 10)
+    sweeper.schedule("c", now - 100)
+    assert sweeper.sweep(now + 5) == 2
+    assert sorted(seen) == ["a", "c"]
+    assert sweeper.sweep(now + 1000) == 1
+    assert sweeper.metrics()["scheduled"] == 0
+
+def test_concurrent_schedules_start_one_sweeper():
+    sweeper = ExpirySweeper(sweep_interval=3600)
+    barrier = threading.Barrier(8)
+
+    def schedule(i):
+        barrier.wait()
+        sweeper.schedule("c%d" % i, int(time.time()) + 60)
+
+    before = set(threading.enumerate())
+    threads = [threading.Thread(target=schedule, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert [t.name for t in set(threading.enumerate()) - before] == ["expiry-sweeper"]
+    finally:
+        sweeper.stop()
+
+def test_expired_links_are_rejected_then_swept():
+    store = make_store()
+    now = int(time.time())
+    store.add_url("live", "http://example.com/live", expires_at=now + 3600)
+    store.add_url("dead", "http://example.com/dead", expires_at=now + 3600)
+    store.get_url("dead").expires_at = now - 1
+    assert store.increment_clicks("live") == "http://example.com/live"
+    assert store.increment_clicks("dead") is None
+    assert store.get_stats("dead") is None
+    assert len(store) == 2
+
+    assert store.sweeper.sweep(now + 3599) == 0
+    assert store.expire(["dead", "live", "missing"], now) == 1
+    assert len(store) == 1
+    assert store.sweeper.sweep(now + 3600) == 1
+    assert len(store) == 0
+
+def test_buffered_store_rejects_expired_links():
+    store = make_store(click_buffer=ClickBuffer(flush_interval=3600, autostart=False))
+    store.add_url("abc123", "http://example.com", expires_at=int(time.time()) - 1)
+    assert store.increment_clicks("abc123") is None
+
+def test_max_clicks_removes_link_on_last_click():
+    removed = []
+    store = make_store(click_buffer=ClickBuffer(flush_interval=3600, autostart=False))
+    store.subscribe(removed.append)
+    store.add_url("abc123", "http://example.com", max_clicks=2)
+    assert store.increment_clicks("abc123") == "http://example.com"
+    assert store.get_stats("abc123")["clicks"] == 1
+    assert store.increment_clicks("abc123") == "http://example.com"
+    assert store.increment_clicks("abc123") is None
+    assert store.get_url("abc123") is None
+    assert removed == ["abc123"]
+
+def test_parse_limits_validates_values():
+    assert parse_limits({"ttl": 60, "max_clicks": 3}, 1000) == (1060, 3)
+    assert parse_limits({}, 1000) == (None, None)
+    assert parse_limits({"ttl": MAX_TTL, "max_clicks": MAX_CLICKS}, 1000) == (1000 + MAX_TTL, MAX_CLICKS)
+    for data in ({"ttl": 0}, {"ttl": "60"}, {"max_clicks": True}, {"max_clicks": -1},
+                 {"ttl": MAX_TTL + 1}, {"ttl": 10 ** 13}, {"max_clicks": 2 ** 64}):
+        with pytest.raises(ValueError):
+            parse_limits(data, 1000)
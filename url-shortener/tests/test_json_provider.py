@@ -0,0 +1,45 @@
+import json
+from flask import Flask
+from app import json_provider
+from app.json_provider import FastJSONProvider, dumps_bytes, loads
+from app.main import app
+from app.models import url_store
+
+def test_provider_matches_the_stdlib_encoding():
+    flask_app = Flask(__name__)
+    provider = FastJSONProvider(flask_app)
+    value = {"results": [{"short_code": "abc123", "url": "http://example.com/é"}], "count": 1}
+    assert json.loads(provider.dumps(value)) == value
+    assert provider.dumps({"b": 1, "a": 2}) == '{"a":2,"b":1}'
+    with flask_app.app_context():
+        assert provider.response(value).get_data() == provider.dumps(value).encode() + b"\n"
+    assert loads(dumps_bytes({1: [1.5, None]})) == {"1": [1.5, None]}
+
+def test_integers_past_64_bits_fall_back_to_the_stdlib():
+    flask_app = Flask(__name__)
+    provider = FastJSONProvider(flask_app)
+    assert provider.dumps({"n": 2 ** 70}) == '{"n": %d}' % 2 ** 70
+    with flask_app.app_context():
+        assert json.loads(provider.response({"n": 2 ** 70}).get_data()) == {"n": 2 ** 70}
+    assert dumps_bytes([2 ** 70]) == b'[%d]' % 2 ** 70
+
+def test_provider_falls_back_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    provider = FastJSONProvider(Flask(__name__))
+    assert provider.dumps({"b": 1, "a": 2}) == '{"a": 2, "b": 1}'
+    assert provider.loads('[1]') == [1]
+    assert dumps_bytes({"a": 1}) == b'{"a": 1}'
+    assert loads(b'{"a": 1}') == {"a": 1}
+
+def test_batch_responses_use_the_provider():
+    url_store.clear()
+    assert isinstance(app.json, FastJSONProvider)
+    client = app.test_client()
+    response = client.post('/api/shorten/batch', json={'urls': ['http://example.com/a', 'bad']})
+    results = response.get_json()['results']
+    assert results[0]['url'] == 'http://example.com/a'
+    assert results[1] == {'url': 'bad', 'error': 'Invalid URL'}
+    body = '{"url": "http://example.com/b"}\n"http://example.com/c"\n'
+    lines = client.post('/api/shorten/batch', data=body, content_type='application/x-ndjson').get_data(as_text=True)
+    assert [json.loads(line)['url'] for line in lines.splitlines()] == ['http://example.com/b', 'http://example.com/c']
+    url_store.clear()
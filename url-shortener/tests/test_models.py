@@ -0,0 +1,120 @@
+import threading
+
+import pytest
+from app.clicks import ClickBuffer
+from app.models import URLStore
+
+def test_store_requires_power_of_two_shards():
+    with pytest.raises(ValueError):
+        URLStore(num_shards=3)
+
+def test_store_spreads_codes_across_shards():
+    store = URLStore(num_shards=8)
+    for i in range(200):
+        assert store.add_url(f"code{i}", "http://example.com") == f"code{i}"
+    assert len(store) == 200
+    assert sum(1 for shard in store._shards if shard) > 1
+    assert store.add_url("code0", "http://other.com") is None
+
+def test_concurrent_clicks_are_not_lost():
+    store = URLStore(num_shards=4)
+    codes = [f"code{i}" for i in range(8)]
+    for code in codes:
+        store.add_url(code, "http://example.com")
+
+    def click():
+        for _ in range(500):
+            for code in codes:
+                store.increment_clicks(code)
+
+    threads = [threading.Thread(target=click) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(store.get_stats(code)["clicks"] == 2000 for code in codes)
+
+def test_buffered_clicks_are_exact_before_and_after_flush():
+    buffer = ClickBuffer(flush_interval=3600, flush_threshold=10_000, autostart=False)
+    store = URLStore(click_buffer=buffer)
+    store.add_url("abc123", "http://example.com")
+
+    for _ in range(5):
+        assert store.increment_clicks("abc123") == "http://example.com"
+    assert store.increment_clicks("missing") is None
+
+    assert store.get_url("abc123").clicks == 0
+    assert store.get_stats("abc123")["clicks"] == 5
+
+    assert buffer.flush() == 5
+    assert store.get_url("abc123").clicks == 5
+    assert store.get_stats("abc123")["clicks"] == 5
+    assert buffer.metrics()["flushes"] == 1
+
+def test_click_buffer_flushes_at_threshold():
+    buffer = ClickBuffer(flush_interval=3600, flush_threshold=3, autostart=False)
+    store = URLStore(click_buffer=buffer)
+    store.add_url("abc123", "http://example.com")
+    for _ in range(3):
+        store.increment_clicks("abc123")
+    assert store.get_url("abc123").clicks == 3
+    assert buffer.metrics()["pending_clicks"] == 0
+
+def test_concurrent_starts_run_one_flusher():
+    buffer = ClickBuffer(flush_interval=3600, autostart=False)
+    barrier = threading.Barrier(8)
+
+    def start():
+        barrier.wait()
+        buffer.start()
+
+    before = set(threading.enumerate())
+    threads = [threading.Thread(target=start) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    try:
+        assert [t.name for t in set(threading.enumerate()) - before] == ["click-flusher"]
+    finally:
+        buffer.stop()
+
+def test_records_store_epoch_and_format_iso_in_stats():
+    store = URLStore()
+    store.add_url("abc123", "http://example.com")
+    record = store.get_url("abc123")
+    assert isinstance(record.created_at, int)
+    assert not hasattr(record, "__dict__")
+    assert store.get_stats("abc123")["created_at"].endswith("+00:00")
+
+def test_interned_urls_share_one_string():
+    store = URLStore(intern_urls=True)
+    store.add_url("abc123", "".join(["http://example.com/", "campaign"]))
+    store.add_url("def456", "".join(["http://example.com/", "campaign"]))
+    assert store.get_url("abc123").long_url is store.get_url("def456").long_url
+
+def test_dedup_index_finds_normalized_repeats():
+    store = URLStore(dedup=True)
+    store.add_url("abc123", "HTTP://Example.com:80")
+    store.add_url("def456", "http://example.com/other")
+    assert store.find_url("http://example.com/") == "abc123"
+    assert store.find_url("http://example.com/other") == "def456"
+    assert store.find_url("http://example.com/missing") is None
+
+def test_dedup_index_is_rebuilt_on_recovery(tmp_path):
+    from app.storage import LogBackend
+    store = URLStore(dedup=True, backend=LogBackend(tmp_path))
+    store.add_url("abc123", "http://example.com/a")
+    store.close()
+    store = URLStore(dedup=True, backend=LogBackend(tmp_path))
+    assert store.find_url("http://example.com/a") == "abc123"
+    store.close()
+
+def test_add_many_inserts_batch_and_skips_taken_codes():
+    store = URLStore(num_shards=4)
+    store.add_url("taken", "http://example.com/old")
+    results = store.add_many([("a1", "http://example.com/1"), ("taken", "http://example.com/2"), ("a3", "http://example.com/3")])
+    assert results == ["a1", None, "a3"]
+    assert store.get_url("taken").long_url == "http://example.com/old"
+    assert len(store) == 3
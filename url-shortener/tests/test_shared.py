@@ -0,0 +1,120 @@
+import multiprocessing
+import time
+
+import pytest
+from app.clicks import ClickBuffer
+from app.config import Config
+from app.models import create_store
+from app.shared import STORE_FULL, SharedStoreFull, SharedURLStore
+
+def open_store(tmp_path, **kwargs):
+    kwargs.setdefault("capacity", 1024)
+    kwargs.setdefault("arena_bytes", 1024 * 1024)
+    return SharedURLStore(str(tmp_path / "urls.shm"), **kwargs)
+
+def test_instances_share_one_table(tmp_path):
+    first, second = open_store(tmp_path), open_store(tmp_path)
+    assert first.add_url("abc123", "http://example.com") == "abc123"
+    assert second.add_url("abc123", "http://example.org") is None
+    version = first.get_version("abc123")
+    assert second.increment_clicks("abc123") == "http://example.com"
+    assert first.get_stats("abc123")["clicks"] == 1
+    assert second.get_version("abc123") == first.get_version("abc123") != version
+    assert second.add_many([("x1", "http://example.com/1"), ("abc123", "http://example.com/2")]) == ["x1", None]
+    assert len(first) == 2
+    first.clear()
+    assert second.get_url("abc123") is None and len(second) == 0
+    first.close()
+    second.close()
+
+def _click(path, short_code, count):
+    store = SharedURLStore(path)
+    for _ in range(count):
+        store.increment_clicks(short_code)
+    store.close()
+
+def test_clicks_from_several_processes_are_not_lost(tmp_path):
+    store = open_store(tmp_path)
+    store.add_url("abc123", "http://example.com")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_click, args=(store.path, "abc123", 500)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert store.get_stats("abc123")["clicks"] == 2000
+    store.close()
+
+def test_buffered_clicks_reach_the_table(tmp_path):
+    buffer = ClickBuffer(flush_interval=3600, autostart=False)
+    store = open_store(tmp_path, click_buffer=buffer)
+    store.add_url("abc123", "http://example.com")
+    for _ in range(3):
+        store.increment_clicks("abc123")
+    assert store.get_stats("abc123")["clicks"] == 3
+    buffer.flush()
+    assert store.get_url("abc123").clicks == 3
+    store.close()
+
+def test_limits_and_expiry(tmp_path):
+    store = open_store(tmp_path)
+    now = int(time.time())
+    store.add_url("once", "http://example.com/once", max_clicks=1)
+    store.add_url("ttl", "http://example.com/ttl", expires_at=now + 60)
+    assert store.increment_clicks("once") == "http://example.com/once"
+    assert store.increment_clicks("once") is None
+    assert store.get_stats("ttl")["expires_at"]
+    assert store.expire(["ttl"], now + 60) == 1
+    assert store.get_url("ttl") is None
+    assert len(store) == 0
+    assert store.backend.metrics()["tombstones"] == 2
+    store.close()
+
+def test_full_table_raises(tmp_path):
+    store = open_store(tmp_path, capacity=4)
+    added = store.add_many([("a", "http://a.com"), ("b", "http://b.com"), ("c", "http://c.com"), ("d", "http://d.com")])
+    assert added == ["a", "b", "c", STORE_FULL]
+    with pytest.raises(SharedStoreFull):
+        store.add_url("d", "http://d.com")
+    assert len(store) == 3
+    store.close()
+
+def test_links_expired_after_their_creator_exits_are_reclaimed(tmp_path):
+    store = open_store(tmp_path, capacity=16)
+    expires_at = int(time.time()) - 1
+    for i in range(12):
+        store.add_url("ttl%d" % i, "http://example.com/%d" % i, expires_at=expires_at)
+    store.close()
+    # Another process, whose sweeper never heard of those links.
+    store = open_store(tmp_path, capacity=16)
+    assert len(store) == 12
+    assert store.add_url("keep", "http://example.com/keep") == "keep"
+    assert len(store) == 1
+    assert store.get_url("ttl0") is None
+    assert store.backend.metrics()["compactions"] == 1
+    store.close()
+
+def test_tombstones_are_compacted_away(tmp_path):
+    store = open_store(tmp_path, capacity=8, arena_bytes=160)
+    now = int(time.time())
+    store.add_url("keep", "http://example.com/keep")
+    store.increment_clicks("keep")
+    for round in range(20):
+        codes = ["t%d-%d" % (round, i) for i in range(4)]
+        for code in codes:
+            store.add_url(code, "http://example.com/" + code, expires_at=now + 60)
+        assert store.expire(codes, now + 60) == 4
+    metrics = store.backend.metrics()
+    assert metrics["compactions"] >= 19
+    assert metrics["slots_used"] <= 5 and metrics["arena_used"] <= 160
+    assert store.get_stats("keep")["clicks"] == 1
+    assert store.increment_clicks("keep") == "http://example.com/keep"
+    assert len(store) == 1
+    store.close()
+
+def test_dedup_cannot_be_combined_with_the_shared_store(tmp_path):
+    class SharedConfig(Config):
+        SHARED_MEMORY_PATH = str(tmp_path / "urls.shm")
+        DEDUP_URLS = True
+    with pytest.raises(ValueError):
+        create_store(SharedConfig)
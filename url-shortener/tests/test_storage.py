@@ -0,0 +1,115 @@
+import os
+import time
+
+from app.clicks import ClickBuffer
+from app.models import URLStore
+from app.storage import LogBackend
+
+def reopen(directory, **kwargs):
+    return URLStore(num_shards=4, backend=LogBackend(directory, **kwargs))
+
+def test_urls_and_clicks_survive_restart(tmp_path):
+    store = reopen(tmp_path)
+    store.add_url("abc123", "http://example.com")
+    store.add_url("def456", "http://example.org")
+    store.increment_clicks("abc123")
+    store.increment_clicks("abc123")
+    created_at = store.get_stats("abc123")["created_at"]
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.get_stats("abc123") == {"url": "http://example.com", "created_at": created_at, "clicks": 2}
+    assert store.get_stats("def456")["clicks"] == 0
+    assert store.backend.metrics()["recovered_records"] == 4
+    store.close()
+
+def test_buffered_clicks_are_logged_on_flush(tmp_path):
+    buffer = ClickBuffer(flush_interval=3600, autostart=False)
+    store = URLStore(click_buffer=buffer, backend=LogBackend(tmp_path))
+    store.add_url("abc123", "http://example.com")
+    for _ in range(3):
+        store.increment_clicks("abc123")
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.get_stats("abc123")["clicks"] == 3
+    store.close()
+
+def test_torn_tail_is_truncated_on_recovery(tmp_path):
+    store = reopen(tmp_path)
+    store.add_url("abc123", "http://example.com")
+    store.close()
+    wal = os.path.join(tmp_path, "wal-0000000000")
+    intact = os.path.getsize(wal)
+    with open(wal, "ab") as f:
+        f.write(b"\x01\x02\x03 partial record")
+
+    store = reopen(tmp_path)
+    assert store.get_url("abc123") is not None
+    assert os.path.getsize(wal) == intact
+    store.add_url("def456", "http://example.org")
+    store.close()
+
+    store = reopen(tmp_path)
+    assert len(store) == 2
+    store.close()
+
+def test_compaction_folds_log_into_snapshot(tmp_path):
+    store = reopen(tmp_path, snapshot_bytes=512)
+    for i in range(50):
+        store.add_url(f"code{i}", f"http://example.com/{i}")
+        store.increment_clicks(f"code{i}")
+    store.close()
+    assert store.backend.metrics()["compactions"] >= 1
+    assert any(name.startswith("snapshot-") for name in os.listdir(tmp_path))
+
+    store = reopen(tmp_path)
+    assert len(store) == 50
+    assert all(store.get_stats(f"code{i}")["clicks"] == 1 for i in range(50))
+    store.close()
+
+def test_clear_discards_persisted_state(tmp_path):
+    store = reopen(tmp_path)
+    store.add_url("abc123", "http://example.com")
+    store.clear()
+    store.add_url("def456", "http://example.org")
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.get_url("abc123") is None
+    assert store.get_url("def456") is not None
+    store.close()
+
+def test_click_timelines_survive_restart_and_compaction(tmp_path):
+    store = reopen(tmp_path, snapshot_bytes=512)
+    for i in range(50):
+        store.add_url(f"code{i}", f"http://example.com/{i}")
+        store.increment_clicks(f"code{i}")
+    store.increment_clicks("code0")
+    store.close()
+
+    store = reopen(tmp_path)
+    for i in (0, 49):
+        series = store.get_click_series(f"code{i}", 0, int(time.time()), "day")
+        assert sum(clicks for _, clicks in series) == store.get_stats(f"code{i}")["clicks"]
+    store.close()
+
+def test_removed_and_expired_links_stay_gone_after_restart(tmp_path):
+    store = reopen(tmp_path)
+    now = int(time.time())
+    store.add_url("once", "http://example.com/once", max_clicks=1)
+    store.add_url("ttl", "http://example.com/ttl", expires_at=now + 3600)
+    store.add_url("soon", "http://example.com/soon", expires_at=now + 3600)
+    store.increment_clicks("once")
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.get_url("once") is None
+    assert store.get_stats("ttl")["expires_at"]
+    assert store.expire(["soon"], now + 3600) == 1
+    store.close()
+
+    store = reopen(tmp_path)
+    assert store.get_url("soon") is None
+    assert store.get_url("ttl") is not None
+    store.close()
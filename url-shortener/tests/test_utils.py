@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from app.utils import MAX_URL_LENGTH, is_valid_url, normalize_url, validate_urls
+
+@pytest.mark.parametrize("url", [
+    "http://example.com",
+    "https://sub.example.co.uk/path?q=1",
+    "ftp://192.168.0.1:21/",
+    "http://localhost:5000",
+    "HTTPS://EXAMPLE.COM.",
+])
+def test_valid_urls(url):
+    assert is_valid_url(url)
+
+@pytest.mark.parametrize("url", [
+    "not-a-url",
+    "mailto:user@example.com",
+    "http://",
+    "http://example",
+    "http://-bad.example.com",
+    "http://example.com:port",
+    "http://example.com/with space",
+    "http://example.com?",
+    "http://exämple.com",
+    None,
+])
+def test_invalid_urls(url):
+    assert not is_valid_url(url)
+
+def test_urls_over_max_length_are_rejected():
+    url = "http://example.com/" + "a" * MAX_URL_LENGTH
+    assert not is_valid_url(url)
+    assert is_valid_url(url, max_length=None)
+
+def test_validate_urls_batch():
+    assert validate_urls(["http://example.com", "nope"]) == [True, False]
+
+def _worst_case_seconds(url):
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        is_valid_url(url, max_length=None)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+@pytest.mark.parametrize("build", [
+    lambda n: "http://" + "a." * n + "!",
+    lambda n: "http://" + "a-" * n + ".com",
+    lambda n: "http://example.com/" + "a" * n + " ",
+    lambda n: "http://" + "1." * n,
+    lambda n: "http" + "s" * n + "://example.com",
+])
+def test_pathological_inputs_take_linear_time(build):
+    small = _worst_case_seconds(build(100_000))
+    large = _worst_case_seconds(build(1_000_000))
+    # 10x the input may cost at most ~10x the time (with slack for timer noise).
+    assert large < max(small, 1e-4) * 30
+    assert large < 0.5
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.COM:80") == "http://example.com/"
+    assert normalize_url("https://example.com:8443/a?b#c") == "https://example.com:8443/a?b#c"